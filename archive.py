@@ -0,0 +1,375 @@
+"""
+Compressed archive tier for old history.
+
+Most of progress.txt is old and rarely read. archive_history() moves the oldest
+lines (the lines at the start of the file, up to the first line that is newer
+than the cutoff) into a gzip file in the folder progress.txt.archive/:
+
+    part-0001.gz    the lines, compressed in blocks of BLOCK_LINES lines
+                    (each block is its own gzip member, so one block can be
+                    read without reading the others)
+    part-0001.json  for each block: byte offset, length, first/last date and
+                    the users in it; for the whole part: totals, first-seen
+                    display names and streak data
+
+Because only the start of the file is moved, "archive parts, then progress.txt"
+is exactly the old file, so every loader gives the same answers as before.
+
+Readers:
+    history_lines(filename)   - all lines: archive first, then the live file
+    archive_totals(filename)  - totals from the cached aggregates (nothing is decompressed)
+    archive_lines(...)        - lines of the blocks that can match a date range / users
+
+Example:
+    python archive.py --older-than-days 90
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import zlib
+
+from records import parse_line
+from recovery import CHECKPOINT_TAG, open_temp_beside, read_for_rewrite, rewrite_lines
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+BLOCK_LINES = 1000 # lines per compressed block
+DEFAULT_OLDER_THAN_DAYS = 90 # archive lines older than this by default
+DATE_LEN = len("2025-11-01")
+
+
+def archive_dir(filename):
+    """
+    Return the archive folder for this history file.
+    """
+    return filename + ".archive"
+
+
+def _write_json_atomic(path, data):
+    f, tmp_name = open_temp_beside(path, "w")
+    with f:
+        json.dump(data, f)
+    os.replace(tmp_name, path)
+
+
+def _line_dates(date_text):
+    # first and last day a line can be about ("YYYY-MM" summaries cover a month)
+    if len(date_text) == 7:
+        return date_text + "-01", date_text + "-31"
+    return date_text, date_text
+
+
+def _crc_text(data):
+    return format(zlib.crc32(data) & 0xffffffff, "08x")
+
+
+def _live_has_prefix(filename, info):
+    # True if progress.txt still starts with the lines this part archived
+    size = info["prefix_bytes"]
+    try:
+        with open(filename, "rb") as f:
+            head = f.read(size)
+    except FileNotFoundError:
+        return False
+    return len(head) == size and _crc_text(head) == info["prefix_crc"]
+
+
+def _settle_pending(filename, json_path, info):
+    """
+    Cut the archived lines out of progress.txt and mark the part "done".
+
+    A part is "pending" until its lines have been removed from progress.txt
+    (archive_history does that right after writing the part; a crash may stop
+    it before). If progress.txt still starts with those lines, remove them now;
+    otherwise they were already removed.
+    """
+    size = info["prefix_bytes"]
+    tag = CHECKPOINT_TAG.encode("utf-8")
+
+    def without_prefix(raw_lines):
+        head = []
+        offset = 0
+        for raw in raw_lines:
+            if offset >= size:
+                break
+            head.append(raw)
+            offset += len(raw)
+        if offset != size or _crc_text(b"".join(head)) != info["prefix_crc"]:
+            return None # already removed
+        # old checkpoint markers are useless once the file is rewritten
+        rest = []
+        for raw in raw_lines[len(head):]:
+            if not raw.startswith(tag):
+                rest.append(raw)
+        return rest
+
+    # lines appended by other programs meanwhile are kept
+    rewrite_lines(filename, without_prefix)
+    info["state"] = "done"
+    _write_json_atomic(json_path, info)
+
+
+def list_parts(filename, settle=False):
+    """
+    Return a list of (gz path, info dict) for every archive part, oldest first.
+
+    A "pending" part (its archive run was interrupted) is left out while
+    progress.txt still holds its lines, so nothing is counted twice.
+    With settle=True (used by archive_history) such a run is finished instead.
+    """
+    folder = archive_dir(filename)
+    try:
+        names = sorted(os.listdir(folder))
+    except FileNotFoundError:
+        return []
+
+    parts = []
+    for name in names:
+        if not (name.startswith("part-") and name.endswith(".json")):
+            continue
+        json_path = os.path.join(folder, name)
+        with open(json_path, "r") as f:
+            info = json.load(f)
+        if info.get("state") == "pending":
+            if settle:
+                _settle_pending(filename, json_path, info)
+            elif _live_has_prefix(filename, info):
+                continue
+        parts.append((json_path[:-len(".json")] + ".gz", info))
+    return parts
+
+
+def read_block(gz_path, block):
+    """
+    Decompress one block and return its lines (with newlines).
+    """
+    with open(gz_path, "rb") as f:
+        f.seek(block["offset"])
+        data = f.read(block["length"])
+    return gzip.decompress(data).decode("utf-8").splitlines(True)
+
+
+def archive_lines(filename, start=None, end=None, users=None, parts=None):
+    """
+    Yield archived lines from the blocks that can match the filters.
+    Blocks outside the date range, or without any of the users, are not decompressed.
+
+    Parameters:
+        start, end (str): date range (inclusive), None = no limit
+        users (set of str): lowercase names, None = everyone
+        parts (list): result of list_parts, if the caller already has it
+    """
+    if parts is None:
+        parts = list_parts(filename)
+    for gz_path, info in parts:
+        for block in info["blocks"]:
+            if start is not None and block["last"] < start:
+                continue
+            if end is not None and block["first"] > end:
+                continue
+            if users is not None:
+                found = False
+                for key in block["users"]:
+                    if key in users:
+                        found = True
+                        break
+                if not found:
+                    continue
+            for line in read_block(gz_path, block):
+                yield line
+
+
+def history_lines(filename=HISTORY_FILE, user=None):
+    """
+    Yield every line of the history: archived lines first, then progress.txt.
+    If user (a lowercase name) is given, archive blocks without that user are skipped.
+
+    Raises FileNotFoundError only if there is no archive and no progress.txt.
+    """
+    users = None
+    if user is not None:
+        users = {user}
+
+    parts = list_parts(filename)
+    for line in archive_lines(filename, users=users, parts=parts):
+        yield line
+
+    try:
+        f = open(filename, "r")
+    except FileNotFoundError:
+        if len(parts) == 0:
+            raise
+        return
+    with f:
+        for line in f:
+            yield line
+
+
+def archive_totals(filename=HISTORY_FILE):
+    """
+    Return (totals, display) for all archived lines, from the cached aggregates.
+    Same meaning as load_totals_all: display holds the first-seen name.
+    """
+    totals = {}
+    display = {}
+    for gz_path, info in list_parts(filename):
+        for key in info["totals"]:
+            if key not in totals:
+                totals[key] = 0
+                display[key] = info["display"][key]
+            totals[key] = totals[key] + info["totals"][key]
+    return totals, display
+
+
+def archive_streaks(filename=HISTORY_FILE):
+    """
+    Return lowercase name -> current streak (like calc_streak) at the end of the archive.
+    """
+    streaks = {}
+    for gz_path, info in list_parts(filename):
+        for key in info["streaks"]:
+            trail, all_positive = info["streaks"][key]
+            if all_positive:
+                streaks[key] = streaks.get(key, 0) + trail
+            else:
+                streaks[key] = trail
+    return streaks
+
+
+def archive_history(filename=HISTORY_FILE, before=None):
+    """
+    Move the lines at the start of progress.txt that are older than `before`
+    into a new compressed archive part.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        before (str): cutoff date, e.g. "2025-01-01"; lines dated before it are moved
+                      (default: DEFAULT_OLDER_THAN_DAYS days before today)
+
+    Returns:
+        number of lines moved into the archive
+    """
+    if before is None:
+        before = str(datetime.date.today() - datetime.timedelta(days=DEFAULT_OLDER_THAN_DAYS))
+
+    # make sure an earlier, interrupted run is finished first
+    list_parts(filename, settle=True)
+
+    # a last line without "\n" may still be being written by another program:
+    # it is left out here and stays in the live file
+    raw_lines = read_for_rewrite(filename)[0]
+
+    # take lines from the start until the first line that is not old enough
+    moved = []
+    prefix_bytes = 0
+    for raw in raw_lines:
+        if not raw.endswith(b"\n"):
+            break # a half-written line stays in the live file
+        text = raw.decode("utf-8", errors="replace")
+        if text.startswith(CHECKPOINT_TAG) or text.strip() == "":
+            prefix_bytes += len(raw)
+            continue
+        rec = parse_line(text)
+        if rec is not None and _line_dates(rec["date"])[1] >= before:
+            break
+        if rec is None and text[:DATE_LEN] >= before:
+            break
+        moved.append(text)
+        prefix_bytes += len(raw)
+
+    if len(moved) == 0:
+        return 0
+
+    folder = archive_dir(filename)
+    os.makedirs(folder, exist_ok=True)
+    number = 1
+    for name in os.listdir(folder):
+        if name.startswith("part-") and name.endswith(".json"):
+            number = max(number, int(name[len("part-"):-len(".json")]) + 1)
+    gz_path = os.path.join(folder, f"part-{number:04d}.gz")
+    json_path = os.path.join(folder, f"part-{number:04d}.json")
+
+    info = {
+        "state": "pending",
+        "prefix_bytes": prefix_bytes,
+        "prefix_crc": _crc_text(b"".join(raw_lines)[:prefix_bytes]),
+        "blocks": [],
+        "totals": {},
+        "display": {},
+        "streaks": {}, # lowercase name -> [trailing positive run, all records positive]
+    }
+
+    # write the blocks, and collect the aggregates while we go
+    with open(gz_path, "wb") as out:
+        for i in range(0, len(moved), BLOCK_LINES):
+            chunk = moved[i:i + BLOCK_LINES]
+            first = None
+            last = None
+            users = set()
+            for text in chunk:
+                rec = parse_line(text)
+                if rec is None:
+                    continue
+                low, high = _line_dates(rec["date"])
+                if first is None or low < first:
+                    first = low
+                if last is None or high > last:
+                    last = high
+
+                key = rec["key"]
+                users.add(key)
+                if key not in info["totals"]:
+                    info["totals"][key] = 0
+                    info["display"][key] = rec["name"]
+                    info["streaks"][key] = [0, True]
+                info["totals"][key] += rec["points"]
+                if not rec["summary"]:
+                    streak = info["streaks"][key]
+                    if rec["points"] > 0:
+                        streak[0] += 1
+                    else:
+                        streak[0] = 0
+                        streak[1] = False
+
+            data = gzip.compress("".join(chunk).encode("utf-8"))
+            info["blocks"].append({
+                "offset": out.tell(),
+                "length": len(data),
+                "first": first or "",
+                "last": last or "",
+                "lines": len(chunk),
+                "users": sorted(users),
+            })
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+
+    # the part exists now (still "pending"); then cut the lines out of progress.txt.
+    # If another program rewrote the file meanwhile, its start is checked again first.
+    _write_json_atomic(json_path, info)
+    _settle_pending(filename, json_path, info)
+    return len(moved)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move old history lines into compressed archive files.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--before", help="archive lines dated before this day, e.g. 2025-01-01")
+    parser.add_argument("--older-than-days", type=int, default=DEFAULT_OLDER_THAN_DAYS,
+                        help=f"archive lines older than this many days (default: {DEFAULT_OLDER_THAN_DAYS})")
+    args = parser.parse_args(argv)
+
+    before = args.before
+    if before is None:
+        before = str(datetime.date.today() - datetime.timedelta(days=args.older_than_days))
+
+    moved = archive_history(args.file, before)
+    print(f"Archived {moved} line(s) dated before {before} into {archive_dir(args.file)}")
+
+
+if __name__ == "__main__":
+    main()
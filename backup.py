@@ -0,0 +1,351 @@
+"""
+Incremental backup of progress.txt to a local folder.
+
+The first backup copies the whole file as a base snapshot. After that, each
+backup only ships what changed since the last one, as a numbered delta file:
+
+    backup-folder/
+        manifest.json      list of steps, with the SHA-256 of the history after each step
+        000001.base        full copy of progress.txt
+        000002.delta       changes since step 1
+        000003.delta       changes since step 2 ...
+        archive/<sha256>   archive parts (archive.py), stored once by their SHA-256
+
+A delta file has one operation per line:
+    D <n>      delete line number n of the previous version (0-based)
+    A <text>   add this line at the end
+
+Most saves only add lines at the end, and a save that replaces today's record
+removes one line and adds one, so deltas stay small. If a delta would be larger
+than the file itself (e.g. after rollup.py rewrote everything), a new base is written.
+
+restore() replays the base and the deltas and checks the SHA-256 of every step.
+
+archive_history moves old lines out of progress.txt into progress.txt.archive/,
+so a backup of progress.txt alone would lose them. Each step therefore also
+lists the archive files (part-NNNN.gz / part-NNNN.json) of that moment with
+their SHA-256. A file is copied into the backup only the first time its
+content is seen (parts don't change once written, except the small .json
+going from "pending" to "done"). restore() writes them back next to the
+restored file, into <out>.archive/, after checking each SHA-256.
+
+Example:
+    python backup.py backup /mnt/backups/habits
+    python backup.py restore /mnt/backups/habits restored.txt
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+from archive import archive_dir
+from recovery import open_temp_beside
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+MANIFEST = "manifest.json"
+ARCHIVE_FOLDER = "archive" # archive files inside the backup folder
+
+
+def sha256_of_lines(lines):
+    """
+    Return the SHA-256 (hex) of the file made of these lines (each ends with "\\n").
+    """
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def read_lines(filename):
+    """
+    Read a text file as a list of lines without "\\n" (empty list if missing).
+    """
+    try:
+        with open(filename, "r", encoding="utf-8", newline="\n") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    if data == "":
+        return []
+    if data.endswith("\n"):
+        data = data[:-1]
+    return data.split("\n")
+
+
+def sha256_of_file(path):
+    """
+    Return the SHA-256 (hex) of a file's bytes.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def archive_files(filename):
+    """
+    Return a dict of archive file name -> SHA-256 for every part of this history file.
+    """
+    folder = archive_dir(filename)
+    try:
+        names = sorted(os.listdir(folder))
+    except FileNotFoundError:
+        return {}
+    files = {}
+    for name in names:
+        if name.startswith("part-") and (name.endswith(".gz") or name.endswith(".json")):
+            files[name] = sha256_of_file(os.path.join(folder, name))
+    return files
+
+
+def _copy_atomic(source, path):
+    f, tmp_name = open_temp_beside(path, "wb")
+    with f:
+        with open(source, "rb") as src:
+            shutil.copyfileobj(src, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, path)
+
+
+def _write_atomic(path, text):
+    f, tmp_name = open_temp_beside(path, "w")
+    with f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, path)
+
+
+def load_manifest(target):
+    """
+    Return the manifest of a backup folder (an empty one if there is none).
+    """
+    try:
+        with open(os.path.join(target, MANIFEST), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"steps": []}
+
+
+def make_delta(old, new):
+    """
+    Return delta operations that turn the list of lines old into new.
+
+    Lines of old are kept in order where they match new; the others are deleted.
+    Whatever is left of new is added at the end.
+    """
+    ops = []
+    j = 0
+    for i in range(len(old)):
+        if j < len(new) and old[i] == new[j]:
+            j += 1
+        else:
+            ops.append(f"D {i}")
+    for line in new[j:]:
+        ops.append("A " + line)
+    return ops
+
+
+def apply_delta(old, ops):
+    """
+    Apply delta operations (see make_delta) to a list of lines and return the new list.
+    """
+    deleted = set()
+    added = []
+    for op in ops:
+        if op.startswith("D "):
+            deleted.add(int(op[2:]))
+        elif op.startswith("A "):
+            added.append(op[2:])
+        elif op == "A":
+            added.append("")
+        else:
+            raise ValueError("bad delta operation: " + op)
+
+    new = []
+    for i in range(len(old)):
+        if i not in deleted:
+            new.append(old[i])
+    new.extend(added)
+    return new
+
+
+def replay(target, upto=None, verify=True):
+    """
+    Rebuild the history lines from a backup folder.
+
+    Parameters:
+        target (str): backup folder
+        upto (int): stop after this step number (None = all steps)
+        verify (bool): check the SHA-256 after every step
+
+    Returns:
+        lines (list of str)
+    """
+    manifest = load_manifest(target)
+    lines = []
+    for step in manifest["steps"]:
+        if upto is not None and step["seq"] > upto:
+            break
+        path = os.path.join(target, step["file"])
+        if step["kind"] == "base":
+            lines = read_lines(path)
+        else:
+            lines = apply_delta(lines, read_lines(path))
+        if verify and sha256_of_lines(lines) != step["sha256"]:
+            raise ValueError(f"checksum mismatch after step {step['seq']} ({step['file']})")
+    return lines
+
+
+def step_archive(target, upto=None):
+    """
+    Return the archive files (name -> SHA-256) of the last step up to upto.
+    """
+    files = {}
+    for step in load_manifest(target)["steps"]:
+        if upto is not None and step["seq"] > upto:
+            break
+        files = step.get("archive", {})
+    return files
+
+
+def verify_archive(target, files):
+    """
+    Check that every archive file is in the backup with the right SHA-256.
+    """
+    for name in files:
+        path = os.path.join(target, ARCHIVE_FOLDER, files[name])
+        if not os.path.exists(path):
+            raise ValueError(f"archive file {name} is missing from the backup")
+        if sha256_of_file(path) != files[name]:
+            raise ValueError(f"checksum mismatch in archive file {name}")
+
+
+def backup(filename=HISTORY_FILE, target=None):
+    """
+    Ship the changes of progress.txt since the last backup into the target folder.
+
+    Returns:
+        (kind, operations): kind is "base", "delta" or "none" (nothing changed)
+    """
+    os.makedirs(target, exist_ok=True)
+    manifest = load_manifest(target)
+    current = read_lines(filename)
+    current_sha = sha256_of_lines(current)
+    current_archive = archive_files(filename)
+
+    steps = manifest["steps"]
+    if len(steps) > 0 and steps[-1]["sha256"] == current_sha and steps[-1].get("archive", {}) == current_archive:
+        return ("none", 0)
+
+    # copy archive files whose content is not in the backup yet
+    os.makedirs(os.path.join(target, ARCHIVE_FOLDER), exist_ok=True)
+    for name in current_archive:
+        path = os.path.join(target, ARCHIVE_FOLDER, current_archive[name])
+        if not os.path.exists(path):
+            _copy_atomic(os.path.join(archive_dir(filename), name), path)
+            if sha256_of_file(path) != current_archive[name]:
+                # the part changed while we copied it: don't record a wrong checksum
+                os.remove(path)
+                raise ValueError(f"archive file {name} changed during the backup, try again")
+
+    seq = 1
+    kind = "base"
+    ops = current
+    if len(steps) > 0:
+        seq = steps[-1]["seq"] + 1
+        last = steps[-1]
+        if len(current) >= last["lines"] and sha256_of_lines(current[:last["lines"]]) == last["sha256"]:
+            # only new lines at the end: no need to look at the old backup at all
+            delta = []
+            for line in current[last["lines"]:]:
+                delta.append("A " + line)
+        else:
+            # something in the middle changed: compare with the last backed-up version
+            delta = make_delta(replay(target), current)
+        # a delta bigger than the file itself is not worth it
+        if len(delta) <= len(current):
+            kind = "delta"
+            ops = delta
+
+    name = f"{seq:06d}.{kind}"
+    _write_atomic(os.path.join(target, name), "".join(line + "\n" for line in ops))
+
+    # the manifest is written last, so a crash never leaves a step half-recorded
+    steps.append({"seq": seq, "kind": kind, "file": name, "sha256": current_sha, "lines": len(current),
+                  "archive": current_archive})
+    _write_atomic(os.path.join(target, MANIFEST), json.dumps(manifest, indent=1))
+    return (kind, len(ops))
+
+
+def restore(target, out_file, upto=None):
+    """
+    Rebuild the history from the base and deltas, verify it, and write it to
+    out_file; the archive files of that step go to out_file's archive folder.
+
+    Returns:
+        number of lines restored (without the archived ones)
+    """
+    lines = replay(target, upto, verify=True)
+    files = step_archive(target, upto)
+    verify_archive(target, files)
+
+    # the archive first: out_file's archive folder must hold exactly this step's parts
+    folder = archive_dir(out_file)
+    if len(files) > 0 or os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True)
+        for name in os.listdir(folder):
+            if name.startswith("part-") and name not in files:
+                os.remove(os.path.join(folder, name))
+        for name in files:
+            _copy_atomic(os.path.join(target, ARCHIVE_FOLDER, files[name]), os.path.join(folder, name))
+
+    _write_atomic(out_file, "".join(line + "\n" for line in lines))
+    return len(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental backup of the habit history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("backup", help="ship changes since the last backup")
+    p.add_argument("target", help="backup folder")
+    p.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+
+    p = sub.add_parser("restore", help="rebuild the history from a backup folder")
+    p.add_argument("target", help="backup folder")
+    p.add_argument("out", help="file to write the restored history to")
+    p.add_argument("--upto", type=int, help="restore the state after this step number")
+
+    p = sub.add_parser("verify", help="check every step of a backup folder")
+    p.add_argument("target", help="backup folder")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "backup":
+        kind, count = backup(args.file, args.target)
+        if kind == "none":
+            print("Nothing changed since the last backup.")
+        else:
+            print(f"Wrote {kind} with {count} line(s) to {args.target}")
+    elif args.command == "restore":
+        count = restore(args.target, args.out, args.upto)
+        parts = len(step_archive(args.target, args.upto))
+        print(f"Restored {count} line(s) and {parts} archive file(s) to {args.out} (checksums OK)")
+    else:
+        lines = replay(args.target, verify=True)
+        files = step_archive(args.target)
+        verify_archive(args.target, files)
+        print(f"Backup OK: {len(load_manifest(args.target)['steps'])} step(s), {len(lines)} line(s), "
+              f"{len(files)} archive file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: exact leaderboard (load_totals_all) vs approximate top-K (topk.py).
+
+It writes a synthetic history file with many users (a few very active users,
+lots of rare ones), then runs each path in a fresh process so the peak memory
+(RSS) numbers don't mix. Finally it compares the approximate top N with the exact one.
+
+Example:
+    python bench_topk.py --users 200000 --records 1000000 --top 10 --memory-mb 4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource # only on Unix
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    Return the peak RSS of this process in MB, or None if we can't tell.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024) # bytes on macOS
+    return peak / 1024 # kilobytes on Linux
+
+
+def make_history(path, users, records, seed=1):
+    """
+    Write a synthetic history file. User i is picked with weight 1 / (i + 1),
+    so there are some heavy users and a long tail of light ones.
+    """
+    rnd = random.Random(seed)
+    weights = []
+    for i in range(users):
+        weights.append(1.0 / (i + 1))
+    picks = rnd.choices(range(users), weights=weights, k=records)
+
+    day = 0
+    with open(path, "w") as f:
+        for i in range(records):
+            if i % 1000 == 0:
+                day += 1
+            date_text = f"2025-{1 + (day // 28) % 12:02d}-{1 + day % 28:02d}"
+            points = rnd.randint(0, 4)
+            f.write(f"{date_text} | kiosk{picks[i]:08d} | Drink water=Yes, Points={points}\n")
+
+
+def run_exact(path, top_n):
+    # exact path: load every user's total and sort
+    from main import load_totals_all
+    totals, display = load_totals_all(path)
+    keys = sorted(totals.keys(), key=lambda k: (-totals[k], display[k].lower()))
+    rows = []
+    for k in keys[:top_n]:
+        rows.append([display[k], totals[k], 0])
+    return rows
+
+
+def run_approx(path, top_n, memory_mb):
+    # approximate path: space-saving sketch with a memory budget
+    from topk import approx_leaderboard
+    rows, sketch = approx_leaderboard(path, top_n, memory_bytes=int(memory_mb * 1024 * 1024))
+    result = []
+    for r in rows:
+        result.append(list(r))
+    return result
+
+
+def child(mode, path, top_n, memory_mb):
+    """
+    Run one path and print its result as JSON (used in a fresh process).
+    """
+    start = time.perf_counter()
+    if mode == "exact":
+        rows = run_exact(path, top_n)
+    else:
+        rows = run_approx(path, top_n, memory_mb)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"rows": rows, "seconds": seconds, "rss_mb": peak_rss_mb()}))
+
+
+def run_child(mode, path, top_n, memory_mb):
+    # start this script again in "child" mode and read its JSON answer
+    here = os.path.dirname(os.path.abspath(__file__))
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode, "--file", path,
+           "--top", str(top_n), "--memory-mb", str(memory_mb)]
+    out = subprocess.run(cmd, cwd=here, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare exact and approximate leaderboards.")
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--memory-mb", type=float, default=4)
+    parser.add_argument("--file", help="use this history file instead of a synthetic one")
+    parser.add_argument("--child", choices=["exact", "approx"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.child, args.file, args.top, args.memory_mb)
+        return
+
+    tmp_dir = None
+    path = args.file
+    if path is None:
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "progress.txt")
+        print(f"Writing {args.records} records for {args.users} users ...")
+        make_history(path, args.users, args.records)
+
+    exact = run_child("exact", path, args.top, args.memory_mb)
+    approx = run_child("approx", path, args.top, args.memory_mb)
+
+    # accuracy: how many of the exact top N are also in the approximate top N,
+    # and how far off the approximate counts are
+    exact_totals = {}
+    for r in exact["rows"]:
+        exact_totals[r[0].lower()] = r[1]
+    hits = 0
+    max_over = 0
+    for r in approx["rows"]:
+        key = r[0].lower()
+        if key in exact_totals:
+            hits += 1
+            over = r[1] - exact_totals[key]
+            if over > max_over:
+                max_over = over
+
+    print("\n===== Top-K benchmark =====")
+    print(f"{'path':<8}{'seconds':>10}{'peak RSS (MB)':>16}")
+    for name, res in (("exact", exact), ("approx", approx)):
+        rss = res["rss_mb"]
+        rss_text = "n/a" if rss is None else f"{rss:.1f}"
+        print(f"{name:<8}{res['seconds']:>10.2f}{rss_text:>16}")
+    print(f"Top {args.top} overlap: {hits}/{len(exact['rows'])}")
+    print(f"Largest over-count among shared users: {max_over} pts")
+
+    if tmp_dir is not None:
+        os.remove(path)
+        os.rmdir(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
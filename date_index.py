@@ -0,0 +1,342 @@
+"""
+Sparse date index for progress.txt.
+
+save_today appends today's record at the end, so the file is (almost always)
+sorted by date. The index remembers the date and byte offset of every
+INDEX_EVERY-th record, so a date range can be found with a binary search
+instead of a scan from byte 0:
+
+    samples: [["2025-01-01", 0], ["2025-01-09", 24576], ["2025-01-17", 49152], ...]
+
+Reading from "2025-01-12" starts at the last sample before that date (24576)
+and, because the file is sorted, stops at the first line after the end date.
+
+The index is saved next to the history (progress.txt.dateidx.json) and kept up
+to date the same way as the tail reader: when lines were appended, only the new
+lines are read; when the file was rewritten, the index is built again.
+While it reads, it checks that the dates never go backwards. If they do (for
+example after importing older records), "ordered" becomes False and every
+reader falls back to a full scan, so the answers are always the same.
+
+Monthly summaries ("2024-03 | ...", see rollup.py) count as the first day of
+their month. Checkpoint markers and empty lines are ignored.
+
+Example:
+    python date_index.py --check
+"""
+
+import argparse
+import bisect
+import json
+import os
+
+from archive import list_parts
+from recovery import open_temp_beside
+from tail_reader import FilePosition
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+INDEX_EVERY = 256 # one sample every this many records
+INDEX_VERSION = 2
+
+
+def index_path(filename):
+    """
+    Return the index file name for this history file.
+    """
+    return filename + ".dateidx.json"
+
+
+def line_key(text):
+    """
+    Return the sort key of a line: its date, "YYYY-MM-01" for a monthly summary,
+    "" for a line that is not a record (marker, empty line), or None for a
+    record line that doesn't start with a date.
+    """
+    if "|" not in text:
+        return ""
+    first = text.split("|", 1)[0].strip()
+    if len(first) == 10 and first[4] == "-" and first[7] == "-" and first[:4].isdigit():
+        return first
+    if len(first) == 7 and first[4] == "-" and first[:4].isdigit():
+        return first + "-01"
+    return None
+
+
+class DateIndex:
+    """
+    Sampled (date, byte offset) pairs for one history file.
+    """
+
+    def __init__(self, filename, every=INDEX_EVERY):
+        """
+        Set up an empty index; call update() to read the file.
+        """
+        self.filename = filename
+        self.every = every
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything, so the next update() reads the whole file.
+        """
+        self.samples = [] # [date, offset] of every self.every-th record
+        self.keys = [] # just the dates of self.samples, for bisect
+        self.position = FilePosition() # how much of the file is indexed
+        self.records = 0 # records seen
+        self.last_key = "" # date of the last record seen
+        self.ordered = True
+        self.bad_offset = None # first line that was out of order (or had no date)
+
+    def update(self):
+        """
+        Read the lines added since last time (or everything, if the file was rewritten).
+
+        Returns:
+            changed (bool): True if the index changed
+        """
+        try:
+            f = open(self.filename, "rb")
+        except FileNotFoundError:
+            if self.position.inode is not None or self.position.offset > 0:
+                self.reset()
+                return True
+            return False
+
+        with f:
+            st = os.fstat(f.fileno())
+            changed = False
+            if not self.position.is_same_file(f, st):
+                self.reset()
+                changed = True
+
+            offset = self.position.offset
+            data = self.position.read_new(f, st)
+            if data == b"":
+                return changed # nothing new, or only a half-written line so far
+            for raw in data.splitlines(True):
+                self._add_line(raw.decode("utf-8", errors="replace"), offset)
+                offset += len(raw)
+            return True
+
+    def _add_line(self, text, offset):
+        key = line_key(text)
+        if key == "":
+            return
+        if key is None or key < self.last_key:
+            if self.ordered:
+                self.ordered = False
+                self.bad_offset = offset
+            return
+        if self.records % self.every == 0:
+            self.samples.append([key, offset])
+            self.keys.append(key)
+        self.records += 1
+        self.last_key = key
+
+    def seek(self, start):
+        """
+        Return a byte offset where reading can start to see every line dated start or later.
+        """
+        if start is None or not self.ordered:
+            return 0
+        # the last sample that is still before start: nothing earlier can be >= start
+        i = bisect.bisect_left(self.keys, start) - 1
+        if i < 0:
+            return 0
+        return self.samples[i][1]
+
+    def get_state(self):
+        """
+        Return the index as plain JSON-friendly data.
+        """
+        return {"version": INDEX_VERSION, "every": self.every, "position": self.position.get_state(),
+                "records": self.records, "last_key": self.last_key, "ordered": self.ordered,
+                "bad_offset": self.bad_offset, "samples": self.samples}
+
+    def set_state(self, state):
+        """
+        Continue from a state returned by get_state.
+        """
+        self.reset()
+        self.every = state["every"]
+        self.position.set_state(state["position"])
+        self.records = state["records"]
+        self.last_key = state["last_key"]
+        self.ordered = state["ordered"]
+        self.bad_offset = state["bad_offset"]
+        self.samples = state["samples"]
+        for key, offset in self.samples:
+            self.keys.append(key)
+
+    def save(self):
+        """
+        Write the index next to the history file (atomically).
+        """
+        path = index_path(self.filename)
+        f, tmp_name = open_temp_beside(path, "w")
+        with f:
+            json.dump(self.get_state(), f)
+        os.replace(tmp_name, path)
+
+
+# one index per history file, shared inside this program
+_indexes = {}
+
+
+def get_date_index(filename=HISTORY_FILE):
+    """
+    Return the index of this file, caught up with the file's current end.
+    It is loaded from disk the first time, and saved again when it changed.
+    """
+    index = _indexes.get(filename)
+    if index is None:
+        index = DateIndex(filename)
+        try:
+            with open(index_path(filename), "r") as f:
+                state = json.load(f)
+            if state.get("version") == INDEX_VERSION:
+                index.set_state(state)
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            index.reset()
+        _indexes[filename] = index
+
+    if index.update():
+        try:
+            index.save()
+        except OSError:
+            pass # a read-only folder: the index still works in memory
+    return index
+
+
+def range_lines(filename=HISTORY_FILE, start=None, end=None):
+    """
+    Yield the lines of the live file that can be dated between start and end
+    (both inclusive, None = no limit). Lines outside the range may still be
+    yielded, so callers filter as before; this only skips what surely doesn't match.
+    """
+    index = get_date_index(filename)
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(index.seek(start))
+        for raw in f:
+            text = raw.decode("utf-8", errors="replace")
+            if end is not None and index.ordered:
+                key = line_key(text)
+                if key and key > end:
+                    return # sorted file: everything after this is later too
+            yield text
+
+
+def _day_scores(name, lines):
+    # the same rules as weekly_average in main.py, for a list of lines
+    from records import is_summary_text
+
+    target = name.strip().lower()
+    day_scores = {}
+    for line in lines:
+        line = line.strip()
+        if line == "":
+            continue
+        parts = line.split("|")
+        if len(parts) < 3 or parts[1].strip().lower() != target:
+            continue
+        if is_summary_text(parts[2].strip()) or "Points=" not in line:
+            continue
+        try:
+            p = int(line.split("Points=")[-1].strip())
+        except ValueError:
+            continue
+        day_scores[parts[0].strip()] = p
+    return day_scores
+
+
+def fast_weekly_average(name, filename=HISTORY_FILE):
+    """
+    weekly_average (main.py) that reads the file from the end, one sampled
+    block at a time, and stops as soon as older blocks can't change the answer.
+
+    Returns the average, or None if the index can't answer (the file is not
+    sorted, or older records in the archive would be needed); then the caller
+    uses the full scan.
+    """
+    index = get_date_index(filename)
+    if not index.ordered:
+        return None
+
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return None
+
+    day_scores = {}
+    with f:
+        # block i starts at sample i (block 0 also covers anything before the first sample)
+        starts = [0]
+        for i in range(1, len(index.samples)):
+            starts.append(index.samples[i][1])
+        block_end = os.fstat(f.fileno()).st_size
+
+        for i in range(len(starts) - 1, -1, -1):
+            f.seek(starts[i])
+            block = f.read(block_end - starts[i]).decode("utf-8", errors="replace")
+            block_end = starts[i]
+
+            # a later block wins: a date already found there keeps its score
+            found = _day_scores(name, block.splitlines())
+            for date_text in found:
+                if date_text not in day_scores:
+                    day_scores[date_text] = found[date_text]
+
+            # every line before this block is dated on or before its first sample,
+            # so once that is older than the 7th latest day, nothing earlier counts
+            if i > 0 and len(day_scores) >= 7 and index.samples[i][0] < sorted(day_scores)[-7]:
+                break
+
+    # the archive holds the lines from before the live file
+    parts = list_parts(filename)
+    if len(parts) > 0:
+        if len(day_scores) < 7:
+            return None
+        seventh = sorted(day_scores)[-7]
+        for gz_path, info in parts:
+            for block in info["blocks"]:
+                if block["last"] >= seventh:
+                    return None
+
+    if len(day_scores) == 0:
+        return 0
+    last_days = sorted(day_scores)[-7:]
+    total_points = 0
+    for d in last_days:
+        total_points = total_points + day_scores[d]
+    return round(total_points / len(last_days), 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and check the date index of the history file.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--check", action="store_true", help="rebuild the index from scratch and report")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        index = DateIndex(args.file)
+        index.update()
+        index.save()
+        _indexes[args.file] = index
+    else:
+        index = get_date_index(args.file)
+    print(f"{index.records} record(s), {len(index.samples)} sample(s), every {index.every} records")
+    if index.ordered:
+        print("The file is sorted by date: date-range reads use the index.")
+    else:
+        print(f"The file is NOT sorted by date (first problem at byte {index.bad_offset}): "
+              "readers scan the whole file.")
+
+
+if __name__ == "__main__":
+    main()
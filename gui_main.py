@@ -17,94 +17,115 @@ Note:
 The Graphical User Interface design of this program was created with the help of GPT guidance.
 """
 
+import startup_profile # first, so it can time everything else
+
 import os
+import sys
 import datetime
 import tkinter as tk
 from tkinter import ttk
 from datetime import date
 
+# The data modules of this project (archive, records, recovery, ...) are
+# imported inside the functions that use them: the window is drawn first,
+# and the history is only read after that (see HabitGUI.load_data).
+
 # get the folder where this file is located, then set up the path for progress.txt
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
 
+# how often the live ranking checks progress.txt for new records (milliseconds)
+REFRESH_MS = 2000
+
 
 def save_today(name, points, completions):
+    from records import format_line, parse_line
+    from recovery import append_line, maybe_checkpoint, rewrite_lines
 
     today = str(datetime.date.today())
-
-    # read old records
-    lines = []
-    try:
-        with open(HISTORY_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line == "":
-                    continue
-                # skip old lines from today by this same user
-                if today in line and name.lower() in line.lower():
-                    continue
-                lines.append(line)
-    except FileNotFoundError:
-        pass
-
-    # write all other lines back, then add today's new one
-    with open(HISTORY_FILE, "w") as f:
-        for l in lines:
-            f.write(l + "\n")
-
-        # write today's record
-        f.write(f"{today} | {name.strip()} | ")
-        for habit in completions:
-            if completions[habit] == 1:
-                f.write(f"{habit}=Yes, ")
-            else:
-                f.write(f"{habit}=No, ")
-        f.write(f"Points={points}\n")
+    key = name.strip().lower()
+
+    # today's record (with a checksum)
+    record = format_line(today, name, completions, points)
+
+    def without_today(raw_lines):
+        lines = []
+        replaced = False
+        for raw in raw_lines:
+            line = raw.decode("utf-8", errors="replace")
+            if line.strip() == "":
+                continue
+            # skip old lines from today by this same user (the whole name)
+            rec = parse_line(line)
+            if rec is not None and rec["key"] == key and rec["date"] == today:
+                replaced = True
+                continue
+            lines.append(raw)
+        if not replaced:
+            return None
+        lines.append((record + "\n").encode("utf-8"))
+        return lines
+
+    # write all other lines plus today's new one into a new file, then swap it in
+    # (lines appended by other kiosks meanwhile are kept)
+    raw_lines, new_lines = rewrite_lines(HISTORY_FILE, without_today)
+    if new_lines is None:
+        # first save today: append only, the old lines are never touched
+        append_line(HISTORY_FILE, record)
+
+    # add a checkpoint marker now and then
+    maybe_checkpoint(HISTORY_FILE)
 
 
 def load_history(name, filename=HISTORY_FILE):
     # load one user's history of scores from the text file
+    from archive import history_lines
+    from records import is_summary_text
+
     target = name.strip().lower()
     history = []
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                s = line.strip()
+        for line in history_lines(filename, target):
+            s = line.strip()
                 
-                # split and clean manually
-                items = s.split("|")
-                parts = []
-                for p in items:
-                    parts.append(p.strip())
-
-                # skip short lines
-                if len(parts) < 3:
-                    continue
+            # split and clean manually
+            items = s.split("|")
+            parts = []
+            for p in items:
+                parts.append(p.strip())
+
+            # skip short lines
+            if len(parts) < 3:
+                continue
+
+            name_in = parts[1].lower()
+            if name_in != target:
+                continue
+
+            # join the rest manually
+            rest = ""
+            for i in range(2, len(parts)):
+                rest = rest + parts[i]
+                if i < len(parts) - 1:
+                    rest = rest + "|"
+
+            # skip monthly summary records (they are not one day)
+            if is_summary_text(rest):
+                continue
+
+            # look for "Points=" in the rest text
+            if "Points=" in rest:
+                # extract the number part step by step
+                pieces = rest.split("Points=")
+                last_piece = pieces[-1]
+                last_piece = last_piece.strip()
+                last_piece = last_piece.rstrip(",")
 
-                name_in = parts[1].lower()
-                if name_in != target:
-                    continue
-
-                # join the rest manually
-                rest = ""
-                for i in range(2, len(parts)):
-                    rest = rest + parts[i]
-                    if i < len(parts) - 1:
-                        rest = rest + "|"
-
-                # look for "Points=" in the rest text
-                if "Points=" in rest:
-                    # extract the number part step by step
-                    pieces = rest.split("Points=")
-                    last_piece = pieces[-1]
-                    last_piece = last_piece.strip()
-                    last_piece = last_piece.rstrip(",")
-
-                    try:
-                        p = int(last_piece)
-                        history.append(p)
-                    except ValueError:
-                        pass
+                try:
+                    p = int(last_piece)
+                    history.append(p)
+                except ValueError:
+                    pass
 
     except FileNotFoundError:
         # if no file yet, just return an empty list
@@ -124,43 +145,66 @@ def calc_streak(history):
     return streak
 
 
-def weekly_average(name, filename=HISTORY_FILE):
+def weekly_average(name, filename=HISTORY_FILE, use_index=True):
     """
     Calculate the average of the most recent days (one per date).
     Each day only counts once (the last record if multiple exist).
+    With use_index=False the whole history is read (the original way).
     """
+    from archive import history_lines
+    from records import is_summary_text
+
+    if use_index:
+        from date_index import fast_weekly_average
+        from shadow import get_shadow
+
+        # a sorted file is read from the end, only as far back as needed
+        def indexed():
+            avg = fast_weekly_average(name, filename)
+            if avg is None:
+                avg = weekly_average(name, filename, use_index=False)
+            return avg
+
+        # in shadow mode some calls are also answered the original way and compared
+        return get_shadow(filename).compare("weekly_average", indexed,
+                                            lambda: weekly_average(name, filename, use_index=False), name)
+
     day_scores = {}  # store date → score for that day
+    target = name.strip().lower()
 
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line == "":
-                    continue
+        for line in history_lines(filename, target):
+            line = line.strip()
+            if line == "":
+                continue
 
-                # check if this line is for the current user
-                if name.lower() not in line.lower():
-                    continue
+            parts = line.split("|")
+            if len(parts) < 3:
+                continue
 
-                parts = line.split("|")
-                if len(parts) < 3:
-                    continue
+            # check if this line is for the current user (the whole name, not a part of it)
+            if parts[1].strip().lower() != target:
+                continue
 
-                date_text = parts[0].strip()
+            date_text = parts[0].strip()
 
-                # only continue if "Points=" exists
-                if "Points=" not in line:
-                    continue
+            # skip monthly summary records (they are not one day)
+            if is_summary_text(parts[2].strip()):
+                continue
 
-                try:
-                    # get number after "Points="
-                    p_text = line.split("Points=")[-1].strip()
-                    p = int(p_text)
-                except:
-                    continue
+            # only continue if "Points=" exists
+            if "Points=" not in line:
+                continue
 
-                # always keep the last record for that date
-                day_scores[date_text] = p
+            try:
+                # get number after "Points="
+                p_text = line.split("Points=")[-1].strip()
+                p = int(p_text)
+            except:
+                continue
+
+            # always keep the last record for that date
+            day_scores[date_text] = p
 
     except FileNotFoundError:
         return 0
@@ -186,8 +230,10 @@ def weekly_average(name, filename=HISTORY_FILE):
 
 def load_totals_all(filename=HISTORY_FILE):
     # load total points for all users from the text file
-    totals = {}     # store total points for each user by lowercase name
-    display = {}    # store original names for showing
+    # totals by lowercase name and original names for showing;
+    # archived history comes from its cached totals, then the live file is added
+    from archive import archive_totals
+    totals, display = archive_totals(filename)
 
     try:
         with open(filename, "r") as f:
@@ -308,12 +354,27 @@ def get_user_rank(name):
 
 # GUI section
 class HabitGUI:
-    def __init__(self, root):
+    def __init__(self, root, resident_options=None):
         # basic window setup
+        # (resident_options: keep the history in memory for the whole session,
+        #  see resident_store.py, e.g. {"flush_seconds": 5, "max_dirty": 50})
         self.root = root
         self.root.title("💪 Health Habit Tracker")
         self.current_user = "Friend"
 
+        # score board for "top X%" answers, built on first use
+        self.score_board = None
+        self.score_board_stamp = None
+
+        # tail reader: keeps the ranking up to date by reading only new lines;
+        # it is created in load_data, after the window is on screen
+        self.tail = None
+        self.loaded = False
+
+        # resident mode: one in-memory store serves every button, saves are written in batches
+        self.resident_options = resident_options
+        self.store = None
+
         # use a better looking theme
         self.style = ttk.Style()
         try:
@@ -343,16 +404,10 @@ class HabitGUI:
         ttk.Button(root, text="Confirm", style="Primary.TButton", command=self.use_name)\
             .grid(row=2, column=2, padx=(4,12), pady=6, sticky="w")
 
-        # Habits section
-        habits_card = ttk.Labelframe(root, text="Today's Habits", style="Card.TLabelframe")
-        habits_card.grid(row=3, column=0, columnspan=3, padx=12, pady=8, sticky="ew")
-
-        self.habits = ["Drink water", "Exercise", "Sleep 8 hours"]
-        self.check_vars = {}
-        for i, h in enumerate(self.habits):
-            var = tk.IntVar()
-            self.check_vars[h] = var
-            ttk.Checkbutton(habits_card, text=h, variable=var).grid(row=i, column=0, sticky="w", pady=2)
+        # Habits section (the habits come from habits.json and can differ per user)
+        self.habits_card = ttk.Labelframe(root, text="Today's Habits", style="Card.TLabelframe")
+        self.habits_card.grid(row=3, column=0, columnspan=3, padx=12, pady=8, sticky="ew")
+        self.show_habits()
 
         # Progress bar
         self.pbar = ttk.Progressbar(root, orient="horizontal", mode="determinate", length=280)
@@ -376,10 +431,123 @@ class HabitGUI:
         self.output.grid(row=6, column=0, columnspan=3, padx=12, pady=(4,12), sticky="nsew")
         self.output.insert(tk.END, "Welcome! Enter your name and check your habits.\n")
 
+        # live top 3, refreshed by a timer
+        self.live_label = ttk.Label(root, text="Live top 3: loading...", style="Body.TLabel")
+        self.live_label.grid(row=7, column=0, columnspan=3, padx=12, pady=(0,12), sticky="w")
+
         # make text box stretch when window is resized
         root.grid_rowconfigure(6, weight=1)
         root.grid_columnconfigure(1, weight=1)
 
+        # write what is still waiting when the window is closed
+        root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Tk draws the window when it is idle; our callback runs after that drawing
+        self.root.after_idle(self.first_paint)
+
+    def first_paint(self):
+        # the window is on screen now: read the history in the next idle moment
+        startup_profile.mark("first window")
+        self.root.after_idle(self.load_data)
+
+    def load_data(self):
+        # check the history for crash damage and load the ranking (only the first call does anything;
+        # the buttons call it too, in case they are clicked before the history was loaded)
+        if self.loaded:
+            return
+        self.loaded = True
+        from leaderboard_snapshot import load_tail
+        from recovery import recover
+
+        # check the end of the history file for damage from a crash
+        report = recover(HISTORY_FILE)
+        if len(report["problems"]) > 0:
+            self.output.insert(tk.END, f"{len(report['problems'])} damaged line(s) found in the history, "
+                                       "moved to progress.txt.quarantine\n")
+
+        if self.resident_options is not None:
+            # read the whole history once; from now on the buttons use memory only
+            from resident_store import ResidentStore
+            self.store = ResidentStore(HISTORY_FILE, **self.resident_options)
+        else:
+            # it starts from the saved leaderboard snapshot, so the first ranking is quick
+            self.tail = load_tail(HISTORY_FILE)
+
+        # start the live ranking refresh
+        self.auto_refresh()
+
+    def auto_refresh(self):
+        # read only newly added lines; redraw the live top 3 and save the snapshot if something changed
+        if self.store is not None:
+            # resident mode: write waiting saves if the durability window is over,
+            # and pick up records other programs wrote
+            self.store.maybe_flush()
+            self.store.sync()
+            self.update_live_label()
+        else:
+            from leaderboard_snapshot import refresh
+            if refresh(self.tail):
+                self.update_live_label()
+        self.root.after(REFRESH_MS, self.auto_refresh)
+
+    def on_close(self):
+        # the window's close button: save what is still waiting, then quit
+        if self.store is not None:
+            self.store.close()
+        self.root.destroy()
+
+    def in_step(self):
+        # True if the store / tail reader holds exactly what is on disk,
+        # so shadow mode can compare it with the original functions
+        from shadow import state_in_step
+        if self.store is not None:
+            return state_in_step(self.store)
+        try:
+            st = os.stat(HISTORY_FILE)
+        except FileNotFoundError:
+            return self.tail.position.offset == 0
+        return st.st_ino == self.tail.position.inode and st.st_size == self.tail.position.offset
+
+    def ranking_rows(self, top_n=None):
+        # [display_name, total_points] rows, best first, from the store or the tail reader
+        # (in shadow mode, some calls are checked against load_totals_all)
+        from shadow import get_shadow, legacy_leaderboard
+        if self.store is not None:
+            fast = lambda: self.store.leaderboard(top_n)
+        else:
+            fast = lambda: self.tail.leaderboard(top_n)
+        return get_shadow(HISTORY_FILE).compare("leaderboard", fast,
+                                                lambda: legacy_leaderboard(HISTORY_FILE, top_n), top_n,
+                                                self.in_step)
+
+    def update_live_label(self):
+        # show the current top 3 users in one line
+        top = self.ranking_rows(3)
+        if len(top) == 0:
+            self.live_label.config(text="Live top 3: no records yet")
+            return
+        items = []
+        for i in range(len(top)):
+            items.append(f"{i + 1}. {top[i][0]} ({top[i][1]})")
+        self.live_label.config(text="Live top 3: " + "   ".join(items))
+
+    def show_habits(self):
+        # (re)build one checkbox per habit of the current user
+        from habit_config import get_config_or_default
+        for widget in self.habits_card.winfo_children():
+            widget.destroy()
+        self.config, problem = get_config_or_default()
+        self.habits = self.config.habits_for(self.current_user)
+        self.check_vars = {}
+        for i, h in enumerate(self.habits):
+            var = tk.IntVar()
+            self.check_vars[h] = var
+            ttk.Checkbutton(self.habits_card, text=h, variable=var).grid(row=i, column=0, sticky="w", pady=2)
+        if problem is not None:
+            # a broken habits.json: say so under the default habits
+            ttk.Label(self.habits_card, text=problem, style="Body.TLabel", wraplength=360)\
+                .grid(row=len(self.habits), column=0, sticky="w", pady=2)
+
     def use_name(self):
         # handle the name input and switch user
         name = self.name_var.get().strip()
@@ -387,10 +555,12 @@ class HabitGUI:
             name = "Friend"
             self.name_var.set(name)
         self.current_user = name
+        self.show_habits()
         self.output.insert(tk.END, "\nSwitched to user: " + name + "\n")
 
     def save_today_gui(self):
         # save today’s habit results from checkboxes
+        self.load_data()
         completions = {}
         score = 0
         for h in self.habits:
@@ -399,12 +569,10 @@ class HabitGUI:
 
         total = len(self.habits)
         rate = (score / total) if total else 0.0
-        points = score
+        # each habit is worth its weight, plus a bonus if all habits are done
+        points = self.config.points_for(completions)
         badge = None
-
-        # give bonus if all habits are done
         if score == total and total > 0:
-            points += 1
             badge = "All Clear!"
         
         # feedback messages based on completion rate
@@ -430,10 +598,23 @@ class HabitGUI:
         self.progress_label.config(text="Progress: " + str(int(rate * 100)) + "%")
 
         # save result and show feedback
-        save_today(self.current_user, points, completions)
-        hist = load_history(self.current_user)
-        streak = calc_streak(hist)
-        avg = weekly_average(self.current_user)
+        if self.store is not None:
+            # resident mode: saved in memory, written to the file by the next flush
+            self.store.save(self.current_user, completions, points)
+            # (in shadow mode, checked against the original functions once the save is written)
+            from shadow import get_shadow
+            shadow = get_shadow(HISTORY_FILE)
+            user = self.current_user
+            streak = shadow.compare("streak", lambda: self.store.streak_of(user),
+                                    lambda: calc_streak(load_history(user)), user, self.in_step)
+            avg = shadow.compare("weekly_average", lambda: self.store.weekly_average_of(user),
+                                 lambda: weekly_average(user, use_index=False), user, self.in_step)
+        else:
+            stamp_before = self.history_stamp() # to tell our own change from other programs' changes
+            save_today(self.current_user, points, completions)
+            hist = load_history(self.current_user)
+            streak = calc_streak(hist)
+            avg = weekly_average(self.current_user)
 
         self.output.insert(tk.END, "\n==== Today (" + self.current_user + ") ====\n")
         self.output.insert(tk.END, "Points: " + str(points) + "\n")
@@ -443,12 +624,39 @@ class HabitGUI:
         self.output.insert(tk.END, "Streak: " + str(streak) + " days\n")
         self.output.insert(tk.END, "7-day average: " + str(avg) + "\n")
 
+        if self.store is not None:
+            self.update_live_label()
+        else:
+            # catch up the live ranking and its snapshot with the new record
+            from leaderboard_snapshot import refresh
+            if refresh(self.tail):
+                self.update_live_label()
+
+            # update the score board with the new total (no full rebuild),
+            # unless another program wrote since it was built: then rebuild it on next use
+            if self.score_board is not None:
+                if self.score_board_stamp == stamp_before:
+                    # the tail's total counts every line (the history leaves out monthly summaries)
+                    self.score_board.set_total(self.current_user,
+                                               self.tail.totals.get(self.current_user.strip().lower(), 0))
+                    self.score_board_stamp = self.history_stamp()
+                else:
+                    self.score_board = None
+
         # clear all checkboxes after saving
         self.clear_checks()
 
     def show_rank(self):
         # show the current user's ranking information
-        rank, total, total_users = get_user_rank(self.current_user)
+        self.load_data()
+        if self.store is not None:
+            # (in shadow mode, some calls are checked against get_user_rank)
+            from shadow import get_shadow
+            user = self.current_user
+            rank, total, total_users = get_shadow(HISTORY_FILE).compare(
+                "rank", lambda: self.store.rank_of(user), lambda: get_user_rank(user), user, self.in_step)
+        else:
+            rank, total, total_users = get_user_rank(self.current_user)
 
         # start writing into the text box
         self.output.insert(tk.END, "\n==== My Rank ====\n")
@@ -460,45 +668,44 @@ class HabitGUI:
             self.output.insert(tk.END, "Rank: N/A (no records yet)\n")
         else:
             self.output.insert(tk.END, f"Rank: {rank} out of {total_users}\n")
+            if rank <= total_users:
+                if self.store is not None:
+                    top = self.store.percentile(self.current_user)
+                else:
+                    top = self.get_score_board().percentile(self.current_user)
+                self.output.insert(tk.END, f"You're in the top {top}% of users\n")
+
+    def history_stamp(self):
+        # (modified time, size) of progress.txt, or None if there is no file yet
+        try:
+            st = os.stat(HISTORY_FILE)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime, st.st_size)
+
+    def get_score_board(self):
+        # build the score board the first time, or again if another program changed the file
+        stamp = self.history_stamp()
+        if self.score_board is None or stamp != self.score_board_stamp:
+            from score_index import build_score_board
+            totals, display = load_totals_all()
+            self.score_board = build_score_board(totals)
+            self.score_board_stamp = stamp
+        return self.score_board
 
     def show_rankinglist(self):
     # show top users ranking list from progress.txt
 
-    # load all users' total points from the file
-        totals, display = load_totals_all()
-
-    # build a list that stores name, total_points
-        order = []
-        for key in totals:
-            name_text = display[key]
-            total_points = totals[key]
-            one_row = [name_text, total_points]
-            order.append(one_row)
-
-    # sort the list by score (high to low) using bubble sort
-    # if two users have same score, sort alphabetically by name
-        i = 0
-        while i < len(order):
-            j = 0
-            while j < len(order) - 1 - i:
-                a_name = order[j][0].lower()
-                a_score = order[j][1]
-                b_name = order[j + 1][0].lower()
-                b_score = order[j + 1][1]
-
-                need_swap = False
-                if a_score < b_score:
-                    need_swap = True
-                elif a_score == b_score and a_name > b_name:
-                    need_swap = True
-
-                if need_swap:
-                    temp = order[j]
-                    order[j] = order[j + 1]
-                    order[j + 1] = temp
-
-                j = j + 1
-            i = i + 1
+    # catch up with any new lines, then take the ranking from memory
+    # (only newly added records are read, not the whole file)
+        self.load_data()
+        if self.store is not None:
+            self.store.sync()
+        else:
+            from leaderboard_snapshot import refresh
+            refresh(self.tail)
+        self.update_live_label()
+        order = self.ranking_rows()
 
         # get today's date and number of users
         today_str = str(date.today())
@@ -536,6 +743,31 @@ class HabitGUI:
 
 # Run the GUI
 if __name__ == "__main__":
+    if startup_profile.requested() and not startup_profile.is_child():
+        # python gui_main.py --profile-startup: time this program up to its first window
+        sys.exit(startup_profile.profile(os.path.abspath(__file__), "first window"))
+
+    # python gui_main.py --resident [--flush-seconds 5] [--max-dirty 50] [--shadow-rate 0.05]
+    resident_options = None
+    if len(startup_profile.strip_flag(sys.argv[1:])) > 0:
+        import argparse
+        parser = argparse.ArgumentParser(description="Health Habit Tracker window.")
+        parser.add_argument("--resident", action="store_true",
+                            help="keep the history in memory and write saves in batches (kiosk mode)")
+        parser.add_argument("--flush-seconds", type=float, default=5,
+                            help="longest time a save waits before it is written (default: 5)")
+        parser.add_argument("--max-dirty", type=int, default=50,
+                            help="write as soon as this many saves are waiting (default: 50)")
+        parser.add_argument("--shadow-rate", type=float,
+                            help="fraction of calls (0..1) to also answer with the original functions "
+                                 "and record differences and timings (see shadow.py)")
+        args = parser.parse_args(startup_profile.strip_flag(sys.argv[1:]))
+        if args.resident:
+            resident_options = {"flush_seconds": args.flush_seconds, "max_dirty": args.max_dirty}
+        if args.shadow_rate is not None:
+            from shadow import get_shadow
+            get_shadow(HISTORY_FILE, min(max(args.shadow_rate, 0.0), 1.0))
+
     root = tk.Tk()
-    app = HabitGUI(root)
+    app = HabitGUI(root, resident_options)
     root.mainloop()
@@ -0,0 +1,214 @@
+"""
+Per-habit analytics, computed in one pass over the whole history.
+
+For every habit:
+    - completion rate: how often it was done on the days it was tracked
+    - weekday pattern: the completion rate for each day of the week
+For every pair of habits tracked on the same day:
+    - correlation (phi coefficient, from -1 to 1): 1 means they are always done
+      together, 0 means no link, -1 means doing one goes with skipping the other
+
+Only counters are kept while reading (no records are stored), so memory does
+not grow with the size of the history. Monthly summaries (rollup.py) are
+skipped, because they don't say which days a habit was done.
+
+Example:
+    python habit_analytics.py
+    python habit_analytics.py --user Harry --json
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+
+from archive import history_lines
+from records import parse_line
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+class HabitStats:
+    """
+    Running counters for the analytics report.
+    """
+
+    def __init__(self):
+        """
+        Start with no records.
+        """
+        self.records = 0
+        self.tracked = {} # habit -> days it was tracked
+        self.done = {} # habit -> days it was done
+        self.weekday_tracked = {} # habit -> [count per weekday]
+        self.weekday_done = {} # habit -> [count per weekday]
+        self.pairs = {} # (habit a, habit b) -> [days both tracked, a done, b done, both done]
+        self._weekday_of = {} # date text -> weekday number (many records share a date)
+
+    def add(self, date_text, habits):
+        """
+        Count one day of one user (habits: habit name -> 1 or 0).
+        """
+        weekday = self._weekday_of.get(date_text)
+        if weekday is None:
+            try:
+                weekday = datetime.date.fromisoformat(date_text).weekday()
+            except ValueError:
+                return
+            self._weekday_of[date_text] = weekday
+
+        self.records += 1
+        names = sorted(habits)
+        for habit in names:
+            if habit not in self.tracked:
+                self.tracked[habit] = 0
+                self.done[habit] = 0
+                self.weekday_tracked[habit] = [0] * 7
+                self.weekday_done[habit] = [0] * 7
+            self.tracked[habit] += 1
+            self.weekday_tracked[habit][weekday] += 1
+            if habits[habit] == 1:
+                self.done[habit] += 1
+                self.weekday_done[habit][weekday] += 1
+
+        # every pair of habits tracked on this day
+        for i in range(len(names)):
+            a = names[i]
+            for j in range(i + 1, len(names)):
+                b = names[j]
+                counts = self.pairs.get((a, b))
+                if counts is None:
+                    counts = [0, 0, 0, 0]
+                    self.pairs[(a, b)] = counts
+                counts[0] += 1
+                counts[1] += habits[a]
+                counts[2] += habits[b]
+                counts[3] += habits[a] * habits[b]
+
+    def completion_rate(self, habit):
+        """
+        Return how often the habit was done, in percent (None if never tracked).
+        """
+        if self.tracked.get(habit, 0) == 0:
+            return None
+        return round(100.0 * self.done[habit] / self.tracked[habit], 1)
+
+    def weekday_rates(self, habit):
+        """
+        Return the completion rate in percent for Monday..Sunday (None for days without data).
+        """
+        rates = []
+        for day in range(7):
+            tracked = self.weekday_tracked[habit][day]
+            if tracked == 0:
+                rates.append(None)
+            else:
+                rates.append(round(100.0 * self.weekday_done[habit][day] / tracked, 1))
+        return rates
+
+    def correlation(self, a, b):
+        """
+        Return the phi coefficient of two habits (None if it can't be computed,
+        e.g. one of them was always done).
+        """
+        if (a, b) not in self.pairs:
+            a, b = b, a
+        counts = self.pairs.get((a, b))
+        if counts is None:
+            return None
+        n, done_a, done_b, both = counts
+        bottom = done_a * (n - done_a) * done_b * (n - done_b)
+        if bottom == 0:
+            return None
+        return round((n * both - done_a * done_b) / math.sqrt(bottom), 3)
+
+    def report(self):
+        """
+        Return the whole report as plain data (ready for JSON).
+        """
+        habits = []
+        for habit in sorted(self.tracked):
+            habits.append({
+                "habit": habit,
+                "tracked": self.tracked[habit],
+                "done": self.done[habit],
+                "rate": self.completion_rate(habit),
+                "weekdays": dict(zip(WEEKDAYS, self.weekday_rates(habit))),
+            })
+        pairs = []
+        for a, b in sorted(self.pairs):
+            pairs.append({"habits": [a, b], "days": self.pairs[(a, b)][0],
+                          "correlation": self.correlation(a, b)})
+        return {"records": self.records, "habits": habits, "pairs": pairs}
+
+
+def analyze(filename=HISTORY_FILE, users=None):
+    """
+    Read the history once (archive + live file) and return a filled HabitStats.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        users (iterable of str): only count these users (None = everyone)
+    """
+    keys = None
+    if users is not None:
+        keys = set()
+        for u in users:
+            keys.add(u.strip().lower())
+
+    stats = HabitStats()
+    try:
+        for line in history_lines(filename):
+            rec = parse_line(line)
+            if rec is None or rec["summary"] or len(rec["habits"]) == 0:
+                continue
+            if keys is not None and rec["key"] not in keys:
+                continue
+            stats.add(rec["date"], rec["habits"])
+    except FileNotFoundError:
+        pass
+    return stats
+
+
+def _percent(value):
+    if value is None:
+        return "   -"
+    return f"{value:4.0f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Completion rates, weekday patterns and correlations per habit.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--user", action="append", dest="users", help="only this user (can repeat)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    stats = analyze(args.file, args.users)
+    report = stats.report()
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"\n===== Habit report ({report['records']} day records) =====")
+    if report["records"] == 0:
+        print("No records yet.")
+        return
+    print(f"{'Habit':<20} {'Rate':>6}   " + " ".join(f"{d:>4}" for d in WEEKDAYS))
+    for row in report["habits"]:
+        days = " ".join(_percent(row["weekdays"][d]) for d in WEEKDAYS)
+        print(f"{row['habit']:<20} {row['rate']:>5}%   {days}")
+
+    if len(report["pairs"]) > 0:
+        print("\nCorrelation between habits (-1 .. 1):")
+        for row in report["pairs"]:
+            value = row["correlation"]
+            text = "n/a" if value is None else f"{value:+.2f}"
+            print(f"  {row['habits'][0]} / {row['habits'][1]}: {text}  ({row['days']} days)")
+
+
+if __name__ == "__main__":
+    main()
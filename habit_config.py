@@ -0,0 +1,267 @@
+"""
+Habit definitions, read from habits.json.
+
+Example habits.json:
+    {
+      "habits": [
+        {"id": "w", "name": "Drink water",   "weight": 1},
+        {"id": "e", "name": "Exercise",      "weight": 2},
+        {"id": "s", "name": "Sleep 8 hours", "weight": 1},
+        {"id": "m", "name": "Meditate",      "weight": 1}
+      ],
+      "all_clear_bonus": 1,
+      "default": ["w", "e", "s"],
+      "users": {"harry": ["w", "e", "s", "m"]}
+    }
+
+    id      - short code written into progress.txt instead of the habit name
+              (lowercase letters and digits), e.g. "H=w+e-s+" means
+              Drink water done, Exercise not done, Sleep 8 hours done
+    weight  - points for doing the habit
+    all_clear_bonus - extra points when every habit of the day was done
+    default - the habits everyone tracks
+    users   - a different list of habits for some users (lowercase names)
+
+Without habits.json the three original habits are used, one point each.
+
+An id stays with its habit for good: old lines only store the id, so giving
+it to another habit would change what those lines mean. Every id that was
+ever written into a record is kept in habit_ids.json (next to habits.json,
+and kept in git with it) with its habit name; the file is only written when
+a save uses an id for the first time. Lines are read with that list, so
+removing a habit from habits.json doesn't make its old records unreadable,
+and a habits.json that gives a used id to another habit is rejected
+(ValueError). With a broken habits.json, old lines can still be read, the
+programs fall back to the default habits (get_config_or_default), and new
+lines are written with full habit names.
+"""
+
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HABITS_FILE = os.path.join(BASE_DIR, "habits.json")
+
+# written into a record in place of a habit name when its id is in no list at all
+UNKNOWN_HABIT = "?"
+
+DEFAULT_CONFIG = {
+    "habits": [
+        {"id": "w", "name": "Drink water", "weight": 1},
+        {"id": "e", "name": "Exercise", "weight": 1},
+        {"id": "s", "name": "Sleep 8 hours", "weight": 1},
+    ],
+    "all_clear_bonus": 1,
+    "default": ["w", "e", "s"],
+    "users": {},
+}
+
+
+class HabitConfig:
+    """
+    The habits, their ids and weights, and which user tracks which habits.
+    """
+
+    def __init__(self, data, used_ids=None):
+        """
+        Check the config data (a dict like DEFAULT_CONFIG) and index it.
+        Raises ValueError if something is wrong.
+
+        Parameters:
+            used_ids (dict): id -> habit name of every id written before
+                             (habit_ids.json); an id may not change its habit
+        """
+        if used_ids is None:
+            used_ids = {}
+        self.names = {} # id -> habit name
+        self.ids = {} # habit name -> id
+        self.weights = {} # habit name -> points
+        self.order = [] # habit names in config order
+
+        for item in data.get("habits", []):
+            hid = str(item.get("id", ""))
+            name = str(item.get("name", "")).strip()
+            if hid == "" or not hid.isalnum() or hid != hid.lower():
+                raise ValueError(f"habit id must be lowercase letters/digits: {hid!r}")
+            if name == "" or "|" in name or "," in name or "=" in name:
+                raise ValueError(f"bad habit name: {name!r}")
+            if hid in self.names or name in self.ids:
+                raise ValueError(f"habit listed twice: {hid} / {name}")
+            if hid in used_ids and used_ids[hid] != name:
+                raise ValueError(f"habit id {hid!r} was already used for {used_ids[hid]!r}, "
+                                 f"give {name!r} a new id")
+            weight = item.get("weight", 1)
+            if not isinstance(weight, int):
+                raise ValueError(f"weight of {name} must be a whole number")
+            self.names[hid] = name
+            self.ids[name] = hid
+            self.weights[name] = weight
+            self.order.append(name)
+
+        self.bonus = data.get("all_clear_bonus", 1)
+        self.default = self._names_of(data.get("default", list(self.names.keys())))
+        self.users = {}
+        for user in data.get("users", {}):
+            self.users[user.strip().lower()] = self._names_of(data["users"][user])
+
+    def _names_of(self, ids):
+        # turn a list of ids into habit names, checking each one
+        result = []
+        for hid in ids:
+            if hid not in self.names:
+                raise ValueError(f"unknown habit id: {hid!r}")
+            result.append(self.names[hid])
+        return result
+
+    def habits_for(self, name):
+        """
+        Return the list of habit names this user tracks.
+        """
+        return list(self.users.get(name.strip().lower(), self.default))
+
+    def id_of(self, habit):
+        """
+        Return the short id of a habit name, or None if it isn't in the config.
+        """
+        return self.ids.get(habit)
+
+    def name_of(self, hid):
+        """
+        Return the habit name of an id (None if it isn't in the config).
+        """
+        return self.names.get(hid)
+
+    def points_for(self, completions):
+        """
+        Return the points for one day: the weights of the habits done,
+        plus the All Clear bonus if every habit was done.
+
+        Parameters:
+            completions (dict): habit name -> 1 (done) or 0 (not done)
+        """
+        points = 0
+        done = 0
+        for habit in completions:
+            if completions[habit] == 1:
+                points += self.weights.get(habit, 1)
+                done += 1
+        if len(completions) > 0 and done == len(completions):
+            points += self.bonus
+        return points
+
+
+def used_ids_path(filename=HABITS_FILE):
+    """
+    Return the file that keeps every id ever used, next to this habits.json.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(filename)), "habit_ids.json")
+
+
+def load_used_ids(filename=HABITS_FILE):
+    """
+    Return the id -> habit name map of habit_ids.json ({} if there is none).
+    Raises ValueError if the file is damaged.
+    """
+    try:
+        with open(used_ids_path(filename), "r") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError("habit_ids.json must hold an object of id -> habit name")
+    return data
+
+
+def _save_used_ids(filename, used_ids):
+    from recovery import open_temp_beside
+
+    path = used_ids_path(filename)
+    f, tmp_name = open_temp_beside(path, "w")
+    with f:
+        json.dump(used_ids, f, indent=1, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, path)
+
+
+# the config is read once per program run (restart the program after editing habits.json)
+_cache = {}
+_names_cache = {}
+_used_cache = {} # habits.json path -> id -> habit name of habit_ids.json
+
+
+def get_config(filename=HABITS_FILE):
+    """
+    Return the HabitConfig from habits.json (or the default one if there is no file).
+    Raises OSError or ValueError if habits.json or habit_ids.json can't be used.
+    """
+    if filename not in _cache:
+        data = DEFAULT_CONFIG
+        if os.path.exists(filename):
+            with open(filename, "r") as f:
+                data = json.load(f)
+        used_ids = load_used_ids(filename)
+        _cache[filename] = HabitConfig(data, used_ids)
+        _used_cache[filename] = used_ids
+        _names_cache.pop(filename, None)
+    return _cache[filename]
+
+
+def get_config_or_default(filename=HABITS_FILE):
+    """
+    Return (config, problem): the HabitConfig from habits.json and None, or
+    the default habits and a message saying why habits.json can't be used.
+    """
+    try:
+        return get_config(filename), None
+    except (OSError, ValueError) as e: # json.JSONDecodeError is a ValueError too
+        return HabitConfig(DEFAULT_CONFIG), f"habits.json can't be used ({e}); using the default habits."
+
+
+def remember_ids(hids, filename=HABITS_FILE):
+    """
+    Make sure habit_ids.json lists these ids before a line that uses them is
+    written. The file is only written when one of them is used for the first time.
+    """
+    used_ids = _used_cache.get(filename)
+    if used_ids is None:
+        used_ids = load_used_ids(filename)
+        _used_cache[filename] = used_ids
+    new_ids = []
+    for hid in hids:
+        if hid not in used_ids:
+            new_ids.append(hid)
+    if len(new_ids) == 0:
+        return
+
+    # another program may have added ids meanwhile: start from the file
+    used_ids = load_used_ids(filename)
+    config = get_config(filename)
+    for hid in new_ids:
+        used_ids[hid] = config.names[hid]
+    _save_used_ids(filename, used_ids)
+    _used_cache[filename] = used_ids
+    _names_cache.pop(filename, None)
+
+
+def id_names(filename=HABITS_FILE):
+    """
+    Return the id -> habit name map used to read lines: every id in
+    habit_ids.json and habits.json. Never raises, so a broken habits.json
+    or habit_ids.json doesn't stop the history from being read.
+    """
+    if filename not in _names_cache:
+        names = {}
+        try:
+            names.update(get_config(filename).names)
+        except (OSError, ValueError):
+            pass # json.JSONDecodeError is a ValueError too
+        try:
+            used_ids = load_used_ids(filename)
+        except (OSError, ValueError):
+            used_ids = {}
+        for hid in used_ids:
+            if hid not in names:
+                names[hid] = str(used_ids[hid])
+        _names_cache[filename] = names
+    return _names_cache[filename]
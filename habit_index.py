@@ -0,0 +1,349 @@
+"""
+Bitmap index over habit results.
+
+Every user gets a small number (an interned id). For each (habit, date) we keep
+one Python int used as a bitset: bit i is set if user i did that habit that day.
+Questions like "who exercised on 2025-11-01?" or "who hit All Clear every day
+this week?" then become a few AND / OR operations instead of a scan of the file.
+
+The index is saved next to the history (progress.txt.habitidx.json), so a query
+doesn't read the whole history again. get_habit_index() loads it and reads only
+the lines added since it was saved, like the tail reader; if the file was
+rewritten (a same-day replacement, rollup, archive), it is built again from the
+archive and the live file (build_from_file).
+
+Example:
+    python habit_index.py --habit Exercise --date 2025-11-01
+    python habit_index.py --all-clear --from 2025-10-27 --to 2025-11-02
+"""
+
+import argparse
+import datetime
+import json
+import os
+
+from archive import archive_lines, history_lines
+from records import parse_line
+from recovery import open_temp_beside
+from tail_reader import FilePosition
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+ALL_CLEAR = "All Clear" # pseudo-habit: every habit of that record was done
+
+INDEX_VERSION = 2
+
+
+def index_path(filename):
+    """
+    Return the saved index file name for this history file.
+    """
+    return filename + ".habitidx.json"
+
+
+def count_bits(bits):
+    """
+    Return how many bits are set in an int bitset.
+    """
+    return bin(bits).count("1")
+
+
+def date_range(start, end):
+    """
+    Return the list of date texts from start to end (inclusive).
+    """
+    first = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    days = []
+    day = first
+    while day <= last:
+        days.append(str(day))
+        day = day + datetime.timedelta(days=1)
+    return days
+
+
+class HabitIndex:
+    """
+    Bitsets per (habit, date) over interned user ids.
+    """
+
+    def __init__(self):
+        """
+        Set up an empty index.
+        """
+        self.ids = {} # lowercase name -> user id (bit position)
+        self.names = [] # user id -> display name (first seen)
+        self.bits = {} # (habit, date) -> int bitset of users who did it
+        self.active = {} # date -> int bitset of users with a record that day
+        self.habits_on = {} # date -> set of habits that have a bitset that day
+
+        # how much of the live file is in the index (see update)
+        self.position = FilePosition() # how much of the live file is indexed
+
+    def user_id(self, name):
+        """
+        Return the id of this user, giving a new one the first time.
+        """
+        key = name.strip().lower()
+        if key not in self.ids:
+            self.ids[key] = len(self.names)
+            self.names.append(name.strip())
+        return self.ids[key]
+
+    def add(self, date_text, name, habits):
+        """
+        Add (or replace) one user's record for one day.
+
+        Parameters:
+            date_text (str): e.g. "2025-11-01"
+            name (str): the user's name
+            habits (dict): habit name -> 1 (done) or 0 (not done)
+        """
+        uid = self.user_id(name)
+        bit = 1 << uid
+
+        # a later record for the same day replaces the earlier one
+        if self.active.get(date_text, 0) & bit:
+            for habit in self.habits_on.get(date_text, ()):
+                self.bits[(habit, date_text)] &= ~bit
+
+        self.active[date_text] = self.active.get(date_text, 0) | bit
+        if date_text not in self.habits_on:
+            self.habits_on[date_text] = set()
+
+        done = []
+        for habit in habits:
+            if habits[habit] == 1:
+                done.append(habit)
+        if len(habits) > 0 and len(done) == len(habits):
+            done.append(ALL_CLEAR)
+
+        for habit in done:
+            key = (habit, date_text)
+            self.bits[key] = self.bits.get(key, 0) | bit
+            self.habits_on[date_text].add(habit)
+
+    def add_record(self, rec):
+        """
+        Add one record from records.parse_line. Monthly summaries are skipped
+        (they don't say which days a habit was done).
+        """
+        if rec["summary"]:
+            return
+        self.add(rec["date"], rec["name"], rec["habits"])
+
+    def bitset(self, habit, date_text):
+        """
+        Return the raw bitset of users who did this habit on this date.
+        """
+        return self.bits.get((habit, date_text), 0)
+
+    def names_of(self, bits):
+        """
+        Turn a bitset into a sorted list of display names.
+        """
+        result = []
+        uid = 0
+        while bits:
+            if bits & 1:
+                result.append(self.names[uid])
+            bits >>= 1
+            uid += 1
+        result.sort(key=lambda n: n.lower())
+        return result
+
+    def users_who(self, habit, date_text):
+        """
+        Return the users who did this habit on this date.
+        """
+        return self.names_of(self.bitset(habit, date_text))
+
+    def completion_count(self, habit, date_text):
+        """
+        Return how many users did this habit on this date.
+        """
+        return count_bits(self.bitset(habit, date_text))
+
+    def daily_counts(self, habit, start, end):
+        """
+        Return a dict of date -> number of users who did this habit, for each day.
+        """
+        counts = {}
+        for day in date_range(start, end):
+            counts[day] = self.completion_count(habit, day)
+        return counts
+
+    def every_day(self, habit, start, end):
+        """
+        Return the users who did this habit on every day from start to end.
+        Use ALL_CLEAR as the habit for "hit All Clear every day".
+        """
+        days = date_range(start, end)
+        if len(days) == 0:
+            return []
+        bits = self.bitset(habit, days[0])
+        for day in days[1:]:
+            bits &= self.bitset(habit, day)
+            if bits == 0:
+                break
+        return self.names_of(bits)
+
+    def update(self, filename):
+        """
+        Add the lines written to the live file since the last update. If the
+        file was rewritten, start again from the archive and the whole file.
+
+        Returns:
+            changed (bool): True if the index changed
+        """
+        try:
+            f = open(filename, "rb")
+        except FileNotFoundError:
+            if self.position.inode is not None or self.position.offset > 0:
+                self.__init__()
+                return True
+            return False
+
+        with f:
+            st = os.fstat(f.fileno())
+            changed = False
+            if not self.position.is_same_file(f, st):
+                self.__init__()
+                for line in archive_lines(filename):
+                    rec = parse_line(line)
+                    if rec is not None:
+                        self.add_record(rec)
+                changed = True
+
+            # read only the new lines; a half-written last line waits for next time
+            data = self.position.read_new(f, st)
+            if data == b"":
+                return changed
+            for raw in data.split(b"\n"):
+                rec = parse_line(raw.decode("utf-8", errors="replace"))
+                if rec is not None:
+                    self.add_record(rec)
+            return True
+
+    def get_state(self):
+        """
+        Return the index as plain JSON-friendly data (bitsets as hex text).
+        """
+        days = {}
+        for date_text in self.active:
+            habits = {}
+            for habit in self.habits_on.get(date_text, ()):
+                habits[habit] = format(self.bits.get((habit, date_text), 0), "x")
+            days[date_text] = {"active": format(self.active[date_text], "x"), "habits": habits}
+        return {"version": INDEX_VERSION, "position": self.position.get_state(),
+                "names": self.names, "days": days}
+
+    def set_state(self, state):
+        """
+        Continue from a state returned by get_state.
+        """
+        self.__init__()
+        for name in state["names"]:
+            self.user_id(name)
+        for date_text in state["days"]:
+            day = state["days"][date_text]
+            self.active[date_text] = int(day["active"], 16)
+            self.habits_on[date_text] = set()
+            for habit in day["habits"]:
+                self.bits[(habit, date_text)] = int(day["habits"][habit], 16)
+                self.habits_on[date_text].add(habit)
+        self.position.set_state(state["position"])
+
+    def save(self, filename):
+        """
+        Write the index next to the history file (atomically).
+        """
+        path = index_path(filename)
+        f, tmp_name = open_temp_beside(path, "w")
+        with f:
+            json.dump(self.get_state(), f)
+        os.replace(tmp_name, path)
+
+
+def build_from_file(filename=HISTORY_FILE):
+    """
+    Build a new HabitIndex by reading the whole history (archive + live file) once.
+    """
+    index = HabitIndex()
+    try:
+        for line in history_lines(filename):
+            rec = parse_line(line)
+            if rec is not None:
+                index.add_record(rec)
+    except FileNotFoundError:
+        pass
+    return index
+
+
+# one shared index per history file, inside this program
+_indexes = {}
+
+
+def get_habit_index(filename=HISTORY_FILE):
+    """
+    Return the index of this file, caught up with the file's current end.
+    It is loaded from disk the first time, and saved again when it changed.
+    """
+    index = _indexes.get(filename)
+    if index is None:
+        index = HabitIndex()
+        try:
+            with open(index_path(filename), "r") as f:
+                state = json.load(f)
+            if state.get("version") == INDEX_VERSION:
+                index.set_state(state)
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            index = HabitIndex()
+        _indexes[filename] = index
+
+    if index.update(filename):
+        try:
+            index.save(filename)
+        except OSError:
+            pass # a read-only folder: the index still works in memory
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Habit questions answered from the bitmap index.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--habit", default=ALL_CLEAR, help="habit name (default: All Clear)")
+    parser.add_argument("--date", help="one date: list users who did the habit")
+    parser.add_argument("--from", dest="start", help="first date of a range")
+    parser.add_argument("--to", dest="end", help="last date of a range")
+    parser.add_argument("--all-clear", action="store_true", help="same as --habit 'All Clear'")
+    parser.add_argument("--counts", action="store_true", help="print daily completion counts for the range")
+    args = parser.parse_args(argv)
+
+    habit = args.habit
+    if args.all_clear:
+        habit = ALL_CLEAR
+
+    index = get_habit_index(args.file)
+    if args.date:
+        users = index.users_who(habit, args.date)
+        print(f"{habit} on {args.date}: {len(users)} user(s)")
+        for name in users:
+            print(name)
+    elif args.start and args.end:
+        if args.counts:
+            counts = index.daily_counts(habit, args.start, args.end)
+            for day in counts:
+                print(f"{day}: {counts[day]}")
+        else:
+            users = index.every_day(habit, args.start, args.end)
+            print(f"{habit} every day from {args.start} to {args.end}: {len(users)} user(s)")
+            for name in users:
+                print(name)
+    else:
+        parser.error("give --date, or --from and --to")
+
+
+if __name__ == "__main__":
+    main()
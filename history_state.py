@@ -0,0 +1,401 @@
+"""
+The whole history, loaded once and kept in memory.
+
+The menu in main.py reads progress.txt again for every action. For scripts that
+run thousands of actions in one process (python main.py --stdin), HistoryState
+reads the history once and then answers rank, leaderboard and history questions
+from memory. Its own saves update the memory directly. If another program
+changes the file, the next sync() notices (modified time / size); like
+tail_reader.HistoryTail it then reads only the lines appended since last time,
+and reloads everything only if the file was replaced or rewritten.
+
+The answers follow the same rules as main.py:
+    - totals add up every line, like load_totals_all
+    - ties are sorted alphabetically, like get_user_rank
+    - a user's history and streak use every daily record in file order,
+      monthly summaries left out, like load_history and calc_streak
+    - the weekly average uses one score per day (the last record of that day)
+      of the 7 latest days, like weekly_average
+    - a user is matched by the whole name, case-insensitive
+"""
+
+import datetime
+import os
+
+from archive import archive_lines
+from query import month_inside
+from records import format_line, format_summary_line, parse_line
+from recovery import append_line, append_lines, maybe_checkpoint, rewrite_lines
+from score_index import build_score_board
+from tail_reader import FilePosition
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+
+def file_stamp(filename):
+    """
+    Return (modified time, size) of the file, or None if it doesn't exist.
+    """
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+
+class HistoryState:
+    """
+    Totals, daily scores and summaries of every user, read from the file once.
+    """
+
+    def __init__(self, filename=HISTORY_FILE):
+        """
+        Load the history of this file into memory.
+        """
+        self.filename = filename
+        self.loads = 0 # how many times the file was read from the start
+        self.load()
+
+    def load(self):
+        """
+        Forget everything and read the whole history (archive + live file) again.
+        """
+        self.totals = {} # lowercase name -> total points (every line counts)
+        self.display = {} # lowercase name -> first-seen name, for printing
+        self.days = {} # lowercase name -> {date: (points, habits)}, last record of the day
+        self.records = {} # lowercase name -> [(date, points, habits)] of every daily record, in file order
+        self.summaries = {} # lowercase name -> {month: points} from rollup.py
+        self.order = None # sorted keys, best first (built when needed)
+        self.positions = {} # lowercase name -> rank in self.order
+        self.board = None # score_index.ScoreBoard for percentiles (built when needed)
+
+        self.position = FilePosition() # how much of the live file is in memory
+        self.stamp = None # (modified time, size) when we last looked
+
+        for line in archive_lines(self.filename):
+            rec = parse_line(line)
+            if rec is not None:
+                self.apply_record(rec)
+        self._read_appended()
+        self.loads += 1
+
+    def _read_appended(self):
+        """
+        Read the lines appended to the live file since we last read it.
+
+        Returns:
+            the list of new records, or None (nothing read) if the file was
+            replaced, truncated or rewritten before our offset; then only
+            load() gets it right
+        """
+        try:
+            f = open(self.filename, "rb")
+        except FileNotFoundError:
+            self.stamp = None
+            if self.position.inode is None and self.position.offset == 0:
+                return []
+            return None
+
+        with f:
+            st = os.fstat(f.fileno())
+            if not self.position.is_same_file(f, st):
+                return None
+
+            # read only the new lines; a half-written last line waits for next time
+            new = []
+            data = self.position.read_new(f, st)
+            if data != b"":
+                for raw in data.split(b"\n"):
+                    rec = parse_line(raw.decode("utf-8", errors="replace"))
+                    if rec is not None:
+                        self.apply_record(rec)
+                        new.append(rec)
+            self.stamp = (st.st_mtime, st.st_size)
+            return new
+
+    def _adopt_file(self, offset=None):
+        """
+        Our own write is already in memory: carry on reading after it.
+
+        offset: memory holds the file up to here (None = the end); the lines
+        after it were appended by other programs and are read by the next sync().
+        """
+        try:
+            f = open(self.filename, "rb")
+        except FileNotFoundError:
+            self.position = FilePosition()
+            self.stamp = None
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if offset is None:
+                self.position.move_to(f, st, st.st_size)
+                self.stamp = (st.st_mtime, st.st_size)
+            else:
+                self.position.move_to(f, st, offset)
+                self.stamp = None
+
+    def _replace_records(self, pairs, records):
+        """
+        Rewrite the file without the records of these (lowercase name, date)
+        pairs, with the new record lines at the end. Lines other programs
+        append meanwhile are kept (recovery.rewrite_lines).
+
+        Memory is brought up to date with the file just before it is rewritten;
+        the caller still has to swap the records in memory.
+
+        Returns:
+            the offset in the new file up to which memory holds it
+            (pass it to _adopt_file)
+        """
+        def without_pairs(raw_lines):
+            self.sync() # memory now holds at least every line of raw_lines
+            lines = []
+            for raw in raw_lines:
+                rec = parse_line(raw.decode("utf-8", errors="replace"))
+                if rec is not None and (rec["key"], rec["date"]) in pairs:
+                    continue
+                lines.append(raw)
+            for record in records:
+                lines.append((record + "\n").encode("utf-8"))
+            return lines
+
+        raw_lines, new_lines = rewrite_lines(self.filename, without_pairs)
+
+        # the new file is new_lines, then what was appended after raw_lines;
+        # memory had already read the first part of that (self.position)
+        read = 0
+        for raw in raw_lines:
+            read += len(raw)
+        written = 0
+        for raw in new_lines:
+            written += len(raw)
+        return written + self.position.offset - read
+
+    def sync(self):
+        """
+        Catch up if another program changed the file since we last looked:
+        appended lines are read on their own, anything else reloads the history.
+        Returns True if something was read.
+        """
+        if file_stamp(self.filename) == self.stamp:
+            return False
+        if self._read_appended() is None:
+            self.load()
+        return True
+
+    def apply_record(self, rec):
+        """
+        Fold one parsed record into memory.
+        """
+        key = rec["key"]
+        if key not in self.totals:
+            self.totals[key] = 0
+            self.display[key] = rec["name"]
+            self.days[key] = {}
+            self.records[key] = []
+            self.summaries[key] = {}
+        self.totals[key] = self.totals[key] + rec["points"]
+        if rec["summary"]:
+            self.summaries[key][rec["date"]] = rec["points"]
+        else:
+            self.days[key][rec["date"]] = (rec["points"], rec["habits"])
+            self.records[key].append((rec["date"], rec["points"], rec["habits"]))
+
+        # the sorted order and the score board are now out of date
+        self.order = None
+        if self.board is not None:
+            self.board.set_total(key, self.totals[key])
+
+    def forget_day(self, key, date_text):
+        """
+        Take every record of this user and day out of memory (before it is replaced).
+        """
+        if date_text not in self.days.get(key, {}):
+            return
+        kept = []
+        for record in self.records[key]:
+            if record[0] == date_text:
+                self.totals[key] = self.totals[key] - record[1]
+            else:
+                kept.append(record)
+        self.records[key] = kept
+        del self.days[key][date_text]
+        self.order = None
+        if self.board is not None:
+            self.board.set_total(key, self.totals[key])
+
+    def has_record(self, name, date_text):
+        """
+        Return True if this user already has a record for this day.
+        """
+        return date_text in self.days.get(name.strip().lower(), {})
+
+    def ranking(self):
+        """
+        Return all lowercase names sorted by total (desc), then by name (asc).
+        """
+        if self.order is None:
+            self.order = sorted(self.totals.keys(), key=lambda k: (-self.totals[k], self.display[k].lower()))
+            self.positions = {}
+            for i in range(len(self.order)):
+                self.positions[self.order[i]] = i + 1
+        return self.order
+
+    def rank_of(self, name):
+        """
+        Return (rank, user_total, total_users), same as get_user_rank in main.py.
+        """
+        order = self.ranking()
+        if len(order) == 0:
+            return (1, 0, 0)
+        target = name.strip().lower()
+        if target not in self.totals:
+            return (len(order) + 1, 0, len(order))
+        return (self.positions[target], self.totals[target], len(order))
+
+    def percentile(self, name):
+        """
+        Return the "top X%" of this user (see score_index.ScoreBoard.percentile).
+        """
+        if self.board is None:
+            self.board = build_score_board(self.totals)
+        return self.board.percentile(name)
+
+    def leaderboard(self, top_n=None, window_days=None, today=None):
+        """
+        Return a list of [display_name, points], best first.
+
+        Parameters:
+            top_n (int): how many rows to return (None = all)
+            window_days (int): only count the last N days, today included
+                               (None = all time; a monthly summary only counts
+                               if its whole month is inside the window)
+            today (datetime.date): the last day of the window (default: today)
+        """
+        if window_days is None:
+            keys = self.ranking()
+            points = self.totals
+        else:
+            if today is None:
+                today = datetime.date.today()
+            start = str(today - datetime.timedelta(days=window_days - 1))
+            end = str(today)
+            points = {}
+            for key in self.days:
+                total = 0
+                found = False
+                for date_text in self.days[key]:
+                    if start <= date_text <= end:
+                        total += self.days[key][date_text][0]
+                        found = True
+                for month_text in self.summaries[key]:
+                    if month_inside(month_text, start, end):
+                        total += self.summaries[key][month_text]
+                        found = True
+                if found:
+                    points[key] = total
+            keys = sorted(points.keys(), key=lambda k: (-points[k], self.display[k].lower()))
+
+        if top_n is not None:
+            keys = keys[:top_n]
+        rows = []
+        for k in keys:
+            rows.append([self.display[k], points[k]])
+        return rows
+
+    def history_of(self, name):
+        """
+        Return one user's daily records as a list of (date, points, habits), in
+        file order (like load_history, which has the same points in the same order).
+        """
+        return list(self.records.get(name.strip().lower(), []))
+
+    def streak_of(self, name):
+        """
+        Return the number of positive records in a row at the end of the history (like calc_streak).
+        """
+        streak = 0
+        for date_text, points, habits in reversed(self.history_of(name)):
+            if points > 0:
+                streak += 1
+            else:
+                break
+        return streak
+
+    def weekly_average_of(self, name):
+        """
+        Return the average points of the 7 latest days with a record (like weekly_average).
+        """
+        days = self.days.get(name.strip().lower(), {})
+        last_days = sorted(days)[-7:]
+        if len(last_days) == 0:
+            return 0
+        total_points = 0
+        for date_text in last_days:
+            total_points += days[date_text][0]
+        return round(total_points / len(last_days), 1)
+
+    def save(self, name, completions, points, date_text=None):
+        """
+        Save one user's record for a day (today by default), replacing an
+        older record of that user for that day, and update memory.
+
+        A first record of the day is just appended; only a replacement
+        needs to rewrite the file.
+        """
+        self.sync()
+        if date_text is None:
+            date_text = str(datetime.date.today())
+        record = format_line(date_text, name, completions, points)
+        key = name.strip().lower()
+
+        if not self.has_record(name, date_text):
+            append_line(self.filename, record)
+            end = None
+        else:
+            end = self._replace_records({(key, date_text)}, [record])
+            # take the old record's points back out of memory
+            self.forget_day(key, date_text)
+
+        self.apply_record(parse_line(record))
+        maybe_checkpoint(self.filename)
+        self._adopt_file(end)
+
+    def import_lines(self, lines):
+        """
+        Add records from another history file (same line format) in one write.
+        Records for a user and day (or month) we already have are skipped.
+
+        Returns:
+            (added, skipped): number of records written / left out
+        """
+        self.sync()
+        added = []
+        skipped = 0
+        for line in lines:
+            rec = parse_line(line)
+            if rec is None:
+                skipped += 1
+                continue
+            key = rec["key"]
+            if rec["summary"]:
+                if rec["date"] in self.summaries.get(key, {}):
+                    skipped += 1
+                    continue
+                text = format_summary_line(rec["date"], rec["name"], rec["days"], rec["habits"], rec["points"])
+            else:
+                if self.has_record(key, rec["date"]):
+                    skipped += 1
+                    continue
+                text = format_line(rec["date"], rec["name"], rec["habits"], rec["points"])
+            # written again with a fresh checksum, in this file's format
+            added.append(text)
+            self.apply_record(parse_line(text))
+
+        append_lines(self.filename, added)
+        if len(added) > 0:
+            maybe_checkpoint(self.filename)
+        self._adopt_file()
+        return (len(added), skipped)
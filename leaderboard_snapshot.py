@@ -0,0 +1,89 @@
+"""
+Materialized leaderboard snapshot.
+
+Instead of rebuilding the ranking from the whole history file on every start,
+we keep a small JSON file next to it (progress.txt.leaderboard.json) with:
+    - the sorted rows: [display name, total points]
+    - each user's current streak
+    - the byte offset / inode / last bytes of the history file it was built from
+
+Readers load the snapshot and then replay only the part of progress.txt written
+after it (see tail_reader.HistoryTail). If the history file was rewritten in the
+middle, the tail reader notices and rebuilds from scratch.
+The snapshot is written atomically (temporary file + os.replace).
+"""
+
+import json
+import os
+
+from recovery import open_temp_beside
+from tail_reader import HistoryTail
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path(filename):
+    """
+    Return the snapshot file name for this history file.
+    """
+    return filename + ".leaderboard.json"
+
+
+def load_tail(filename=HISTORY_FILE):
+    """
+    Return a HistoryTail for this history file, starting from the snapshot if
+    there is a usable one. Call poll() on it to catch up with new lines.
+    """
+    tail = HistoryTail(filename)
+    try:
+        with open(snapshot_path(filename), "r") as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        # no snapshot yet, or a broken one: start from the beginning
+        return tail
+
+    if state.get("version") != SNAPSHOT_VERSION:
+        return tail
+    try:
+        tail.set_state(state)
+    except (KeyError, TypeError, ValueError):
+        tail.reset()
+    return tail
+
+
+def save_snapshot(tail):
+    """
+    Write the tail reader's current state to the snapshot file atomically.
+    """
+    state = tail.get_state()
+    state["version"] = SNAPSHOT_VERSION
+
+    path = snapshot_path(tail.filename)
+    f, tmp_name = open_temp_beside(path, "w")
+    with f:
+        json.dump(state, f)
+    os.replace(tmp_name, path)
+
+
+def refresh(tail):
+    """
+    Catch up with new lines and write a new snapshot if anything changed.
+    Returns True if the leaderboard may have changed.
+    """
+    changed = tail.poll()
+    if changed:
+        save_snapshot(tail)
+    return changed
+
+
+def load_leaderboard(filename=HISTORY_FILE, top_n=None):
+    """
+    Return the leaderboard rows [display_name, total_points], best first,
+    using the snapshot plus only the unread end of the history file.
+    """
+    tail = load_tail(filename)
+    refresh(tail)
+    return tail.leaderboard(top_n)
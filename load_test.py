@@ -0,0 +1,235 @@
+"""
+Multi-process load test for the storage functions in main.py.
+
+K worker processes share one history file. For a set time, each worker runs
+a mix of save_today / get_user_rank / load_history calls for its own kiosk users.
+At the end we report:
+    - throughput (operations per second)
+    - p50 / p95 / p99 latency for each kind of operation
+    - lost or duplicated records, checked against what the workers saved
+
+The history file is seeded with older records first, so records that get lost
+when two workers rewrite the file at the same time also show up.
+
+Example:
+    python load_test.py --workers 8 --seconds 10 --users-per-worker 5
+"""
+
+import argparse
+import datetime
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import main
+
+# how often each operation is picked (out of the total)
+DEFAULT_MIX = {"save": 50, "rank": 25, "history": 25}
+
+
+def user_name(worker, index):
+    """
+    Name for one kiosk user. Fixed width, so no name is part of another
+    (save_today matches names as substrings).
+    """
+    return f"kiosk{worker:03d}-user{index:04d}"
+
+
+def seed_history(path, seed_users, seed_days):
+    """
+    Write older records that must all survive the test.
+    Returns the number of seeded lines.
+    """
+    today = datetime.date.today()
+    count = 0
+    with open(path, "w") as f:
+        for d in range(seed_days, 0, -1):
+            day = today - datetime.timedelta(days=d)
+            for u in range(seed_users):
+                f.write(f"{day} | seed{u:05d} | Drink water=Yes, Exercise=No, Sleep 8 hours=No, Points=1\n")
+                count += 1
+    return count
+
+
+def worker(worker_id, path, seconds, users, mix, start_event, result_queue):
+    """
+    Run random operations against the shared file until time is up,
+    then send latencies and the last saved points per user to the parent.
+    """
+    rnd = random.Random(worker_id)
+    ops = []
+    weights = []
+    for op in mix:
+        ops.append(op)
+        weights.append(mix[op])
+
+    latencies = {}
+    for op in ops:
+        latencies[op] = []
+    expected = {} # user name -> points of the last save
+    errors = 0
+
+    start_event.wait()
+    stop_at = time.perf_counter() + seconds
+    while time.perf_counter() < stop_at:
+        op = rnd.choices(ops, weights=weights)[0]
+        name = user_name(worker_id, rnd.randrange(users))
+
+        t0 = time.perf_counter()
+        try:
+            if op == "save":
+                completions = {"Drink water": rnd.randint(0, 1), "Exercise": rnd.randint(0, 1),
+                               "Sleep 8 hours": rnd.randint(0, 1)}
+                points = sum(completions.values())
+                if points == 3:
+                    points += 1
+                main.save_today(name, points, completions, path)
+                expected[name] = points
+            elif op == "rank":
+                main.get_user_rank(name, path)
+            else:
+                main.load_history(name, path)
+        except Exception:
+            # e.g. reading a file another worker is half-way through writing
+            errors += 1
+            continue
+        latencies[op].append(time.perf_counter() - t0)
+
+    result_queue.put((worker_id, latencies, expected, errors))
+
+
+def percentile(values, pct):
+    """
+    Return the pct-th percentile (0-100) of a list of numbers, or 0 if empty.
+    """
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    index = int(round((pct / 100.0) * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def check_final_state(path, expected, seed_lines):
+    """
+    Compare the final file with what the workers saved.
+
+    Returns:
+        (lost, duplicated, wrong_points, seed_lost)
+    """
+    today = str(datetime.date.today())
+    found = {} # user name -> list of points found for today
+    seed_found = 0
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                parts = [p.strip() for p in line.split("|")]
+                if len(parts) < 3:
+                    continue
+                if parts[1].startswith("seed"):
+                    seed_found += 1
+                    continue
+                if parts[0] != today or "Points=" not in parts[2]:
+                    continue
+                try:
+                    points = int(parts[2].split("Points=")[-1].strip())
+                except ValueError:
+                    continue
+                found.setdefault(parts[1], []).append(points)
+    except FileNotFoundError:
+        pass
+
+    lost = 0
+    duplicated = 0
+    wrong_points = 0
+    for name in expected:
+        rows = found.get(name, [])
+        if len(rows) == 0:
+            lost += 1
+        elif len(rows) > 1:
+            duplicated += 1
+        elif rows[0] != expected[name]:
+            wrong_points += 1
+    return lost, duplicated, wrong_points, seed_lines - seed_found
+
+
+def run(workers, seconds, users_per_worker, seed_users, seed_days, mix, path=None):
+    """
+    Run the load test and print a report. Returns the report as a dict.
+    """
+    tmp_dir = None
+    if path is None:
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "progress.txt")
+    seed_lines = seed_history(path, seed_users, seed_days)
+
+    start_event = multiprocessing.Event()
+    result_queue = multiprocessing.Queue()
+    procs = []
+    for w in range(workers):
+        p = multiprocessing.Process(target=worker,
+                                    args=(w, path, seconds, users_per_worker, mix, start_event, result_queue))
+        p.start()
+        procs.append(p)
+
+    start_event.set()
+    results = []
+    for i in range(workers):
+        results.append(result_queue.get())
+    for p in procs:
+        p.join()
+
+    latencies = {}
+    expected = {}
+    errors = 0
+    for worker_id, lat, exp, err in results:
+        for op in lat:
+            latencies.setdefault(op, []).extend(lat[op])
+        expected.update(exp)
+        errors += err
+
+    lost, duplicated, wrong_points, seed_lost = check_final_state(path, expected, seed_lines)
+
+    total_ops = 0
+    for op in latencies:
+        total_ops += len(latencies[op])
+
+    print("\n===== Load test =====")
+    print(f"Workers: {workers} | Duration: {seconds}s | Seeded lines: {seed_lines}")
+    print(f"Throughput: {total_ops / seconds:.1f} ops/s ({total_ops} ops, {errors} errors)")
+    print(f"{'op':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for op in sorted(latencies):
+        values = latencies[op]
+        print(f"{op:<10}{len(values):>8}{percentile(values, 50) * 1000:>10.2f}"
+              f"{percentile(values, 95) * 1000:>10.2f}{percentile(values, 99) * 1000:>10.2f}")
+    print(f"Users saved: {len(expected)}")
+    print(f"Lost: {lost} | Duplicated: {duplicated} | Wrong points: {wrong_points} | Seed lines lost: {seed_lost}")
+
+    if tmp_dir is not None:
+        os.remove(path)
+        os.rmdir(tmp_dir)
+
+    return {"ops": total_ops, "errors": errors, "lost": lost, "duplicated": duplicated,
+            "wrong_points": wrong_points, "seed_lost": seed_lost}
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the history file with many processes.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users-per-worker", type=int, default=5)
+    parser.add_argument("--seed-users", type=int, default=50)
+    parser.add_argument("--seed-days", type=int, default=30)
+    parser.add_argument("--save", type=int, default=DEFAULT_MIX["save"], help="weight of save_today calls")
+    parser.add_argument("--rank", type=int, default=DEFAULT_MIX["rank"], help="weight of get_user_rank calls")
+    parser.add_argument("--history", type=int, default=DEFAULT_MIX["history"], help="weight of load_history calls")
+    parser.add_argument("--file", help="history file to use (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    mix = {"save": args.save, "rank": args.rank, "history": args.history}
+    run(args.workers, args.seconds, args.users_per_worker, args.seed_users, args.seed_days, mix, args.file)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,6 +1,14 @@
+import startup_profile # first, so it can time everything else
+
 import os
+import sys
 import datetime
 
+# The other modules of this project (archive, records, recovery, ...) are
+# imported inside the functions that use them, so the menu shows its first
+# prompt without loading them. Python keeps a module after its first import,
+# so the later imports cost nothing.
+
 # Get the folder where this file is located 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -30,8 +38,13 @@ class HabitTracker:
         """
         Set up a new tracker for one user.
         """
+        from habit_config import get_config_or_default
+
         self.name = name
-        self.habits = ["Drink water", "Exercise", "Sleep 8 hours"]
+        self.config, problem = get_config_or_default()
+        if problem is not None:
+            print(problem)
+        self.habits = self.config.habits_for(name) # this user's habits from habits.json
         self.completions = {} # Store finish result for each habit
         self.score = 0 # Daily score
         self.total = len(self.habits) # Total number of habits
@@ -53,18 +66,18 @@ class HabitTracker:
     def reward_and_feedback(self):
         """
         Give points + feedback message to user.
-        Extra point if all habits completed.
+        Each habit is worth its weight from habits.json,
+        plus a bonus if all habits completed.
         """
         if self.total == 0:
             rate = 0
         else:
             rate = self.score * 1.0 / self.total # (score / total)
-        points = self.score # Base points
+        points = self.config.points_for(self.completions) # weights + All Clear bonus
         badge = None # If user gets perfect day
 
-        # All habits completed and get Reward +1 point
+        # All habits completed
         if self.score == self.total and self.total > 0:
-            points += 1
             badge = 'All Clear!'
 
         # Provide feedback messages based on rate
@@ -93,99 +106,113 @@ def load_history(name, filename = HISTORY_FILE):
     # Convert name to lowercase for case-insensitive matching
     target = name.strip().lower()
 
+    from archive import history_lines
+    from records import is_summary_text
+
     # This list will store all the points found for the user
     history = []
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                s = line.strip()
+        for line in history_lines(filename, target):
+            s = line.strip()
 
-                # Split the line by "|" into parts
-                parts = s.split("|")
+            # Split the line by "|" into parts
+            parts = s.split("|")
 
-                # remove extra spaces for each part
-                new_parts = []
-                for p in parts:
-                    new_parts.append(p.strip())
-                parts = new_parts
+            # remove extra spaces for each part
+            new_parts = []
+            for p in parts:
+                new_parts.append(p.strip())
+            parts = new_parts
 
-                # Skip lines that don't have enough parts
-                if len(parts) < 3:
-                    continue
+            # Skip lines that don't have enough parts
+            if len(parts) < 3:
+                continue
 
-                # Get the name part from the line and make it lowercase
-                name_in = parts[1].lower()
+            # Get the name part from the line and make it lowercase
+            name_in = parts[1].lower()
 
-                # Skip if this line belongs to another user
-                if name_in != target:
-                    continue
+            # Skip if this line belongs to another user
+            if name_in != target:
+                continue
 
-                # Combine the rest of the parts (habit info + points)
-                rest = ""
-                for k in range(2, len(parts)):
-                    if k > 2:
-                        rest = rest + "|"
-                    rest = rest + parts[k]
-
-                # Check if there is a "Points=" pattern
-                if "Points=" in rest:
-                    try:
-                        # Extract the number after "Points="
-                        number_text = rest.split("Points=")[-1]
-                        number_text = number_text.strip()
-                        number_text = number_text.rstrip(",")
-                        p = int(number_text)
-
-                        # Save this score into list
-                        history.append(p)
-                    except ValueError:
-                        pass
+            # Combine the rest of the parts (habit info + points)
+            rest = ""
+            for k in range(2, len(parts)):
+                if k > 2:
+                    rest = rest + "|"
+                rest = rest + parts[k]
+
+            # Skip monthly summary records (old days rolled up by rollup.py),
+            # they don't belong to a single day
+            if is_summary_text(rest):
+                continue
+
+            # Check if there is a "Points=" pattern
+            if "Points=" in rest:
+                try:
+                    # Extract the number after "Points="
+                    number_text = rest.split("Points=")[-1]
+                    number_text = number_text.strip()
+                    number_text = number_text.rstrip(",")
+                    p = int(number_text)
+
+                    # Save this score into list
+                    history.append(p)
+                except ValueError:
+                    pass
     except FileNotFoundError:
         pass
 
     # Return the list of scores for this user
     return history
 
-def save_today(name, points, completions):
+def save_today(name, points, completions, filename = HISTORY_FILE):
     """
     Append or replace today's result for the user in progress.txt
     If user saves multiple times in one day, only keep the latest record.
-    """
-    today = str(datetime.date.today())
-
-    # read old lines first
-    lines = []
-    try:
-        with open(HISTORY_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                # skip empty lines
-                if line == "":
-                    continue
-                # keep all lines that are not today's same user
-                if today in line and name.lower() in line.lower():
-                    continue
-                lines.append(line)
-    except FileNotFoundError:
-        # if no file yet, just skip
-        pass
 
-    # now open file again to write (overwrite mode)
-    with open(HISTORY_FILE, "w") as f:
-        # write back all old lines first
-        for l in lines:
-            f.write(l + "\n")
+    The file is never rewritten in place: a new record is appended, and a
+    replaced record is written into a new file that is swapped in at once
+    (so a crash can't wipe the history). Every record carries a checksum.
+    """
+    from records import format_line, parse_line
+    from recovery import append_line, maybe_checkpoint, rewrite_lines
 
-        # then write today's latest record
-        f.write(f"{today} | {name.strip()} | ")
+    today = str(datetime.date.today())
+    key = name.strip().lower()
+
+    # today's latest record, with its checksum
+    record = format_line(today, name, completions, points)
+
+    def without_today(raw_lines):
+        lines = []
+        replaced = False
+        for raw in raw_lines:
+            line = raw.decode("utf-8", errors="replace")
+            # skip empty lines
+            if line.strip() == "":
+                continue
+            # keep all lines that are not today's same user
+            # (the whole name, so "Ann" saving doesn't remove "Anna")
+            rec = parse_line(line)
+            if rec is not None and rec["key"] == key and rec["date"] == today:
+                replaced = True
+                continue
+            lines.append(raw)
+        if not replaced:
+            return None
+        lines.append((record + "\n").encode("utf-8"))
+        return lines
 
-        for habit in completions:
-            if completions[habit] == 1:
-                f.write(f"{habit}=Yes, ")
-            else:
-                f.write(f"{habit}=No, ")
+    # write back all old lines, then today's latest record, into a new file
+    # (lines other programs append meanwhile are kept)
+    raw_lines, new_lines = rewrite_lines(filename, without_today)
+    if new_lines is None:
+        # first save today: just add the record at the end
+        append_line(filename, record)
 
-        f.write(f"Points={points}\n")
+    # add a checkpoint marker now and then, so startup checks stay short
+    maybe_checkpoint(filename)
 
 
 def calc_streak(history):
@@ -217,49 +244,72 @@ def calc_streak(history):
 
 
 
-def weekly_average(name, filename=HISTORY_FILE):
+def weekly_average(name, filename=HISTORY_FILE, use_index=True):
     """
     Calculate the average of the most recent days (one per date).
     Each day only counts once (the last record if multiple exist).
+    With use_index=False the whole history is read (the original way).
     """
+    from archive import history_lines
+    from records import is_summary_text
+
+    if use_index:
+        from date_index import fast_weekly_average
+        from shadow import get_shadow
+
+        # a sorted file is read from the end, only as far back as needed
+        def indexed():
+            avg = fast_weekly_average(name, filename)
+            if avg is None:
+                avg = weekly_average(name, filename, use_index=False)
+            return avg
+
+        # in shadow mode some calls are also answered the original way and compared
+        return get_shadow(filename).compare("weekly_average", indexed,
+                                            lambda: weekly_average(name, filename, use_index=False), name)
+
     day_scores = {}  # store date and score
+    target = name.strip().lower()
 
     try:
-        with open(filename, "r") as f:
-            for line in f:
-                line = line.strip()
+        for line in history_lines(filename, target):
+            line = line.strip()
 
-                # skip empty lines
-                if line == "":
-                    continue
+            # skip empty lines
+            if line == "":
+                continue
 
-                # only handle this user's data
-                if name.lower() not in line.lower():
-                    continue
+            # split into parts like ["2025-11-01", "Friend", "Drink water=Yes, ... Points=3"]
+            parts = line.split("|")
 
-                # split into parts like ["2025-11-01", "Friend", "Drink water=Yes, ... Points=3"]
-                parts = line.split("|")
+            # skip bad lines
+            if len(parts) < 3:
+                continue
 
-                # skip bad lines
-                if len(parts) < 3:
-                    continue
+            # only handle this user's data (the whole name, so "Ann" doesn't pick up "Anna")
+            if parts[1].strip().lower() != target:
+                continue
 
-                date_text = parts[0].strip()
+            date_text = parts[0].strip()
 
-                # find Points=
-                if "Points=" not in line:
-                    continue
+            # skip monthly summary records, they are not one day
+            if is_summary_text(parts[2].strip()):
+                continue
 
-                # try to get the number after Points=
-                try:
-                    split_text = line.split("Points=")
-                    last_part = split_text[-1].strip()
-                    p = int(last_part)
-                except:
-                    continue
+            # find Points=
+            if "Points=" not in line:
+                continue
 
-                # record or replace this date's score
-                day_scores[date_text] = p
+            # try to get the number after Points=
+            try:
+                split_text = line.split("Points=")
+                last_part = split_text[-1].strip()
+                p = int(last_part)
+            except:
+                continue
+
+            # record or replace this date's score
+            day_scores[date_text] = p
 
     except FileNotFoundError:
         return 0
@@ -297,8 +347,11 @@ def load_totals_all(filename = HISTORY_FILE):
         display (dict): key = lowercase name, value = original name (for printing)
     """
     
-    totals = {}  # store total points for each user
-    display = {}  # store display names for printing
+    from archive import archive_totals
+
+    # start from the archived (compressed) history: its totals are cached,
+    # so nothing has to be decompressed; then add the live file on top
+    totals, display = archive_totals(filename)
 
     try:
         f = open(filename, "r")
@@ -333,6 +386,8 @@ def load_totals_all(filename = HISTORY_FILE):
                 rest = rest + parts[k]
 
             # check if this line contains "Points="
+            # (monthly summary records from rollup.py hold a whole month's points,
+            # so they are added like any other line)
             if "Points=" in rest:
                 try:
                     # extract the number after Points=
@@ -360,7 +415,7 @@ def load_totals_all(filename = HISTORY_FILE):
     # return both dictionaries
     return totals, display
 
-def get_user_rank(name):
+def get_user_rank(name, filename = HISTORY_FILE):
     """
     Calculate the rank of a user based on total points.
 
@@ -380,7 +435,7 @@ def get_user_rank(name):
     """
 
     # load total scores for all users
-    totals, display = load_totals_all()
+    totals, display = load_totals_all(filename)
     target = name.strip().lower()
 
     # Build a list: [display_name, total_points, lower_key]
@@ -432,16 +487,106 @@ def get_user_rank(name):
 
     return (rank, user_total, len(order))
 
-def show_leaderboard(top_n = 5):
+def get_user_ranks(names, filename = HISTORY_FILE):
+    """
+    Calculate the rank of many users in one call.
+
+    The file is read once and the users are sorted once, then each name is
+    looked up in a dictionary. Results are the same as calling get_user_rank
+    for each name (same tie order, and rank = last + 1 for users with no record).
+
+    Parameters:
+        names (iterable of str): the user names to look up
+        filename (str): the file path, default is progress.txt
+
+    Yields:
+        (name, (rank, user_total, total_users)) for each name, in input order
+    """
+
+    # load total scores for all users once
+    totals, display = load_totals_all(filename)
+
+    # sort once: by score (desc), then by name (asc), same as get_user_rank
+    order = sorted(totals.keys(), key=lambda k: (-totals[k], display[k].lower()))
+
+    # remember each user's position so every lookup is O(1)
+    position = {}
+    for i in range(len(order)):
+        position[order[i]] = i + 1
+
+    total_users = len(order)
+    for name in names:
+        target = name.strip().lower()
+
+        # If no users have records yet
+        if total_users == 0:
+            yield name, (1, 0, 0)
+            continue
+
+        user_total = totals.get(target, 0)
+        rank = position.get(target, total_users + 1)
+        yield name, (rank, user_total, total_users)
+
+# Score board kept in memory for percentile questions ("top 3%").
+# It is built once, then updated step by step after each save.
+SCORE_BOARD = None
+SCORE_BOARD_STAMP = None # (modified time, size) of the file when the board was last synced
+
+def file_stamp(filename = HISTORY_FILE):
+    """
+    Return (modified time, size) of the file, or None if it doesn't exist.
+    Used to notice when another program changed the file.
+    """
+    try:
+        st = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+def get_score_board(filename = HISTORY_FILE):
+    """
+    Return the shared ScoreBoard, building it from the file the first time.
+    If the file was changed by someone else since the last sync, rebuild it.
+    """
+    global SCORE_BOARD, SCORE_BOARD_STAMP
+
+    stamp = file_stamp(filename)
+    if SCORE_BOARD is None or stamp != SCORE_BOARD_STAMP:
+        from score_index import build_score_board
+        totals, display = load_totals_all(filename)
+        SCORE_BOARD = build_score_board(totals)
+        SCORE_BOARD_STAMP = stamp
+    return SCORE_BOARD
+
+def update_score_board(name, new_total, stamp_before, filename = HISTORY_FILE):
+    """
+    Tell the score board that this user's total is now new_total.
+    Called right after our own save, so no full rebuild is needed.
+
+    stamp_before is the file stamp from just before our save. If the board
+    was not in step with the file at that moment (another program wrote to it
+    since the last sync), our change alone is not enough: the board is
+    marked out of date, so get_score_board rebuilds it next time.
+    """
+    global SCORE_BOARD_STAMP
+
+    if SCORE_BOARD is None:
+        return
+    if SCORE_BOARD_STAMP != stamp_before:
+        SCORE_BOARD_STAMP = None
+        return
+    SCORE_BOARD.set_total(name, new_total)
+    SCORE_BOARD_STAMP = file_stamp(filename)
+
+def show_leaderboard(top_n = 5, filename = HISTORY_FILE):
     """
     Print the top N users with the highest total points.
 
     Steps:
-      1. Read all users' total points from the file (using load_totals_all).
-      2. Store the data in a list: [display_name, total_points].
-      3. Sort the list in descending order by score.
-         If two users have the same score, sort them alphabetically by name.
-      4. Print the top N users. If fewer than N users exist, print all.
+      1. Load the saved leaderboard snapshot (already sorted by score desc,
+         then alphabetically by name).
+      2. Read only the history lines written after the snapshot and update it.
+      3. Print the top N users. If fewer than N users exist, print all.
 
     Example output:
       ===== Leaderboard =====
@@ -449,33 +594,13 @@ def show_leaderboard(top_n = 5):
       2. lily   -  5 pts
     """
 
-    # get all users' total scores
-    totals, display = load_totals_all()
+    from leaderboard_snapshot import load_leaderboard
+    from shadow import get_shadow, legacy_leaderboard
 
-    # Build a list: [display_name, total_points]
-    order = []
-    for key in totals:
-        one_row = [display[key], totals[key]]
-        order.append(one_row)
-
-    # Bubble sort (score desc, name asc)
-    for i in range(len(order)):
-        for j in range(0, len(order) - 1 - i):
-            a_name = order[j][0].lower()
-            a_score = order[j][1]
-            b_name = order[j + 1][0].lower()
-            b_score = order[j + 1][1]
-
-            need_swap = False
-            if a_score < b_score:
-                need_swap = True
-            elif a_score == b_score and a_name > b_name:
-                need_swap = True
-
-            if need_swap:
-                temp = order[j]
-                order[j] = order[j + 1]
-                order[j + 1] = temp
+    # sorted rows: [display_name, total_points]
+    # (in shadow mode, some calls are checked against load_totals_all)
+    order = get_shadow(filename).compare("snapshot", lambda: load_leaderboard(filename),
+                                         lambda: legacy_leaderboard(filename), None)
 
     print("\n===== Leaderboard =====")
     if len(order) == 0:
@@ -493,17 +618,57 @@ def show_leaderboard(top_n = 5):
         score_text = order[i][1]
         print(f"{rank_number}. {name_text}  -  {score_text} pts")
 
-def main():
+def main(resident_options=None):
     """
     Main menu loop for the Health Habit Tracker.
+
+    Parameters:
+        resident_options (dict): if given, keep the history in memory for the
+            whole session (resident_store.ResidentStore with these options,
+            e.g. {"flush_seconds": 5, "max_dirty": 50}) instead of reading
+            the file for every action
     """
 
+    import threading
+
     print('Welcome to the Health Habit Tracker!')
 
+    # (in the startup profile mode, the program stops here)
+    startup_profile.mark("first prompt")
+
+    # Check the end of the history file for damage from a crash.
+    # This runs in the background while the user types their name,
+    # so the first prompt doesn't wait for it.
+    reports = []
+    def check_history():
+        from recovery import recover
+        reports.append(recover(HISTORY_FILE))
+    checker = threading.Thread(target=check_history)
+    checker.start()
+
     # Ask for user name; if empty, use "Friend" as a default.
     name = input('Enter your name: ').strip()
     if name == '':
         name = 'Friend'
+
+    # nothing is read or written before the check is done
+    checker.join()
+    if len(reports) > 0 and len(reports[0]["problems"]) > 0:
+        print(str(len(reports[0]["problems"])) + " damaged line(s) found in the history file, "
+              "moved to " + os.path.basename(HISTORY_FILE) + ".quarantine")
+
+    # resident mode: read the history once; saves are written in batches
+    store = None
+    if resident_options is not None:
+        from resident_store import ResidentStore
+        store = ResidentStore(HISTORY_FILE, **resident_options)
+        store.start_timer()
+
+    # shadow mode (off unless HABIT_SHADOW_RATE or --shadow-rate is set)
+    from shadow import get_shadow, legacy_leaderboard, state_in_step
+    shadow = get_shadow(HISTORY_FILE)
+    def in_step():
+        return state_in_step(store)
     
     # Create a tracker object for this user.
     tracker = HabitTracker(name)
@@ -531,19 +696,46 @@ def main():
                 print('Badge: ' + badge) # Show badge only if user got perfect day
             print('Feedback: ' + feedback)
 
-            save_today(tracker.name, points, tracker.completions) # Save today's record to the shared file
+            if store is not None:
+                # resident mode: everything comes from memory
+                # (in shadow mode, checked against the original functions once the save is written)
+                store.save(tracker.name, tracker.completions, points)
+                streak = shadow.compare("streak", lambda: store.streak_of(tracker.name),
+                                        lambda: calc_streak(load_history(tracker.name)),
+                                        tracker.name, in_step)
+                avg_7 = shadow.compare("weekly_average", lambda: store.weekly_average_of(tracker.name),
+                                       lambda: weekly_average(tracker.name, use_index=False),
+                                       tracker.name, in_step)
+            else:
+                stamp_before = file_stamp() # to tell our own change from other programs' changes
+                save_today(tracker.name, points, tracker.completions) # Save today's record to the shared file
+
+                # Load history for this user only, then show streak and 7-day average.
+                history = load_history(tracker.name)
+                streak = calc_streak(history)
+                avg_7 = weekly_average(name)
+
+                # Keep the leaderboard snapshot and the score board in step with the new total.
+                # (the history above leaves out monthly summaries, so the total
+                # comes from the snapshot, which counts every line)
+                from leaderboard_snapshot import load_tail, refresh
+                tail = load_tail()
+                refresh(tail)
+                update_score_board(tracker.name, tail.totals.get(tracker.name.strip().lower(), 0), stamp_before)
 
-            # Load history for this user only, then show streak and 7-day average.
-            history = load_history(tracker.name)
-            streak = calc_streak(history)
-            avg_7 = weekly_average(name)
             print('\n===== Progress (' + tracker.name + ') =====')
             print('Streak: ' + str(streak) + ' day(s)')
             print('7-day average points: ' + str(avg_7))
 
         elif choice == "2": # Option 2: Show this user's rank among all users.
             
-            rank, total, total_users = get_user_rank(tracker.name)
+            if store is not None:
+                store.sync()
+                rank, total, total_users = shadow.compare("rank", lambda: store.rank_of(tracker.name),
+                                                          lambda: get_user_rank(tracker.name),
+                                                          tracker.name, in_step)
+            else:
+                rank, total, total_users = get_user_rank(tracker.name)
             print("\n===== My Rank =====")
             print("User: " + tracker.name)
             print("Total points: " + str(total))
@@ -551,10 +743,26 @@ def main():
                 print("Rank: N/A (no records yet)") # No one has records yet
             else:
                 print("Rank: " + str(rank) + " out of " + str(max(total_users, rank))) # If the user has no record, we show them after the last rank.
+                if total_users > 0 and rank <= total_users:
+                    if store is not None:
+                        top = store.percentile(tracker.name)
+                    else:
+                        top = get_score_board().percentile(tracker.name)
+                    print("You're in the top " + str(top) + "% of users")
 
         elif choice == "3":  # Option 3: Print the top-5 leaderboard.
             
-            show_leaderboard(top_n = 5)
+            if store is not None:
+                store.sync()
+                print("\n===== Leaderboard =====")
+                rows = shadow.compare("leaderboard", lambda: store.leaderboard(5),
+                                      lambda: legacy_leaderboard(HISTORY_FILE, 5), 5, in_step)
+                if len(rows) == 0:
+                    print("No records yet.")
+                for i in range(len(rows)):
+                    print(f"{i + 1}. {rows[i][0]}  -  {rows[i][1]} pts")
+            else:
+                show_leaderboard(top_n = 5)
 
         elif choice == "4": # Option 4: Switch to another user (start tracking for a new name).
             
@@ -566,11 +774,303 @@ def main():
                 print("Name cannot be empty.") # Avoid empty name
 
         elif choice == "exit": # Exit the program.
+            if store is not None:
+                store.close() # write what is still waiting
             print("Bye! See you next time.")
             break
 
         else:
             print("Please choose 1/2/3/4 or type EXIT.") # Invalid input: ask user to choose again.
 
+# ---------------------------------------------------------------------------
+# Command line mode for scripts: python main.py <command> [options]
+# Example:
+#   python main.py track --user Harry --habits "Drink water,Exercise"
+#   python main.py rank --user Harry --json
+#   python main.py leaderboard --top 10 --window 7
+#   python main.py history --user Harry
+#   python main.py import other_progress.txt
+#   python main.py --stdin --json < commands.txt    (one command per line)
+# ---------------------------------------------------------------------------
+
+def parse_habits(text, name):
+    """
+    Turn "Drink water,Exercise" (the habits that were done) into a completions dict
+    over the habits this user tracks (see habits.json).
+    Matching is case-insensitive; "" or "none" means nothing was done.
+
+    Raises ValueError for a habit name that doesn't exist.
+    """
+    known = HabitTracker(name).habits
+    lookup = {}
+    for habit in known:
+        lookup[habit.lower()] = habit
+
+    completions = {}
+    for habit in known:
+        completions[habit] = 0
+
+    for item in text.split(","):
+        item = item.strip().lower()
+        if item == "" or item == "none":
+            continue
+        if item == "all":
+            for habit in known:
+                completions[habit] = 1
+            continue
+        if item not in lookup:
+            raise ValueError("unknown habit: " + item + " (choose from: " + ", ".join(known) + ")")
+        completions[lookup[item]] = 1
+    return completions
+
+def build_parser():
+    """
+    Build the argparse parser for the command line mode.
+    """
+    import argparse
+
+    # options every command understands
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json", action="store_true", default=argparse.SUPPRESS,
+                        help="print the result as one JSON object")
+
+    parser = argparse.ArgumentParser(description="Health Habit Tracker (run without arguments for the menu).",
+                                     parents=[common])
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--stdin", action="store_true",
+                        help="read one command per line from standard input, with one loaded history")
+    parser.add_argument("--resident", action="store_true",
+                        help="keep the history in memory and write saves in batches "
+                             "(without a command: run the menu this way)")
+    parser.add_argument("--flush-seconds", type=float, default=5,
+                        help="resident mode: longest time a save waits before it is written (default: 5)")
+    parser.add_argument("--max-dirty", type=int, default=50,
+                        help="resident mode: write as soon as this many saves are waiting (default: 50)")
+    parser.add_argument("--shadow-rate", type=float,
+                        help="also answer this fraction of calls (0..1) with the original functions "
+                             "and record differences and timings (see shadow.py)")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("track", parents=[common], help="save today's habits for a user")
+    p.add_argument("--user", required=True)
+    p.add_argument("--habits", required=True,
+                   help='habits done today, comma separated, e.g. "Drink water,Exercise" ("all" / "none")')
+
+    p = sub.add_parser("rank", parents=[common], help="show a user's rank")
+    p.add_argument("--user", required=True)
+
+    p = sub.add_parser("leaderboard", parents=[common], help="show the top users")
+    p.add_argument("--top", type=int, default=5)
+    p.add_argument("--window", type=int, help="only count the last N days")
+
+    p = sub.add_parser("history", parents=[common], help="show a user's daily scores, streak and average")
+    p.add_argument("--user", required=True)
+
+    p = sub.add_parser("import", parents=[common], help="add records from another history file")
+    p.add_argument("source", help='file in the progress.txt format ("-" = standard input)')
+
+    return parser
+
+def run_command(state, args):
+    """
+    Run one parsed command against the loaded history.
+
+    Returns:
+        result (dict): plain data, ready for JSON output
+    """
+    from shadow import get_shadow, legacy_leaderboard, state_in_step
+
+    state.sync()
+
+    # shadow mode: some answers are also worked out by the original functions and compared
+    shadow = get_shadow(state.filename)
+    filename = state.filename
+    def in_step():
+        return state_in_step(state)
+
+    def streak_and_average(name):
+        streak = shadow.compare("streak", lambda: state.streak_of(name),
+                                lambda: calc_streak(load_history(name, filename)), name, in_step)
+        avg_7 = shadow.compare("weekly_average", lambda: state.weekly_average_of(name),
+                               lambda: weekly_average(name, filename, use_index=False), name, in_step)
+        return streak, avg_7
+
+    if args.command == "track":
+        tracker = HabitTracker(args.user.strip())
+        tracker.completions = parse_habits(args.habits, tracker.name)
+        tracker.score = sum(tracker.completions.values())
+        points, badge, feedback = tracker.reward_and_feedback()
+        state.save(tracker.name, tracker.completions, points)
+        streak, avg_7 = streak_and_average(tracker.name)
+        return {"command": "track", "user": tracker.name, "points": points, "badge": badge,
+                "feedback": feedback, "streak": streak, "weekly_average": avg_7}
+
+    if args.command == "rank":
+        rank, total, total_users = shadow.compare("rank", lambda: state.rank_of(args.user),
+                                                  lambda: get_user_rank(args.user, filename),
+                                                  args.user, in_step)
+        result = {"command": "rank", "user": args.user.strip(), "rank": rank,
+                  "total": total, "total_users": total_users, "top_percent": None}
+        if total_users > 0 and rank <= total_users:
+            result["top_percent"] = state.percentile(args.user)
+        return result
+
+    if args.command == "leaderboard":
+        if args.window is None:
+            # whole order: totals, first-seen names and ties (there is no original windowed version)
+            rows = shadow.compare("leaderboard", lambda: state.leaderboard(args.top),
+                                  lambda: legacy_leaderboard(filename, args.top), args.top, in_step)
+        else:
+            rows = state.leaderboard(args.top, args.window)
+        return {"command": "leaderboard", "window": args.window, "rows": rows}
+
+    if args.command == "history":
+        # load_history only has the points, so only those are compared
+        history = shadow.compare("history", lambda: state.history_of(args.user),
+                                 lambda: load_history(args.user, filename), args.user, in_step,
+                                 key=lambda rows: [row[1] for row in rows])
+        days = []
+        for date_text, points, habits in history:
+            days.append({"date": date_text, "points": points, "habits": habits})
+        streak, avg_7 = streak_and_average(args.user)
+        return {"command": "history", "user": args.user.strip(), "days": days,
+                "streak": streak, "weekly_average": avg_7}
+
+    if args.command == "import":
+        if args.source == "-":
+            added, skipped = state.import_lines(sys.stdin.readlines())
+        else:
+            with open(args.source, "r") as f:
+                added, skipped = state.import_lines(f.readlines())
+        return {"command": "import", "added": added, "skipped": skipped}
+
+    raise ValueError("no command given")
+
+def print_result(result):
+    """
+    Print a result dict as text, in the same style as the menu.
+    """
+    command = result.get("command")
+    if not result.get("ok", True):
+        print("Error: " + result["error"])
+    elif command == "track":
+        print("Saved " + result["user"] + ": " + str(result["points"]) + " points"
+              + (" (" + result["badge"] + ")" if result["badge"] else ""))
+        print("Streak: " + str(result["streak"]) + " day(s), 7-day average points: "
+              + str(result["weekly_average"]))
+    elif command == "rank":
+        if result["total_users"] == 0:
+            print(result["user"] + ": Rank N/A (no records yet)")
+        else:
+            text = (result["user"] + ": rank " + str(result["rank"]) + " out of "
+                    + str(max(result["total_users"], result["rank"])) + ", " + str(result["total"]) + " pts")
+            if result["top_percent"] is not None:
+                text = text + ", top " + str(result["top_percent"]) + "%"
+            print(text)
+    elif command == "leaderboard":
+        if len(result["rows"]) == 0:
+            print("No records yet.")
+        for i in range(len(result["rows"])):
+            name_text, score = result["rows"][i]
+            print(f"{i + 1}. {name_text}  -  {score} pts")
+    elif command == "history":
+        for day in result["days"]:
+            print(day["date"] + ": " + str(day["points"]) + " pts")
+        print("Streak: " + str(result["streak"]) + " day(s), 7-day average points: "
+              + str(result["weekly_average"]))
+    elif command == "import":
+        print("Imported " + str(result["added"]) + " record(s), skipped " + str(result["skipped"]))
+
+def cli(argv):
+    """
+    Command line entry point. Returns the exit code (0 = every command worked).
+    """
+    import json
+    import shlex
+    from history_state import HistoryState
+    from leaderboard_snapshot import load_tail, refresh
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    as_json = getattr(args, "json", False)
+
+    if args.shadow_rate is not None:
+        from shadow import get_shadow
+        get_shadow(args.file, min(max(args.shadow_rate, 0.0), 1.0))
+
+    if not args.stdin and args.command is None:
+        if args.resident and args.file == HISTORY_FILE:
+            main({"flush_seconds": args.flush_seconds, "max_dirty": args.max_dirty})
+            return 0
+        parser.error("give a command, or --stdin (the menu only works with the default --file)")
+
+    # read the history once; every command below shares it
+    if args.resident:
+        from resident_store import ResidentStore
+        state = ResidentStore(args.file, args.flush_seconds, args.max_dirty)
+        state.start_timer() # --stdin may wait a long time for the next line
+    else:
+        state = HistoryState(args.file)
+
+    if args.stdin:
+        commands = sys.stdin
+    else:
+        commands = [argv]
+
+    exit_code = 0
+    wrote = False
+    for item in commands:
+        if args.stdin:
+            item = item.strip()
+            if item == "" or item.startswith("#"):
+                continue
+            try:
+                one = parser.parse_args(shlex.split(item))
+            except SystemExit:
+                # argparse already printed the reason to stderr
+                one = None
+                result = {"ok": False, "error": "bad command: " + item}
+            except ValueError as e:
+                one = None
+                result = {"ok": False, "error": str(e)}
+        else:
+            one = args
+
+        if one is not None:
+            if one.command is None or one.stdin:
+                result = {"ok": False, "error": "bad command: " + str(item)}
+            else:
+                try:
+                    result = run_command(state, one)
+                    result["ok"] = True
+                    if one.command in ("track", "import"):
+                        wrote = True
+                except (ValueError, OSError) as e:
+                    result = {"command": one.command, "ok": False, "error": str(e)}
+
+        if not result["ok"]:
+            exit_code = 1
+        if as_json or (one is not None and getattr(one, "json", False)):
+            print(json.dumps(result))
+        else:
+            print_result(result)
+        if args.stdin:
+            sys.stdout.flush()
+
+    # write what is still waiting, then bring the leaderboard snapshot
+    # up to date once, not after every save
+    if args.resident:
+        state.close()
+    if wrote:
+        refresh(load_tail(args.file))
+    return exit_code
+
 if __name__ == '__main__':
+    if startup_profile.requested() and not startup_profile.is_child():
+        # python main.py --profile-startup: time this program up to its first prompt
+        sys.exit(startup_profile.profile(os.path.abspath(__file__), "first prompt",
+                                         [startup_profile.FLAG]))
+    argv = startup_profile.strip_flag(sys.argv[1:])
+    if len(argv) > 0:
+        sys.exit(cli(argv))
     main()
\ No newline at end of file
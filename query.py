@@ -0,0 +1,209 @@
+"""
+Filtered queries over progress.txt.
+
+query_records() walks the history once and yields only the records that match
+a date range, a set of users and a habit filter. The filters are checked as
+early (and as cheaply) as possible:
+    1. the date range is checked on the first 10 characters of the line,
+       before the line is split;
+    2. the user set is checked on the name part only;
+    3. only then is the full line parsed and the habit filter applied.
+Archived history (archive.py) is read first, and only the compressed blocks
+whose dates and users can match are decompressed. In the live file, the date
+index (date_index.py) skips straight to the start date.
+
+Monthly summary records (see rollup.py) are returned only when the whole month
+is inside the date range, and never when a habit filter is used, because
+their days can't be split apart.
+
+Example (who completed Exercise every day in March?):
+    python query.py --from 2025-03-01 --to 2025-03-31 --habit Exercise --every-day
+"""
+
+import argparse
+import calendar
+import datetime
+import json
+import os
+
+from archive import archive_lines
+from date_index import range_lines
+from records import parse_line
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+DATE_LEN = len("2025-11-01") # length of a date at the start of each line
+
+
+def habit_done(habit):
+    """
+    Return a habit filter that keeps records where this habit was done (=Yes).
+    """
+    def check(habits):
+        return habits.get(habit, 0) == 1
+    return check
+
+
+def month_inside(month_text, start, end):
+    """
+    Return True if the whole month "YYYY-MM" is between start and end.
+    """
+    year, month = month_text.split("-")
+    last_day = calendar.monthrange(int(year), int(month))[1]
+    first = month_text + "-01"
+    last = f"{month_text}-{last_day:02d}"
+    if start is not None and first < start:
+        return False
+    if end is not None and last > end:
+        return False
+    return True
+
+
+def history_range_lines(filename, start=None, end=None, keys=None):
+    """
+    Yield the history lines that can be inside the date range / user set:
+    first the archive blocks that can match (others are not even decompressed),
+    then the live file from the first indexed date before start (see date_index.py).
+    """
+    for line in archive_lines(filename, start, end, keys):
+        yield line
+
+    for line in range_lines(filename, start, end):
+        yield line
+
+
+def query_records(filename=HISTORY_FILE, start=None, end=None, users=None, habit=None):
+    """
+    Yield records (see records.parse_line) that match all filters.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        start (str): first date to keep, e.g. "2025-03-01" (None = no limit)
+        end (str): last date to keep, inclusive (None = no limit)
+        users (iterable of str): only keep these users (None = everyone)
+        habit (callable): function(habits dict) -> bool, e.g. habit_done("Exercise")
+
+    Yields:
+        record (dict) for each matching line, in file order
+    """
+    # lowercase the user names once so each line only needs a set lookup
+    keys = None
+    if users is not None:
+        keys = set()
+        for u in users:
+            keys.add(u.strip().lower())
+
+    for line in history_range_lines(filename, start, end, keys):
+        # 1) date filter on the line prefix, before splitting
+        # (only for full dates; summary lines start with "YYYY-MM |")
+        prefix = line[:DATE_LEN]
+        if prefix[7:8] == "-":
+            if start is not None and prefix < start:
+                continue
+            if end is not None and prefix > end:
+                continue
+
+        # 2) user filter on the name part only
+        if keys is not None:
+            parts = line.split("|", 2)
+            if len(parts) < 3:
+                continue
+            if parts[1].strip().lower() not in keys:
+                continue
+
+        # 3) full parse and habit filter
+        rec = parse_line(line)
+        if rec is None:
+            continue
+        if rec["summary"]:
+            if habit is not None:
+                continue
+            try:
+                if not month_inside(rec["date"], start, end):
+                    continue
+            except ValueError:
+                continue
+            yield rec
+            continue
+        if start is not None and rec["date"] < start:
+            continue
+        if end is not None and rec["date"] > end:
+            continue
+        if habit is not None and not habit(rec["habits"]):
+            continue
+        yield rec
+
+
+def points_between(filename=HISTORY_FILE, start=None, end=None, users=None):
+    """
+    Return a dict of lowercase name -> points earned between start and end.
+    """
+    totals = {}
+    for rec in query_records(filename, start, end, users):
+        totals[rec["key"]] = totals.get(rec["key"], 0) + rec["points"]
+    return totals
+
+
+def users_every_day(filename=HISTORY_FILE, start=None, end=None, habit=None, users=None):
+    """
+    Return the sorted lowercase names of users who have a matching record
+    on every single day from start to end (both dates are required).
+    """
+    first = datetime.date.fromisoformat(start)
+    last = datetime.date.fromisoformat(end)
+    days_needed = (last - first).days + 1
+
+    # collect the distinct dates per user
+    seen = {}
+    for rec in query_records(filename, start, end, users, habit):
+        if rec["summary"]:
+            continue # a summary can't tell which days were done
+        if rec["key"] not in seen:
+            seen[rec["key"]] = set()
+        seen[rec["key"]].add(rec["date"])
+
+    result = []
+    for key in seen:
+        if len(seen[key]) == days_needed:
+            result.append(key)
+    result.sort()
+    return result
+
+
+def main(argv=None):
+    """
+    Command line entry point for ad-hoc queries.
+    """
+    parser = argparse.ArgumentParser(description="Query the habit history.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--from", dest="start", help="first date, e.g. 2025-03-01")
+    parser.add_argument("--to", dest="end", help="last date (inclusive)")
+    parser.add_argument("--user", action="append", dest="users", help="only this user (can repeat)")
+    parser.add_argument("--habit", help="only records where this habit was done")
+    parser.add_argument("--every-day", action="store_true",
+                        help="print users who matched on every day from --from to --to")
+    parser.add_argument("--sum", action="store_true", help="print points per user instead of records")
+    args = parser.parse_args(argv)
+
+    habit = None
+    if args.habit:
+        habit = habit_done(args.habit)
+
+    if args.every_day:
+        if not args.start or not args.end:
+            parser.error("--every-day needs both --from and --to")
+        for key in users_every_day(args.file, args.start, args.end, habit, args.users):
+            print(key)
+    elif args.sum:
+        totals = points_between(args.file, args.start, args.end, args.users)
+        for key in sorted(totals):
+            print(f"{key}: {totals[key]}")
+    else:
+        # one JSON object per line, printed as soon as it is found
+        for rec in query_records(args.file, args.start, args.end, args.users, habit):
+            print(json.dumps(rec))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Shared helpers for reading one line of progress.txt.
+
+A normal line looks like this:
+    2025-11-01 | Harry | Drink water=Yes, Exercise=No, Sleep 8 hours=Yes, Points=3
+
+A monthly summary line (written by rollup.py for old records) looks like this:
+    2024-03 | Harry | Summary Days=20, Drink water=15, Exercise=10, Sleep 8 hours=12, Points=45
+
+New lines also carry a checksum just before "Points=", so damaged lines can be found:
+    2025-11-01 | Harry | Drink water=Yes, Exercise=No, Sleep 8 hours=Yes, Crc=95ff4abb, Points=3
+The checksum is the CRC-32 of the line without the "Crc=...," item. Older lines
+without a checksum are still read normally.
+
+Habits that are in habits.json (see habit_config.py) are written as short ids:
+    2025-11-01 | Harry | H=w+e-s+, Crc=4f1a20c3, Points=3
+"w+" means habit "w" (Drink water) was done, "e-" means Exercise was not.
+Lines with full habit names ("Drink water=Yes") are still read normally.
+An id that is in no list (see habit_config.id_names) is read as "?<id>".
+
+parse_line() follows the same rules as load_totals_all in main.py:
+the name is the second part, and the points are the number after the last "Points=".
+"""
+
+
+import zlib
+
+from habit_config import UNKNOWN_HABIT, get_config, id_names, remember_ids
+
+# monthly summary records start their third part with this word
+SUMMARY_TAG = "Summary"
+
+# checksum item written before "Points=", e.g. "Crc=1c291ca3, "
+CRC_TAG = "Crc="
+CRC_ITEM_LEN = len("Crc=1c291ca3, ")
+
+# item that holds the habits as short ids, e.g. "H=w+e-s+"
+HABIT_IDS_TAG = "H"
+
+
+def decode_habit_ids(text, habits):
+    """
+    Read "w+e-s+" into habits (habit name -> 1 or 0), using every id ever
+    used (habit_ids.json and habits.json). Unknown ids become "?<id>".
+    """
+    names = id_names()
+    hid = ""
+    for ch in text:
+        if ch == "+" or ch == "-":
+            habits[names.get(hid, UNKNOWN_HABIT + hid)] = 1 if ch == "+" else 0
+            hid = ""
+        else:
+            hid = hid + ch
+
+
+def encode_habits(completions):
+    """
+    Turn a completions dict into the habit items of a line, e.g. "H=w+e-s+, ".
+    Habits without an id in habits.json are written with their full name
+    (all of them if habits.json can't be used).
+    """
+    try:
+        config = get_config()
+    except (OSError, ValueError):
+        config = None # full names always read back the same
+    ids = ""
+    named = ""
+    used = []
+    for habit in completions:
+        hid = None
+        if config is not None:
+            hid = config.id_of(habit)
+        if hid is None:
+            if completions[habit] == 1:
+                named = named + f"{habit}=Yes, "
+            else:
+                named = named + f"{habit}=No, "
+        elif completions[habit] == 1:
+            ids = ids + hid + "+"
+            used.append(hid)
+        else:
+            ids = ids + hid + "-"
+            used.append(hid)
+    if ids != "":
+        remember_ids(used)
+        ids = HABIT_IDS_TAG + "=" + ids + ", "
+    return ids + named
+
+
+def line_crc(text):
+    """
+    Return the CRC-32 of a line as 8 hex digits.
+    """
+    return format(zlib.crc32(text.encode("utf-8")) & 0xffffffff, "08x")
+
+
+def add_checksum(line):
+    """
+    Put a "Crc=xxxxxxxx, " item just before the last "Points=" of the line.
+    """
+    index = line.rfind("Points=")
+    if index == -1:
+        return line
+    return line[:index] + CRC_TAG + line_crc(line) + ", " + line[index:]
+
+
+def check_line(line):
+    """
+    Check the checksum of one line.
+
+    Returns:
+        "ok" if the checksum matches,
+        "bad" if the line has a checksum that doesn't match,
+        "none" if the line has no checksum (written before checksums existed).
+    """
+    s = line.strip()
+    index = s.rfind(CRC_TAG)
+    if index == -1:
+        return "none"
+    item = s[index:index + CRC_ITEM_LEN]
+    if len(item) != CRC_ITEM_LEN or not item.endswith(", "):
+        return "bad"
+    original = s[:index] + s[index + CRC_ITEM_LEN:]
+    if item[len(CRC_TAG):len(CRC_TAG) + 8] != line_crc(original):
+        return "bad"
+    return "ok"
+
+
+def is_summary_text(rest):
+    """
+    Return True if the habit part of a line belongs to a monthly summary record.
+    """
+    return rest.startswith(SUMMARY_TAG + " ")
+
+
+def parse_line(line):
+    """
+    Turn one line of the history file into a record.
+
+    Parameters:
+        line (str): one line from progress.txt
+
+    Returns:
+        record (dict) with keys:
+            "date"   - date text, e.g. "2025-11-01"
+            "name"   - the name as written in the file
+            "key"    - lowercase name, used for matching users
+            "habits" - dict of habit name -> 1 (Yes) or 0 (No);
+                       for a summary: habit name -> number of days done
+            "points" - points for that day (or that month for a summary)
+            "summary" - True for a monthly summary record
+            "days"   - number of active days (1 for a normal record)
+        or None if the line is empty or broken.
+    """
+    s = line.strip()
+    if s == "":
+        return None
+
+    # split the line by "|" and clean each part
+    parts = []
+    for p in s.split("|"):
+        parts.append(p.strip())
+
+    # skip lines that don't have enough parts
+    if len(parts) < 3:
+        return None
+
+    # the rest of the parts hold the habit info + points
+    rest = "|".join(parts[2:])
+    if "Points=" not in rest:
+        return None
+
+    pieces = rest.split("Points=")
+    number_text = pieces[-1].strip().rstrip(",")
+    try:
+        points = int(number_text)
+    except ValueError:
+        return None
+
+    habit_text = "Points=".join(pieces[:-1])
+    summary = is_summary_text(rest)
+    if summary:
+        habit_text = habit_text[len(SUMMARY_TAG):]
+
+    # read "Habit=Yes" / "Habit=No" items (or "Habit=12" counts in a summary)
+    habits = {}
+    days = 1
+    for item in habit_text.split(","):
+        item = item.strip()
+        if "=" not in item:
+            continue
+        habit, value = item.rsplit("=", 1)
+        habit = habit.strip()
+        if habit == HABIT_IDS_TAG and not summary:
+            decode_habit_ids(value.strip(), habits)
+            continue
+        value = value.strip().lower()
+        if summary:
+            try:
+                number = int(value)
+            except ValueError:
+                continue
+            if habit == "Days":
+                days = number
+            else:
+                habits[habit] = number
+        elif value == "yes":
+            habits[habit] = 1
+        elif value == "no":
+            habits[habit] = 0
+
+    return {
+        "date": parts[0],
+        "name": parts[1],
+        "key": parts[1].lower(),
+        "habits": habits,
+        "points": points,
+        "summary": summary,
+        "days": days,
+    }
+
+
+def format_line(date_text, name, completions, points):
+    """
+    Build one history line in the same format save_today writes (without the newline),
+    including its checksum.
+    """
+    text = f"{date_text} | {name.strip()} | " + encode_habits(completions) + f"Points={points}"
+    return add_checksum(text)
+
+
+def format_summary_line(month_text, name, days, habit_counts, points):
+    """
+    Build one monthly summary line (without the newline), including its checksum.
+    """
+    text = f"{month_text} | {name.strip()} | {SUMMARY_TAG} Days={days}, "
+    for habit in habit_counts:
+        text = text + f"{habit}={habit_counts[habit]}, "
+    text = text + f"Points={points}"
+    return add_checksum(text)
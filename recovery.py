@@ -0,0 +1,453 @@
+"""
+Crash safety and fast recovery for progress.txt.
+
+1. Safe writes
+   append_line() adds one record at the end of the file (flushed to disk).
+   write_lines_atomic() writes a whole new file to a temporary name and then
+   renames it, so a crash leaves either the old file or the new one.
+   Other programs may append while a rewrite is being prepared;
+   replace_keeping_appends() carries those lines over into the new file.
+   If another program replaced or rewrote the file instead, splicing would
+   give garbage: it raises FileChanged, and rewrite_lines() reads the file
+   again and retries.
+
+2. Checkpoints
+   Every CHECKPOINT_EVERY records a marker line is appended:
+       #checkpoint offset=12345 lines=100 crc=89abcdef
+   "offset" is the byte position of the marker itself and "crc" is the CRC-32
+   of the text before " crc=". A marker is only trusted if both still match,
+   and it means "every line before me was already checked".
+   (Marker lines have no "|", so all loaders skip them.)
+
+3. Recovery
+   recover() finds the last good checkpoint by reading the file backwards, then
+   checks only the lines after it. Damaged lines (bad checksum, unreadable,
+   or a half-written last line) are reported and moved to progress.txt.quarantine.
+"""
+
+import datetime
+import os
+import tempfile
+
+from records import check_line, line_crc, parse_line
+
+CHECKPOINT_TAG = "#checkpoint "
+CHECKPOINT_EVERY = 100 # records between two checkpoint markers
+CHUNK_BYTES = 64 * 1024 # how much we read at a time when searching backwards
+REWRITE_TRIES = 10 # how often a rewrite is tried again when another program replaced the file
+
+
+class FileChanged(Exception):
+    """
+    Another program replaced or rewrote the file while we were preparing a
+    new version of it, so the new version can't be swapped in.
+    """
+
+
+def open_temp_beside(filename, mode):
+    """
+    Open a new temporary file in the same folder as filename (so os.replace
+    can swap it in). Every call gets its own name, so two programs saving at
+    the same time never write into the same temporary file.
+    Returns (file object, temporary file name).
+    """
+    folder = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(prefix=os.path.basename(filename) + ".", suffix=".tmp", dir=folder)
+    return os.fdopen(fd, mode), tmp_name
+
+
+def write_lines_atomic(filename, lines):
+    """
+    Write all lines to filename by writing a temporary file and renaming it.
+    Readers see either the old file or the new one, never half of it.
+    (For a file other programs may append to, use rewrite_lines.)
+    """
+    f, tmp_name = open_temp_beside(filename, "w")
+    with f:
+        for line in lines:
+            f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, filename)
+
+
+def read_for_rewrite(filename):
+    """
+    Read the complete lines of a file before rewriting it.
+
+    Returns:
+        (raw_lines, position): the lines as bytes (each ending with "\n") and a
+        tail_reader.FilePosition just after them. A half-written last line is
+        left out; replace_keeping_appends carries it over as it is.
+    """
+    from tail_reader import FilePosition
+
+    position = FilePosition()
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return [], position
+    with f:
+        st = os.fstat(f.fileno())
+        raw_lines = f.read(st.st_size).splitlines(True)
+        if len(raw_lines) > 0 and not raw_lines[-1].endswith(b"\n"):
+            raw_lines.pop()
+        size = 0
+        for raw in raw_lines:
+            size += len(raw)
+        position.move_to(f, st, size)
+    return raw_lines, position
+
+
+def rewrite_lines(filename, change):
+    """
+    Replace filename with a new version made by change(raw_lines), keeping
+    the lines other programs append meanwhile.
+
+    change gets the complete lines (bytes, each ending with "\n") and returns
+    the new list, or None to leave the file as it is. If another program
+    replaces or rewrites the file before the new version is swapped in, the
+    file is read again and change is called again.
+
+    Returns:
+        (raw_lines, new_lines) of the attempt that was used
+    """
+    for attempt in range(REWRITE_TRIES):
+        raw_lines, position = read_for_rewrite(filename)
+        new_lines = change(raw_lines)
+        if new_lines is None:
+            return (raw_lines, None)
+        f, tmp_name = open_temp_beside(filename, "wb")
+        with f:
+            f.write(b"".join(new_lines))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            replace_keeping_appends(tmp_name, filename, position)
+            return (raw_lines, new_lines)
+        except FileChanged:
+            continue
+    raise FileChanged(f"{filename} kept being replaced by other programs, try again later")
+
+
+def replace_keeping_appends(tmp_name, filename, known):
+    """
+    Rename the finished temporary file tmp_name over filename without losing
+    records that other programs appended in the meantime.
+
+    tmp_name holds the new version of filename up to the position known
+    (a tail_reader.FilePosition taken when the caller read the file).
+    Everything after it was appended since (save_today on another kiosk),
+    so it is copied to the end of tmp_name just before the rename. A writer
+    that still had the old file open may write during the rename itself;
+    those bytes are added to the new file right after it.
+
+    If the file at that path is no longer the one that was read (another
+    program swapped in its own rewrite, or changed the part we read), tmp_name
+    is removed and FileChanged is raised. Only the short moment between that
+    check and the rename is not covered.
+    """
+    try:
+        old = open(filename, "rb")
+    except FileNotFoundError:
+        if known.inode is not None:
+            os.remove(tmp_name)
+            raise FileChanged(f"{filename} was removed")
+        os.replace(tmp_name, filename)
+        return
+
+    with old:
+        if not known.is_same_file(old, os.fstat(old.fileno())):
+            old.close()
+            os.remove(tmp_name)
+            raise FileChanged(f"{filename} was replaced by another program")
+        old.seek(known.offset)
+        appended = old.read()
+        copied = known.offset + len(appended)
+        if len(appended) > 0:
+            with open(tmp_name, "ab") as out:
+                out.write(appended)
+                out.flush()
+                os.fsync(out.fileno())
+        if os.name == "nt":
+            old.close() # Windows can't rename over a file that is still open
+        os.replace(tmp_name, filename)
+        if old.closed:
+            return
+
+        # the old file is gone from the folder, but we still hold it open
+        old.seek(copied)
+        late = old.read()
+        if len(late) > 0:
+            with open(filename, "ab") as out:
+                out.write(late)
+                out.flush()
+                os.fsync(out.fileno())
+
+
+def _ends_with_newline(filename):
+    # True if the file is empty/missing or its last byte is "\n"
+    try:
+        with open(filename, "rb") as f:
+            size = f.seek(0, 2)
+            if size == 0:
+                return True
+            f.seek(size - 1)
+            return f.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+def append_line(filename, text):
+    """
+    Add one line at the end of the file and flush it to disk.
+    If the last line was cut off (a crash during an earlier write),
+    start on a new line so the two records don't get glued together.
+    """
+    prefix = ""
+    if not _ends_with_newline(filename):
+        prefix = "\n"
+    with open(filename, "a") as f:
+        f.write(prefix + text + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def append_lines(filename, texts):
+    """
+    Add many lines at the end of the file with one write and one flush
+    (same rules as append_line).
+    """
+    if len(texts) == 0:
+        return
+    prefix = ""
+    if not _ends_with_newline(filename):
+        prefix = "\n"
+    with open(filename, "a") as f:
+        f.write(prefix + "".join(text + "\n" for text in texts))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _marker_text(offset, lines):
+    # the part of the marker covered by its crc
+    return f"{CHECKPOINT_TAG}offset={offset} lines={lines}"
+
+
+def _is_valid_marker(raw, position):
+    """
+    Check that a marker line is complete, unchanged, and still at the position it claims.
+    """
+    if not raw.endswith(b"\n"):
+        return False
+    try:
+        text = raw.decode("utf-8").strip()
+    except UnicodeDecodeError:
+        return False
+    if " crc=" not in text:
+        return False
+    body, crc = text.rsplit(" crc=", 1)
+    if line_crc(body) != crc:
+        return False
+    for item in body[len(CHECKPOINT_TAG):].split():
+        if item.startswith("offset="):
+            return item[len("offset="):] == str(position)
+    return False
+
+
+def find_last_checkpoint(filename):
+    """
+    Return the byte offset just after the last valid checkpoint marker,
+    or 0 if there is none (then the whole file has to be checked).
+    """
+    tag = CHECKPOINT_TAG.encode("utf-8")
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return 0
+
+    with f:
+        end = f.seek(0, 2)
+        while end > 0:
+            start = max(0, end - CHUNK_BYTES)
+            f.seek(start)
+            data = f.read(end - start)
+
+            # look at markers from the right to the left
+            pos = data.rfind(tag)
+            while pos != -1:
+                position = start + pos
+
+                # a marker must start a line
+                at_line_start = position == 0
+                if not at_line_start:
+                    f.seek(position - 1)
+                    at_line_start = f.read(1) == b"\n"
+
+                if at_line_start:
+                    f.seek(position)
+                    raw = f.readline()
+                    if _is_valid_marker(raw, position):
+                        return position + len(raw)
+                pos = data.rfind(tag, 0, pos)
+
+            if start == 0:
+                break
+            # step back, overlapping a little so a marker cut in half is still found
+            end = start + len(tag) - 1
+
+    return 0
+
+
+def check_region(filename, start, end=None):
+    """
+    Check every line from byte offset start to end (None = the end of the file).
+
+    Returns:
+        (records, problems)
+        records: number of good records found
+        problems: list of (offset, raw bytes, reason)
+    """
+    records = 0
+    problems = []
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return 0, []
+
+    with f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            if end is not None and offset >= end:
+                break
+            line_offset = offset
+            offset += len(raw)
+
+            if raw.strip() == b"":
+                continue
+            if not raw.endswith(b"\n"):
+                problems.append((line_offset, raw, "incomplete last line"))
+                continue
+            try:
+                text = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                problems.append((line_offset, raw, "unreadable"))
+                continue
+            if text.startswith(CHECKPOINT_TAG):
+                continue # an old marker that is no longer at its place; harmless
+            if parse_line(text) is None:
+                problems.append((line_offset, raw, "unreadable"))
+                continue
+            if check_line(text) == "bad":
+                problems.append((line_offset, raw, "bad checksum"))
+                continue
+            records += 1
+
+    return records, problems
+
+
+def write_checkpoint(filename, records):
+    """
+    Append a checkpoint marker saying the file was checked up to here.
+    """
+    if not _ends_with_newline(filename):
+        return # never put a marker after a half-written line
+    try:
+        offset = os.path.getsize(filename)
+    except FileNotFoundError:
+        return
+    body = _marker_text(offset, records)
+    with open(filename, "ab") as f:
+        f.write((body + " crc=" + line_crc(body) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def maybe_checkpoint(filename):
+    """
+    Write a new checkpoint if enough good records were added since the last one.
+    Only the lines after the last checkpoint are read.
+    """
+    start = find_last_checkpoint(filename)
+    records, problems = check_region(filename, start)
+    if records >= CHECKPOINT_EVERY and len(problems) == 0:
+        write_checkpoint(filename, records)
+
+
+def recover(filename, quarantine=True):
+    """
+    Check the lines after the last good checkpoint and deal with damaged ones.
+
+    Parameters:
+        filename (str): the history file
+        quarantine (bool): move damaged lines to <filename>.quarantine
+                           (if False, only report them)
+
+    Returns:
+        report (dict) with:
+            "checked_from" - byte offset where checking started
+            "records"      - good records found after that offset
+            "problems"     - list of (offset, reason, text)
+            "quarantined"  - number of lines moved out of the file
+    """
+    from tail_reader import position_of
+
+    for attempt in range(REWRITE_TRIES):
+        known = position_of(filename) # the file as it is now; later appends are kept
+        start = find_last_checkpoint(filename)
+        records, problems = check_region(filename, start, known.offset)
+
+        report = {"checked_from": start, "records": records, "problems": [], "quarantined": 0}
+        for offset, raw, reason in problems:
+            report["problems"].append((offset, reason, raw.decode("utf-8", errors="replace").strip()))
+        if len(problems) == 0 or not quarantine:
+            break
+
+        # rebuild the file: the checked part stays as it is, the rest without bad lines
+        bad_offsets = set()
+        for offset, raw, reason in problems:
+            bad_offsets.add(offset)
+
+        try:
+            f = open(filename, "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            if not known.is_same_file(f, os.fstat(f.fileno())):
+                continue # replaced while we checked it: check the new file
+            f.seek(0)
+            head = f.read(start)
+            region = f.read(known.offset - start)
+
+        out, tmp_name = open_temp_beside(filename, "wb")
+        with out:
+            out.write(head)
+            offset = start
+            for raw in region.splitlines(True):
+                if offset not in bad_offsets:
+                    out.write(raw)
+                offset += len(raw)
+            out.flush()
+            os.fsync(out.fileno())
+        try:
+            # records other programs appended while we checked are kept
+            replace_keeping_appends(tmp_name, filename, known)
+        except FileChanged:
+            continue
+
+        # save the damaged lines for a human to look at
+        stamp = datetime.datetime.now().isoformat(timespec="seconds")
+        with open(filename + ".quarantine", "a") as q:
+            for offset, reason, text in report["problems"]:
+                q.write(f"{stamp} | offset={offset} | {reason} | {text}\n")
+        report["quarantined"] = len(problems)
+        break
+    else:
+        raise FileChanged(f"{filename} kept being replaced by other programs, try again later")
+
+    # everything up to the end is checked now, so the next start is instant
+    if records > 0 and (len(problems) == 0 or quarantine):
+        write_checkpoint(filename, records)
+
+    return report
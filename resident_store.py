@@ -0,0 +1,209 @@
+"""
+Resident (in-memory) store for long kiosk sessions.
+
+ResidentStore is a HistoryState (see history_state.py) whose saves only change
+memory. The new records are "dirty" until flush() writes them to progress.txt,
+which happens:
+    - when the oldest dirty record is flush_seconds old (the durability window:
+      at most that much work is lost if the computer loses power),
+    - when max_dirty records are waiting,
+    - when the window is closed or the program exits (atexit),
+    - on a timer: start_timer() checks every second in a background thread
+      (menu and --stdin mode); the window uses its own refresh timer instead.
+
+Lookups (rank, leaderboard, history) never touch the disk, so they are just as
+fast with a huge history file as with a small one.
+
+Example:
+    python gui_main.py --resident --flush-seconds 10
+    python main.py --resident
+"""
+
+import atexit
+import datetime
+import threading
+import time
+
+from history_state import HistoryState, file_stamp
+from records import format_line, parse_line
+from recovery import append_lines, maybe_checkpoint
+
+FLUSH_SECONDS = 5 # default durability window
+MAX_DIRTY = 50 # default number of waiting records that forces a flush
+TIMER_SECONDS = 1 # how often the timer thread checks
+
+
+class ResidentStore(HistoryState):
+    """
+    A HistoryState that keeps new records in memory and writes them in batches.
+    """
+
+    def __init__(self, filename, flush_seconds=FLUSH_SECONDS, max_dirty=MAX_DIRTY):
+        """
+        Load the history once and get ready to collect saves.
+
+        Parameters:
+            filename (str): the history file
+            flush_seconds (float): durability window; 0 writes every save at once
+            max_dirty (int): flush as soon as this many records are waiting
+        """
+        self.flush_seconds = flush_seconds
+        self.max_dirty = max_dirty
+        self.pending = {} # (lowercase name, date) -> (date, name, completions, record line)
+        self.dirty_since = None # time.monotonic() of the oldest waiting record
+        self.flushes = 0
+        self.lock = threading.RLock() # the timer thread and the program share pending
+        self.timer = None
+        HistoryState.__init__(self, filename)
+        atexit.register(self.close)
+
+    def load(self):
+        """
+        Read the history again, then put the records that are still waiting back on top.
+        """
+        with self.lock:
+            HistoryState.load(self)
+            # which (user, day) records are already in the file
+            self.on_disk = set()
+            for key in self.days:
+                for date_text in self.days[key]:
+                    self.on_disk.add((key, date_text))
+            for date_text, name, completions, record in self.pending.values():
+                self._apply_save(date_text, record)
+
+    def _apply_save(self, date_text, record):
+        # put one saved record into memory, replacing that user's record of the day
+        rec = parse_line(record)
+        self.forget_day(rec["key"], date_text)
+        self.apply_record(rec)
+
+    def save(self, name, completions, points, date_text=None):
+        """
+        Save one user's record for a day (today by default) in memory.
+        It is written to the file by the next flush.
+        """
+        with self.lock:
+            self.sync()
+            if date_text is None:
+                date_text = str(datetime.date.today())
+            record = format_line(date_text, name, completions, points)
+            self._apply_save(date_text, record)
+
+            self.pending[(name.strip().lower(), date_text)] = (date_text, name, completions, record)
+            if self.dirty_since is None:
+                self.dirty_since = time.monotonic()
+            self.maybe_flush()
+
+    def dirty_count(self):
+        """
+        Return how many records are waiting to be written.
+        """
+        return len(self.pending)
+
+    def maybe_flush(self):
+        """
+        Flush if the durability window has passed or too many records are waiting.
+        Returns True if something was written.
+        """
+        with self.lock:
+            if len(self.pending) == 0:
+                return False
+            waited = time.monotonic() - self.dirty_since
+            if len(self.pending) >= self.max_dirty or waited >= self.flush_seconds:
+                self.flush()
+                return True
+            return False
+
+    def flush(self):
+        """
+        Write all waiting records to the history file.
+
+        First the lines other programs appended are read (sync). If none of
+        the waiting (user, day) records is in the file yet, they are appended
+        in one write. Otherwise the file is rewritten once, without the older
+        records of those (user, day) pairs; lines appended meanwhile are kept
+        (HistoryState._replace_records).
+        """
+        with self.lock:
+            if len(self.pending) == 0:
+                return 0
+
+            self.sync()
+            records = []
+            replace = False
+            for pair in self.pending:
+                records.append(self.pending[pair][3])
+                if pair in self.on_disk:
+                    replace = True
+
+            if not replace:
+                append_lines(self.filename, records)
+                end = None
+            else:
+                end = self._replace_records(set(self.pending.keys()), records)
+
+            maybe_checkpoint(self.filename)
+
+            count = len(self.pending)
+            self.on_disk.update(self.pending.keys())
+            self.pending = {}
+            self.dirty_since = None
+            self.flushes += 1
+            self._adopt_file(end)
+            return count
+
+    def sync(self):
+        """
+        Catch up if another program changed the file (waiting records are kept).
+        Returns True if something was read.
+        """
+        with self.lock:
+            if file_stamp(self.filename) == self.stamp:
+                return False
+            new = self._read_appended()
+            if new is None:
+                self.load() # puts the waiting records back itself
+                return True
+            # the appended days are in the file now; a waiting record of the
+            # same user and day still wins (flush will replace the file's one)
+            for rec in new:
+                if rec["summary"]:
+                    continue
+                pair = (rec["key"], rec["date"])
+                self.on_disk.add(pair)
+                if pair in self.pending:
+                    self._apply_save(rec["date"], self.pending[pair][3])
+            return True
+
+    def import_lines(self, lines):
+        """
+        Write the waiting records first, then import (see HistoryState.import_lines).
+        """
+        with self.lock:
+            self.flush()
+            return HistoryState.import_lines(self, lines)
+
+    def start_timer(self):
+        """
+        Check every TIMER_SECONDS in a background thread whether a flush is due,
+        so the durability window holds even while nobody clicks anything.
+        """
+        def tick():
+            if self.timer is None:
+                return # close() was called meanwhile
+            self.maybe_flush()
+            self.start_timer()
+
+        self.timer = threading.Timer(TIMER_SECONDS, tick)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def close(self):
+        """
+        Stop the timer and write everything that is still waiting.
+        Safe to call more than once (the window's close button and atexit both call it).
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.flush()
@@ -0,0 +1,155 @@
+"""
+Roll up old daily records into monthly summaries.
+
+Daily lines older than the horizon (default one year) are only used for
+all-time totals. This job replaces each user's old daily lines with one summary
+line per month:
+
+    2024-03 | Harry | Summary Days=20, Drink water=15, Exercise=10, Sleep 8 hours=12, Points=45
+
+Points are added up exactly, so totals and ranks don't change.
+Summary lines are written first (oldest month first), then the newer daily lines
+in their original order. The file is replaced in one step (write a temporary
+file, then os.replace), so a crash can't leave it half-written, and lines other
+programs append meanwhile are kept (see recovery.rewrite_lines).
+
+Note: load_history skips summary lines, so streaks only look at the daily
+records that are still inside the horizon.
+
+Example:
+    python rollup.py --horizon-days 365
+"""
+
+import argparse
+import datetime
+import os
+
+from records import format_summary_line, parse_line
+from recovery import CHECKPOINT_TAG, rewrite_lines
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+DEFAULT_HORIZON_DAYS = 365
+
+
+def rolled_up_lines(raw_lines, cutoff):
+    """
+    Return the new lines of the file (text, without "\n"): monthly summaries for
+    every record dated before cutoff, then the other lines as they were.
+
+    Parameters:
+        raw_lines (list of bytes): the complete lines of the file
+        cutoff (str): e.g. "2024-11-01"; daily records before it are rolled up
+    """
+    # month summaries: (month, lowercase name) -> summary data
+    months = {}
+    month_order = [] # keys in the order we first saw them
+    kept = [] # lines that stay as they are
+    first_name = {} # lowercase name -> name on the user's first line (for display)
+
+    for raw in raw_lines:
+        line = raw.decode("utf-8", errors="replace").strip()
+        if line == "":
+            continue
+
+        # old checkpoint markers are useless once the file is rewritten
+        if line.startswith(CHECKPOINT_TAG):
+            continue
+
+        rec = parse_line(line)
+        # keep broken lines and recent daily lines unchanged
+        if rec is None:
+            kept.append(line)
+            continue
+        if rec["key"] not in first_name:
+            first_name[rec["key"]] = rec["name"]
+        if not rec["summary"] and rec["date"] >= cutoff:
+            kept.append(line)
+            continue
+
+        month = rec["date"][:7]
+        key = (month, rec["key"])
+        if key not in months:
+            months[key] = {"name": rec["name"], "dates": set(), "days": 0,
+                           "habits": {}, "points": 0}
+            month_order.append(key)
+        m = months[key]
+
+        m["points"] += rec["points"]
+        for habit in rec["habits"]:
+            m["habits"][habit] = m["habits"].get(habit, 0) + rec["habits"][habit]
+        if rec["summary"]:
+            # an older summary of the same month (from an earlier run)
+            m["days"] += rec["days"]
+        else:
+            m["dates"].add(rec["date"])
+
+    # build the summary lines, oldest month first (stable for the same month)
+    month_order.sort(key=lambda k: k[0])
+    lines = []
+    written = set() # users that already have a summary line
+    for key in month_order:
+        m = months[key]
+        days = m["days"] + len(m["dates"])
+
+        # the user's first line now is this summary, so it gets the name
+        # load_totals_all used to see first (keeps display names the same)
+        name = m["name"]
+        if key[1] not in written:
+            name = first_name[key[1]]
+            written.add(key[1])
+        lines.append(format_summary_line(key[0], name, days, m["habits"], m["points"]))
+    lines.extend(kept)
+    return lines
+
+
+def rollup_history(filename=HISTORY_FILE, horizon_days=DEFAULT_HORIZON_DAYS, today=None):
+    """
+    Replace daily records older than the horizon with monthly summary records.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        horizon_days (int): keep daily records for this many days
+        today (datetime.date): the date to count back from (default: today)
+
+    Returns:
+        (lines_before, lines_after)
+    """
+    if today is None:
+        today = datetime.date.today()
+    cutoff = str(today - datetime.timedelta(days=horizon_days))
+
+    def roll_up(raw_lines):
+        if len(raw_lines) == 0:
+            return None # no file (or an empty one): nothing to do
+        new_lines = []
+        for line in rolled_up_lines(raw_lines, cutoff):
+            new_lines.append((line + "\n").encode("utf-8"))
+        return new_lines
+
+    # a last line that is still being written, and lines appended by other
+    # programs meanwhile, are carried over as they are
+    raw_lines, new_lines = rewrite_lines(filename, roll_up)
+    if new_lines is None:
+        return (0, 0)
+    lines_before = 0
+    for raw in raw_lines:
+        if raw.strip() != b"":
+            lines_before += 1
+    return (lines_before, len(new_lines))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roll up old daily records into monthly summaries.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--horizon-days", type=int, default=DEFAULT_HORIZON_DAYS,
+                        help="keep daily records newer than this many days")
+    args = parser.parse_args(argv)
+
+    before, after = rollup_history(args.file, args.horizon_days)
+    print(f"Rolled up {args.file}: {before} lines -> {after} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Score index for the Health Habit Tracker.
+
+This file keeps a count of how many users have each total score, stored in a
+Fenwick tree (also called a binary indexed tree). With it we can answer
+"how many users scored more than X?" in O(log maxscore) time instead of
+sorting every user again.
+
+It is used for the "you're in the top 3%" message in both main.py and gui_main.py.
+"""
+
+
+class ScoreHistogram:
+    """
+    A histogram of user total scores, backed by a Fenwick tree.
+
+    Slot i of the tree counts the users whose total score is exactly i.
+    Negative totals are counted in slot 0 (points are never negative in practice).
+    """
+
+    def __init__(self, max_score=64):
+        """
+        Set up an empty histogram that can hold scores from 0 to max_score.
+        The tree grows by itself if a bigger score shows up later.
+        """
+        self.size = max(1, max_score + 1) # number of score slots
+        self.tree = [0] * (self.size + 1) # Fenwick tree uses index 1..size
+        self.count = 0 # number of users in the histogram
+
+    def _slot(self, score):
+        # turn a score into a slot number, clamping negative scores to 0
+        if score < 0:
+            return 0
+        return score
+
+    def _grow(self, score):
+        """
+        Make the tree big enough to hold this score.
+        Doubles the size until it fits, then rebuilds the tree from the old counts.
+        """
+        old_counts = []
+        for s in range(self.size):
+            old_counts.append(self.exact_count(s))
+
+        new_size = self.size
+        while new_size <= score:
+            new_size = new_size * 2
+
+        self.size = new_size
+        self.tree = [0] * (self.size + 1)
+        for s in range(len(old_counts)):
+            if old_counts[s] != 0:
+                self._change(s, old_counts[s])
+
+    def _change(self, slot, delta):
+        # add delta to one slot (standard Fenwick update)
+        i = slot + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & (-i)
+
+    def _prefix(self, slot):
+        # number of users with score <= slot (standard Fenwick prefix sum)
+        if slot < 0:
+            return 0
+        if slot >= self.size:
+            slot = self.size - 1
+        total = 0
+        i = slot + 1
+        while i > 0:
+            total += self.tree[i]
+            i -= i & (-i)
+        return total
+
+    def add(self, score):
+        """
+        Add one user with this total score.
+        """
+        slot = self._slot(score)
+        if slot >= self.size:
+            self._grow(slot)
+        self._change(slot, 1)
+        self.count += 1
+
+    def remove(self, score):
+        """
+        Remove one user with this total score.
+        """
+        slot = self._slot(score)
+        if slot >= self.size:
+            return
+        self._change(slot, -1)
+        self.count -= 1
+
+    def update(self, old_score, new_score):
+        """
+        Move one user from old_score to new_score.
+        """
+        if self._slot(old_score) == self._slot(new_score):
+            return
+        self.remove(old_score)
+        self.add(new_score)
+
+    def exact_count(self, score):
+        """
+        Return how many users have exactly this score.
+        """
+        slot = self._slot(score)
+        return self._prefix(slot) - self._prefix(slot - 1)
+
+    def count_above(self, score):
+        """
+        Return how many users have a score strictly greater than this one.
+        """
+        return self.count - self._prefix(self._slot(score))
+
+    def rank_of_score(self, score):
+        """
+        Return the rank this score would get (1 = best).
+        Users with the same score share a rank, so this is
+        "number of users with a higher score" + 1.
+        """
+        return self.count_above(score) + 1
+
+    def percentile(self, score):
+        """
+        Return the "top X%" value for this score, between 0 and 100.
+        For example 3.0 means the score is in the top 3% of users.
+        If there are no users yet, return 100.0.
+        """
+        if self.count == 0:
+            return 100.0
+        top = self.rank_of_score(score) * 100.0 / self.count
+        if top > 100.0:
+            top = 100.0
+        return round(top, 1)
+
+    def distribution(self, bucket_size=5):
+        """
+        Return the score distribution as a list of (low, high, users) tuples.
+        Each bucket covers scores low..high (inclusive). Empty buckets are skipped.
+        """
+        if bucket_size < 1:
+            bucket_size = 1
+
+        buckets = []
+        low = 0
+        while low < self.size:
+            high = low + bucket_size - 1
+            users = self._prefix(high) - self._prefix(low - 1)
+            if users > 0:
+                buckets.append((low, high, users))
+            low = low + bucket_size
+        return buckets
+
+
+class ScoreBoard:
+    """
+    Keep every user's total score together with a ScoreHistogram,
+    so the histogram can be updated step by step when one total changes.
+    """
+
+    def __init__(self, totals=None):
+        """
+        Set up the board from a dict of lowercase name -> total points.
+        """
+        self.totals = {} # lowercase name -> total points
+        max_score = 64
+        if totals:
+            for key in totals:
+                if totals[key] > max_score:
+                    max_score = totals[key]
+        self.hist = ScoreHistogram(max_score)
+
+        if totals:
+            for key in totals:
+                self.totals[key] = totals[key]
+                self.hist.add(totals[key])
+
+    def set_total(self, name, new_total):
+        """
+        Set one user's total points and update the histogram in O(log maxscore).
+        """
+        key = name.strip().lower()
+        if key in self.totals:
+            self.hist.update(self.totals[key], new_total)
+        else:
+            self.hist.add(new_total)
+        self.totals[key] = new_total
+
+    def add_points(self, name, delta):
+        """
+        Add delta points to one user's total.
+        """
+        key = name.strip().lower()
+        old_total = self.totals.get(key, 0)
+        self.set_total(key, old_total + delta)
+
+    def total_of(self, name):
+        """
+        Return the user's total points (0 if the user has no records).
+        """
+        return self.totals.get(name.strip().lower(), 0)
+
+    def percentile(self, name):
+        """
+        Return the "top X%" value for this user.
+        Users with no records are treated as having 0 points.
+        """
+        key = name.strip().lower()
+        if key not in self.totals:
+            # a user with no record is ranked after everyone else
+            return 100.0
+        return self.hist.percentile(self.totals[key])
+
+    def rank_of_score(self, score):
+        """
+        Return the rank a total of this score would get (ties share a rank).
+        """
+        return self.hist.rank_of_score(score)
+
+    def distribution(self, bucket_size=5):
+        """
+        Return the score distribution, see ScoreHistogram.distribution.
+        """
+        return self.hist.distribution(bucket_size)
+
+
+def build_score_board(totals):
+    """
+    Build a ScoreBoard from the totals dict returned by load_totals_all.
+    """
+    return ScoreBoard(totals)
@@ -0,0 +1,381 @@
+"""
+Shadow mode: check the fast paths against the original functions on live data.
+
+The fast paths (HistoryState, the resident store, the leaderboard snapshot,
+the date index) are meant to give exactly the same answers as the original
+functions in main.py: load_history, weekly_average, load_totals_all and
+get_user_rank. Shadow mode checks that on a sample of real calls:
+
+    - the call is answered by the fast path as usual (its result is returned);
+    - on a sampled call the original function runs as well, both are timed,
+      and the two answers are compared (rank order with ties, and the
+      first-seen display names, are part of the answer);
+    - a difference is written to progress.txt.shadow.log (one JSON per line);
+    - the timings go into a histogram per check and per path, which is added
+      to progress.txt.shadow.json when the program exits.
+
+It is off unless a rate is set (0 = off, 1 = every call):
+
+    HABIT_SHADOW_RATE=0.05 python main.py
+    python main.py --shadow-rate 1 --stdin < commands.txt
+    python gui_main.py --resident --shadow-rate 0.05
+    python shadow.py            (print the report)
+    python shadow.py --reset    (start counting again)
+
+A sampled call runs both paths, so it is as slow as the original function.
+Calls where the two can't agree (saves still waiting in the resident store,
+or the file changed under the loaded history) are counted as skipped.
+"""
+
+import argparse
+import atexit
+import datetime
+import json
+import os
+import random
+import time
+
+from recovery import open_temp_beside
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+RATE_ENV = "HABIT_SHADOW_RATE" # fraction of calls to check, e.g. "0.05"
+
+# histogram bucket upper bounds in milliseconds (one more bucket for slower calls)
+BUCKETS_MS = [0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000]
+
+MAX_LOGGED = 100 # mismatches written to the log per program run
+MAX_DIFF_ITEMS = 20 # differing keys kept per mismatch
+
+
+def log_path(filename):
+    """
+    Return the mismatch log file for this history file.
+    """
+    return filename + ".shadow.log"
+
+
+def stats_path(filename):
+    """
+    Return the timing and counter file for this history file.
+    """
+    return filename + ".shadow.json"
+
+
+def rate_from_env():
+    """
+    Return the sample rate from HABIT_SHADOW_RATE (0 if it is missing or not a number).
+    """
+    try:
+        rate = float(os.environ.get(RATE_ENV, "0"))
+    except ValueError:
+        return 0.0
+    return min(max(rate, 0.0), 1.0)
+
+
+def difference(fast, legacy):
+    """
+    Return a short description of where two answers differ, for the log.
+    Dicts: only the keys that differ. Lists/tuples: the first position that differs.
+    """
+    if isinstance(fast, dict) and isinstance(legacy, dict):
+        diff = {}
+        for key in sorted(set(fast) | set(legacy), key=str):
+            if fast.get(key) != legacy.get(key):
+                diff[str(key)] = [fast.get(key), legacy.get(key)]
+                if len(diff) >= MAX_DIFF_ITEMS:
+                    break
+        return {"keys": diff}
+    if isinstance(fast, (list, tuple)) and isinstance(legacy, (list, tuple)):
+        for i in range(min(len(fast), len(legacy))):
+            if fast[i] != legacy[i]:
+                return {"index": i, "diff": difference(fast[i], legacy[i])}
+        return {"lengths": [len(fast), len(legacy)]}
+    return {"fast": fast, "legacy": legacy}
+
+
+def new_histogram():
+    """
+    Return an empty latency histogram.
+    """
+    return {"count": 0, "total_ms": 0.0, "buckets": [0] * (len(BUCKETS_MS) + 1)}
+
+
+def add_time(histogram, ms):
+    """
+    Count one call that took ms milliseconds.
+    """
+    histogram["count"] += 1
+    histogram["total_ms"] += ms
+    i = 0
+    while i < len(BUCKETS_MS) and ms > BUCKETS_MS[i]:
+        i += 1
+    histogram["buckets"][i] += 1
+
+
+def percentile_ms(histogram, q):
+    """
+    Return the bucket bound that q (0..1) of the calls stayed under (None if empty).
+    """
+    if histogram["count"] == 0:
+        return None
+    needed = q * histogram["count"]
+    seen = 0
+    for i in range(len(histogram["buckets"])):
+        seen += histogram["buckets"][i]
+        if seen >= needed:
+            if i < len(BUCKETS_MS):
+                return BUCKETS_MS[i]
+            return float("inf")
+    return float("inf")
+
+
+def legacy_leaderboard(filename=HISTORY_FILE, top_n=None):
+    """
+    Return leaderboard rows [display_name, total_points] the original way:
+    load_totals_all, sorted by points (desc) then name (asc). The sort is
+    stable, so equal names keep the file order, like the bubble sort in get_user_rank.
+    """
+    from main import load_totals_all
+
+    totals, display = load_totals_all(filename)
+    keys = sorted(totals.keys(), key=lambda k: (-totals[k], display[k].lower()))
+    if top_n is not None:
+        keys = keys[:top_n]
+    rows = []
+    for k in keys:
+        rows.append([display[k], totals[k]])
+    return rows
+
+
+def state_in_step(state):
+    """
+    Return True if a loaded HistoryState / ResidentStore holds exactly what
+    is on disk, so the original functions (which read the file) can agree with it.
+    """
+    from history_state import file_stamp
+
+    if len(getattr(state, "pending", {})) > 0:
+        return False # saves that are not written yet
+    return state.stamp == file_stamp(state.filename)
+
+
+class Shadow:
+    """
+    Sampled side-by-side runs of a fast path and its original function.
+    """
+
+    def __init__(self, filename=HISTORY_FILE, rate=None, seed=None):
+        """
+        Parameters:
+            filename (str): the history file (the log and stats files sit next to it)
+            rate (float): fraction of calls to check (None = from HABIT_SHADOW_RATE)
+            seed (int): seed for the sampling (None = random)
+        """
+        self.filename = filename
+        if rate is None:
+            rate = rate_from_env()
+        self.rate = rate
+        self.random = random.Random(seed)
+        self.checks = {} # check name -> {"sampled", "mismatches", "skipped", "fast", "legacy"}
+        self.logged = 0
+        atexit.register(self.save)
+
+    def _counters(self, check):
+        if check not in self.checks:
+            self.checks[check] = {"sampled": 0, "mismatches": 0, "skipped": 0,
+                                  "fast": new_histogram(), "legacy": new_histogram()}
+        return self.checks[check]
+
+    def compare(self, check, fast, legacy, args=None, ready=True, key=None):
+        """
+        Return fast(). On a sampled call also run legacy() and compare the answers.
+
+        Parameters:
+            check (str): name of what is compared, e.g. "rank"
+            fast (callable): the path that answers the call
+            legacy (callable): the original function, with the same answer
+            args: what the call was about (written to the log), e.g. the user name
+            ready (bool or callable): False if the two can't agree right now
+            key (callable): turns the fast answer into the legacy answer's shape
+                            before comparing (None = compare as they are)
+        """
+        if self.rate <= 0 or self.random.random() >= self.rate:
+            return fast()
+
+        counters = self._counters(check)
+        start = time.perf_counter()
+        result = fast()
+        fast_ms = (time.perf_counter() - start) * 1000
+
+        if callable(ready):
+            ready = ready()
+        if not ready:
+            counters["skipped"] += 1
+            return result
+
+        start = time.perf_counter()
+        try:
+            expected = legacy()
+        except Exception as e:
+            # the check must never break the call itself
+            expected = {"error": type(e).__name__ + ": " + str(e)}
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        counters["sampled"] += 1
+        add_time(counters["fast"], fast_ms)
+        add_time(counters["legacy"], legacy_ms)
+        answer = result
+        if key is not None:
+            answer = key(result)
+        if answer != expected:
+            counters["mismatches"] += 1
+            self.log_mismatch(check, args, answer, expected)
+        return result
+
+    def log_mismatch(self, check, args, fast, legacy):
+        """
+        Append one mismatch to the log (at most MAX_LOGGED per run).
+        """
+        if self.logged >= MAX_LOGGED:
+            return
+        self.logged += 1
+        entry = {"time": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "check": check, "args": args, "diff": difference(fast, legacy)}
+        try:
+            with open(log_path(self.filename), "a") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError:
+            pass
+
+    def save(self):
+        """
+        Add this run's counters and histograms to the stats file, then start from zero.
+        """
+        if len(self.checks) == 0:
+            return
+        stats = load_stats(self.filename)
+        for check in self.checks:
+            mine = self.checks[check]
+            if check not in stats:
+                stats[check] = {"sampled": 0, "mismatches": 0, "skipped": 0,
+                                "fast": new_histogram(), "legacy": new_histogram()}
+            total = stats[check]
+            for field in ("sampled", "mismatches", "skipped"):
+                total[field] += mine[field]
+            for path in ("fast", "legacy"):
+                total[path]["count"] += mine[path]["count"]
+                total[path]["total_ms"] += mine[path]["total_ms"]
+                for i in range(len(BUCKETS_MS) + 1):
+                    total[path]["buckets"][i] += mine[path]["buckets"][i]
+        try:
+            f, tmp_name = open_temp_beside(stats_path(self.filename), "w")
+            with f:
+                json.dump(stats, f)
+            os.replace(tmp_name, stats_path(self.filename))
+        except OSError:
+            return
+        self.checks = {}
+
+
+def load_stats(filename=HISTORY_FILE):
+    """
+    Return the saved counters and histograms (empty if there are none,
+    or if they were saved with other buckets).
+    """
+    try:
+        with open(stats_path(filename), "r") as f:
+            stats = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    for check in stats:
+        if len(stats[check]["fast"]["buckets"]) != len(BUCKETS_MS) + 1:
+            return {}
+    return stats
+
+
+# one Shadow per history file, shared inside this program
+_shadows = {}
+
+
+def get_shadow(filename=HISTORY_FILE, rate=None):
+    """
+    Return the Shadow of this history file. A rate given here replaces the
+    current one (used by main.py --shadow-rate).
+    """
+    if filename not in _shadows:
+        _shadows[filename] = Shadow(filename, rate)
+    elif rate is not None:
+        _shadows[filename].rate = rate
+    return _shadows[filename]
+
+
+def report(filename=HISTORY_FILE):
+    """
+    Return one row per check: counts, mean / p50 / p95 times of both paths and the speedup.
+    """
+    stats = load_stats(filename)
+    rows = []
+    for check in sorted(stats):
+        s = stats[check]
+        row = {"check": check, "sampled": s["sampled"], "mismatches": s["mismatches"],
+               "skipped": s["skipped"], "speedup": None}
+        for path in ("fast", "legacy"):
+            h = s[path]
+            row[path] = {"mean_ms": round(h["total_ms"] / h["count"], 3) if h["count"] else None,
+                         "p50_ms": percentile_ms(h, 0.5), "p95_ms": percentile_ms(h, 0.95)}
+        if s["fast"]["total_ms"] > 0:
+            row["speedup"] = round(s["legacy"]["total_ms"] / s["fast"]["total_ms"], 1)
+        rows.append(row)
+    return rows
+
+
+def _bound(ms):
+    if ms is None:
+        return "-"
+    if ms == float("inf"):
+        return f">{BUCKETS_MS[-1]}"
+    return f"<={ms}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report of the shadow checks (fast paths vs original functions).")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--reset", action="store_true", help="delete the counters and the mismatch log")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        for path in (stats_path(args.file), log_path(args.file)):
+            if os.path.exists(path):
+                os.remove(path)
+        print("Shadow counters and log deleted.")
+        return
+
+    rows = report(args.file)
+    if args.json:
+        print(json.dumps(rows))
+        return
+
+    print("\n===== Shadow checks =====")
+    if len(rows) == 0:
+        print(f"No sampled calls yet (set {RATE_ENV}, e.g. {RATE_ENV}=0.05).")
+        return
+    for row in rows:
+        speedup = "-" if row["speedup"] is None else f"{row['speedup']}x"
+        print(f"{row['check']}: {row['sampled']} compared, {row['mismatches']} mismatch(es), "
+              f"{row['skipped']} skipped, speedup {speedup}")
+        for path in ("fast", "legacy"):
+            t = row[path]
+            print(f"    {path:<6} mean {t['mean_ms']} ms, p50 {_bound(t['p50_ms'])} ms, "
+                  f"p95 {_bound(t['p95_ms'])} ms")
+    mismatches = 0
+    for row in rows:
+        mismatches += row["mismatches"]
+    if mismatches > 0:
+        print(f"\nDetails: {log_path(args.file)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Startup time budget and profile mode.
+
+Both programs should be usable quickly: the menu should ask for a name, and
+the window should be on screen, before any history is read or any heavy module
+is imported. To check that, run:
+
+    python main.py --profile-startup        (time to the first prompt)
+    python gui_main.py --profile-startup    (time to the first window)
+
+The program is started again in a child process with "python -X importtime".
+The child stops as soon as it reaches the milestone (mark() below). Then this
+module prints the wall time from start to milestone (interpreter start
+included), the slowest imports, and whether the time is inside BUDGET_MS.
+The exit code is 1 if the budget was broken, so a script can catch regressions.
+
+This module only imports the standard modules it needs right away, because
+the entry points import it first.
+"""
+
+import os
+import sys
+import time
+
+FLAG = "--profile-startup"
+CHILD_ENV = "HABIT_STARTUP_CHILD" # set in the child process
+MARK_TAG = "#startup-mark"
+
+# allowed time from "python ..." to the milestone, in milliseconds
+BUDGET_MS = {
+    "first prompt": 150,
+    "first window": 500,
+}
+
+TOP_IMPORTS = 10 # how many imports the report lists
+
+
+def requested(argv=None):
+    """
+    Return True if the profile mode was asked for on the command line.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    return FLAG in argv
+
+
+def is_child():
+    """
+    Return True inside the child process started by profile().
+    """
+    return os.environ.get(CHILD_ENV) == "1"
+
+
+def strip_flag(argv):
+    """
+    Return the arguments without the profile flag.
+    """
+    result = []
+    for item in argv:
+        if item != FLAG:
+            result.append(item)
+    return result
+
+
+def mark(label):
+    """
+    Called by an entry point when it reaches a milestone ("first prompt",
+    "first window"). In the child process: report the time and stop at once.
+    Anywhere else this does nothing.
+    """
+    if not is_child():
+        return
+    sys.stdout.write(f"\n{MARK_TAG} {label} {time.time():.6f}\n")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
+
+
+def parse_importtime(text):
+    """
+    Read the "-X importtime" lines from stderr.
+
+    Returns:
+        list of (cumulative_us, self_us, module name), slowest first
+    """
+    rows = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue # the header line
+        rows.append((cumulative_us, self_us, parts[2].strip()))
+    rows.sort(reverse=True)
+    return rows
+
+
+def profile(script, label, extra_args=None):
+    """
+    Run script in a child process up to the milestone and print a report.
+
+    Parameters:
+        script (str): path of the entry point (main.py or gui_main.py)
+        label (str): the milestone the script passes to mark()
+        extra_args (list): more command line arguments for the child
+
+    Returns:
+        exit code: 0 inside the budget, 1 over it or if the milestone was not reached
+    """
+    import subprocess
+
+    env = dict(os.environ)
+    env[CHILD_ENV] = "1"
+    command = [sys.executable, "-X", "importtime", script] + list(extra_args or [])
+
+    start = time.time()
+    result = subprocess.run(command, env=env, stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, timeout=120)
+
+    reached = None
+    for line in result.stdout.splitlines():
+        if line.startswith(MARK_TAG + " " + label + " "):
+            reached = float(line.rsplit(" ", 1)[1])
+    if reached is None:
+        print(f"The program stopped before the {label} (exit code {result.returncode}).")
+        errors = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                errors.append(line)
+        print("\n".join(errors[-20:]))
+        return 1
+
+    elapsed_ms = (reached - start) * 1000
+    imports = parse_importtime(result.stderr)
+    import_ms = 0
+    for cumulative_us, self_us, name in imports:
+        import_ms += self_us / 1000
+
+    budget = BUDGET_MS.get(label)
+    print(f"\n===== Startup profile: {os.path.basename(script)} =====")
+    print(f"Time to {label}: {elapsed_ms:.0f} ms (interpreter start included)")
+    print(f"Time spent importing: {import_ms:.0f} ms in {len(imports)} module(s)")
+    print("\nSlowest imports (cumulative ms / own ms):")
+    for cumulative_us, self_us, name in imports[:TOP_IMPORTS]:
+        print(f"  {cumulative_us / 1000:7.1f}  {self_us / 1000:7.1f}  {name.strip()}")
+
+    if budget is None:
+        return 0
+    if elapsed_ms > budget:
+        print(f"\nOVER BUDGET: {elapsed_ms:.0f} ms > {budget} ms")
+        return 1
+    print(f"\nWithin budget ({budget} ms).")
+    return 0
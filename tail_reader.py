@@ -0,0 +1,240 @@
+"""
+Live tail reader for progress.txt.
+
+HistoryTail remembers how far it has read (a byte offset), which file it was
+reading (inode) and the last few bytes before that offset. On each poll() it
+reads only the lines that were appended since last time and folds them into
+in-memory totals, streaks and the leaderboard.
+
+If the file was truncated, replaced, or rewritten in the middle (for example
+when save_today replaces an older record from today), it falls back to a full reload.
+
+FilePosition is that "how far have I read" part on its own. HistoryState,
+the date index and the habit index use it too, and recovery.py uses it to
+check that a file is still the one it read before replacing it.
+"""
+
+import os
+
+from archive import archive_streaks, archive_totals
+from records import parse_line
+
+# how many bytes before the offset we remember to notice rewrites
+FINGERPRINT_BYTES = 256
+
+
+def read_fingerprint(f, end):
+    """
+    Return the last FINGERPRINT_BYTES bytes before "end" of an open binary file.
+    """
+    start = end - FINGERPRINT_BYTES
+    if start < 0:
+        start = 0
+    f.seek(start)
+    return f.read(end - start)
+
+
+class FilePosition:
+    """
+    How far a reader got in a file that is normally only appended to:
+    the byte offset, the inode, and the last bytes before the offset.
+    """
+
+    def __init__(self):
+        """
+        Start at the beginning of no file in particular.
+        """
+        self.offset = 0 # how many bytes were read
+        self.inode = None # inode of the file that was read
+        self.fingerprint = b"" # the last bytes before offset
+
+    def is_same_file(self, f, st):
+        """
+        Check that the open file f (st = its os.fstat) still starts with what was read:
+        not replaced, not truncated, and not rewritten before the offset.
+        """
+        if self.inode is None:
+            return self.offset == 0
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            return False
+        return read_fingerprint(f, self.offset) == self.fingerprint
+
+    def move_to(self, f, st, offset):
+        """
+        Remember that the open file f was read up to this offset.
+        """
+        self.offset = offset
+        self.inode = st.st_ino
+        self.fingerprint = read_fingerprint(f, offset)
+
+    def read_new(self, f, st):
+        """
+        Return the complete lines written after the offset (bytes, maybe b"")
+        and move past them. A half-written last line is left for next time.
+        Call is_same_file first.
+        """
+        self.inode = st.st_ino
+        if st.st_size <= self.offset:
+            return b""
+        f.seek(self.offset)
+        data = f.read(st.st_size - self.offset)
+        end = data.rfind(b"\n")
+        if end == -1:
+            return b""
+        data = data[:end + 1]
+        self.move_to(f, st, self.offset + len(data))
+        return data
+
+    def get_state(self):
+        """
+        Return the position as plain JSON-friendly data.
+        """
+        return {"offset": self.offset, "inode": self.inode, "fingerprint": self.fingerprint.hex()}
+
+    def set_state(self, state):
+        """
+        Continue from a state returned by get_state.
+        """
+        self.offset = state["offset"]
+        self.inode = state["inode"]
+        self.fingerprint = bytes.fromhex(state["fingerprint"])
+
+
+def position_of(filename):
+    """
+    Return a FilePosition at the current end of this file (at 0 if there is no file).
+    """
+    position = FilePosition()
+    try:
+        f = open(filename, "rb")
+    except FileNotFoundError:
+        return position
+    with f:
+        st = os.fstat(f.fileno())
+        position.move_to(f, st, st.st_size)
+    return position
+
+
+class HistoryTail:
+    """
+    Keep totals, display names and streaks for all users up to date
+    by reading only the new end of the history file.
+    """
+
+    def __init__(self, filename):
+        """
+        Set up a tail reader for this file. Nothing is read until poll() is called.
+        """
+        self.filename = filename
+        self.full_reloads = 0 # how many times we had to read the whole file again
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything, so the next poll() reads the whole file again.
+        """
+        self.position = FilePosition() # how far we have read
+        # archived history (archive.py) is never re-read: start from its cached totals
+        self.totals, self.display = archive_totals(self.filename) # lowercase name -> points / name for printing
+        self.streaks = archive_streaks(self.filename) # lowercase name -> current streak (like calc_streak)
+
+    def apply_record(self, rec):
+        """
+        Fold one parsed record into the totals, display names and streaks.
+        """
+        key = rec["key"]
+        if key not in self.totals:
+            self.totals[key] = 0
+            self.display[key] = rec["name"]
+        if key not in self.streaks:
+            self.streaks[key] = 0
+        self.totals[key] = self.totals[key] + rec["points"]
+
+        # monthly summaries only count towards totals, like load_history skips them
+        if rec["summary"]:
+            return
+
+        # same rule as calc_streak: positive days add one, anything else resets
+        if rec["points"] > 0:
+            self.streaks[key] = self.streaks[key] + 1
+        else:
+            self.streaks[key] = 0
+
+    def poll(self):
+        """
+        Read any new lines from the file.
+
+        Returns:
+            changed (bool): True if totals may have changed since the last poll
+        """
+        try:
+            f = open(self.filename, "rb")
+        except FileNotFoundError:
+            # no file: forget old data if we had some
+            if self.position.inode is not None:
+                self.reset()
+                return True
+            return False
+
+        with f:
+            st = os.fstat(f.fileno())
+
+            changed = False
+            if not self.position.is_same_file(f, st):
+                self.reset()
+                self.full_reloads += 1
+                changed = True
+
+            # read only the new lines; a half-written last line waits for next time
+            data = self.position.read_new(f, st)
+            if data == b"":
+                return changed
+            for raw in data.split(b"\n"):
+                rec = parse_line(raw.decode("utf-8", errors="replace"))
+                if rec is not None:
+                    self.apply_record(rec)
+            return True
+
+    def leaderboard(self, top_n=None):
+        """
+        Return a list of [display_name, total_points], best first.
+        Ties are sorted alphabetically, same as the leaderboard in main.py.
+        """
+        keys = sorted(self.totals.keys(), key=lambda k: (-self.totals[k], self.display[k].lower()))
+        order = []
+        for k in keys:
+            order.append([self.display[k], self.totals[k]])
+        if top_n is not None:
+            order = order[:top_n]
+        return order
+
+    def get_state(self):
+        """
+        Return everything needed to continue reading later, as plain JSON-friendly data.
+        """
+        state = self.position.get_state()
+        state["rows"] = self.leaderboard()
+        state["streaks"] = self.streaks
+        return state
+
+    def set_state(self, state):
+        """
+        Continue from a state returned by get_state (for example from a snapshot file).
+        The next poll() checks the file and reads only what came after the saved offset.
+        """
+        self.reset()
+        self.position.set_state(state)
+        self.totals = {}
+        self.display = {}
+        self.streaks = {}
+        for name_text, total in state["rows"]:
+            key = name_text.lower()
+            self.totals[key] = total
+            self.display[key] = name_text
+            self.streaks[key] = state["streaks"].get(key, 0)
+
+    def streak_of(self, name):
+        """
+        Return the current streak of this user (0 if unknown).
+        """
+        return self.streaks.get(name.strip().lower(), 0)
@@ -0,0 +1,59 @@
+"""
+Shared fixtures for the tests.
+
+The project is a folder of scripts, so the folder above tests/ is put on
+sys.path and the modules are imported by name (import main, import records).
+"""
+
+import datetime
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import habit_config # noqa: E402 (needs the path above)
+from records import format_line # noqa: E402
+
+USERS = ["Ann", "Anna", "Bob", "cy"]
+
+
+@pytest.fixture(autouse=True)
+def default_habits(monkeypatch):
+    # use the built-in habits, whatever the real habits.json says
+    # (their ids are in the committed habit_ids.json, so nothing is written)
+    monkeypatch.setitem(habit_config._cache, habit_config.HABITS_FILE,
+                        habit_config.HabitConfig(habit_config.DEFAULT_CONFIG))
+    monkeypatch.setattr(habit_config, "_names_cache", {})
+    monkeypatch.setattr(habit_config, "_used_cache", {})
+    monkeypatch.delenv("HABIT_SHADOW_RATE", raising=False)
+
+
+def make_lines(days=90, users=USERS, seed=1, start=datetime.date(2024, 1, 1)):
+    """
+    Return history lines in date order: most users have a record on most days.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(days):
+        date_text = str(start + datetime.timedelta(days=i))
+        for name in users:
+            if rng.random() < 0.8:
+                completions = {"Drink water": rng.randint(0, 1), "Exercise": rng.randint(0, 1),
+                               "Sleep 8 hours": rng.randint(0, 1)}
+                lines.append(format_line(date_text, name, completions, sum(completions.values())))
+    return lines
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    """
+    A progress.txt with 90 days of records for a few users.
+    """
+    path = str(tmp_path / "progress.txt")
+    with open(path, "w") as f:
+        for line in make_lines():
+            f.write(line + "\n")
+    return path
@@ -0,0 +1,47 @@
+"""
+archive_history changes how the history is stored, not what the loaders answer.
+"""
+
+import datetime
+
+from archive import archive_history, history_lines, list_parts
+from main import get_user_rank, load_history, load_totals_all, weekly_average
+from rollup import rollup_history
+
+from conftest import USERS
+
+
+def answers(filename):
+    # what the menu would show for every user
+    result = {"totals": load_totals_all(filename)}
+    for name in USERS:
+        result[name] = (load_history(name, filename), weekly_average(name, filename, use_index=False),
+                        weekly_average(name, filename), get_user_rank(name, filename))
+    return result
+
+
+def test_archive_keeps_every_answer(history_file):
+    before = answers(history_file)
+    lines_before = list(history_lines(history_file))
+
+    assert archive_history(history_file, before="2024-02-01") > 0
+    assert len(list_parts(history_file)) == 1
+    assert archive_history(history_file, before="2024-03-01") > 0
+    assert len(list_parts(history_file)) == 2
+
+    assert list(history_lines(history_file)) == lines_before
+    assert answers(history_file) == before
+
+
+def test_archive_default_cutoff(history_file):
+    # the sample history is from 2024, so everything is older than 90 days
+    lines_before = list(history_lines(history_file))
+    assert archive_history(history_file) == len(lines_before)
+    assert list(history_lines(history_file)) == lines_before
+
+
+def test_rollup_after_archive(history_file):
+    before = load_totals_all(history_file)
+    archive_history(history_file, before="2024-02-01")
+    rollup_history(history_file, horizon_days=30, today=datetime.date(2024, 3, 30))
+    assert load_totals_all(history_file) == before
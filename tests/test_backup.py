@@ -0,0 +1,82 @@
+"""
+Incremental backups: base + deltas + archive parts, restored and checked by SHA-256.
+"""
+
+import os
+
+import pytest
+
+from archive import archive_history, history_lines
+from backup import backup, load_manifest, replay, restore, step_archive
+from main import load_totals_all
+from records import format_line
+from recovery import append_line, write_lines_atomic
+
+
+def lines_of(path):
+    with open(path, "r") as f:
+        return f.read().splitlines()
+
+
+def test_base_then_deltas(history_file, tmp_path):
+    target = str(tmp_path / "backup")
+    assert backup(history_file, target)[0] == "base"
+    assert backup(history_file, target) == ("none", 0)
+
+    # a new record is one added line
+    append_line(history_file, format_line("2024-04-01", "Ann", {"Drink water": 1}, 1))
+    assert backup(history_file, target) == ("delta", 1)
+
+    # a replaced record is one deleted and one added line
+    lines = lines_of(history_file)
+    lines[-1] = format_line("2024-04-01", "Ann", {"Drink water": 0}, 0)
+    write_lines_atomic(history_file, lines)
+    assert backup(history_file, target) == ("delta", 2)
+
+    out = str(tmp_path / "restored.txt")
+    restore(target, out)
+    assert lines_of(out) == lines
+
+    # an older step can be restored too
+    restore(target, out, upto=1)
+    assert lines_of(out) == lines[:-1]
+
+
+def test_archive_parts_are_backed_up(history_file, tmp_path):
+    target = str(tmp_path / "backup")
+    totals = load_totals_all(history_file)
+    backup(history_file, target)
+    archive_history(history_file, before="2024-02-15")
+    backup(history_file, target)
+    assert len(step_archive(target)) == 2 # part-0001.gz and part-0001.json
+
+    out = str(tmp_path / "restored.txt")
+    restore(target, out)
+    assert load_totals_all(out) == totals
+    assert list(history_lines(out)) == list(history_lines(history_file))
+
+    # the first step had no archive: restoring it removes the parts again
+    restore(target, out, upto=1)
+    assert os.listdir(out + ".archive") == []
+    assert load_totals_all(out) == totals
+
+
+def test_damaged_backup_is_refused(history_file, tmp_path):
+    target = str(tmp_path / "backup")
+    archive_history(history_file, before="2024-02-15")
+    backup(history_file, target)
+    step = load_manifest(target)["steps"][0]
+    assert len(replay(target)) == step["lines"]
+
+    # change one archive file in the backup
+    stored = os.path.join(target, "archive", step["archive"]["part-0001.json"])
+    with open(stored, "a") as f:
+        f.write(" ")
+    with pytest.raises(ValueError):
+        restore(target, str(tmp_path / "restored.txt"))
+
+    # change the base
+    with open(os.path.join(target, step["file"]), "a") as f:
+        f.write("2024-04-01 | Eve | Points=100\n")
+    with pytest.raises(ValueError):
+        replay(target)
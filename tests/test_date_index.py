@@ -0,0 +1,46 @@
+"""
+fast_weekly_average reads a sorted file from the end; it must agree with the full scan.
+"""
+
+from archive import archive_history
+from date_index import fast_weekly_average
+from main import weekly_average
+from records import format_line
+from recovery import append_line
+
+from conftest import USERS
+
+
+def test_same_as_full_scan(history_file):
+    for name in USERS + ["Nobody"]:
+        fast = fast_weekly_average(name, history_file)
+        assert fast is not None
+        assert fast == weekly_average(name, history_file, use_index=False)
+
+
+def test_whole_name_only(history_file):
+    # "Ann" and "Anna" are different users
+    ann = weekly_average("Ann", history_file, use_index=False)
+    anna = weekly_average("Anna", history_file, use_index=False)
+    append_line(history_file, format_line("2024-03-31", "Anna", {"Drink water": 1}, 50))
+    assert weekly_average("Ann", history_file, use_index=False) == ann
+    assert weekly_average("Anna", history_file, use_index=False) != anna
+    assert fast_weekly_average("Ann", history_file) == ann
+
+
+def test_after_appends_and_archive(history_file):
+    fast_weekly_average("Bob", history_file) # builds the index
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 1}, 1))
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 1, "Exercise": 1}, 2))
+    assert fast_weekly_average("Bob", history_file) == weekly_average("Bob", history_file, use_index=False)
+
+    archive_history(history_file, before="2024-03-01")
+    for name in USERS:
+        assert weekly_average(name, history_file) == weekly_average(name, history_file, use_index=False)
+
+
+def test_unsorted_file_falls_back(history_file):
+    # a record dated before the rest: the index can't answer, the full scan can
+    append_line(history_file, format_line("2023-12-01", "Bob", {"Drink water": 1}, 1))
+    assert fast_weekly_average("Bob", history_file) is None
+    assert weekly_average("Bob", history_file) == weekly_average("Bob", history_file, use_index=False)
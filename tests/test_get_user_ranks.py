@@ -0,0 +1,31 @@
+"""
+get_user_ranks gives the same answer as get_user_rank for every name.
+"""
+
+from main import get_user_rank, get_user_ranks
+from records import format_line
+from recovery import append_line
+
+from conftest import USERS
+
+
+def assert_like_legacy(names, filename):
+    expected = []
+    for name in names:
+        expected.append((name, get_user_rank(name, filename)))
+    assert list(get_user_ranks(names, filename)) == expected
+
+
+def test_same_as_get_user_rank(history_file):
+    assert_like_legacy(USERS + ["ANN ", "Nobody", "bob"], history_file)
+
+
+def test_ties_and_empty_file(tmp_path):
+    path = str(tmp_path / "progress.txt")
+    open(path, "w").close()
+    assert_like_legacy(["Ann", "Nobody"], path)
+
+    # equal totals are sorted by name
+    for name in ["bob", "Anna", "Ann"]:
+        append_line(path, format_line("2024-01-01", name, {"Drink water": 1}, 3))
+    assert_like_legacy(["Ann", "anna", "Bob", "Nobody"], path)
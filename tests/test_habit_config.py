@@ -0,0 +1,83 @@
+"""
+Habit ids in habits.json and habit_ids.json.
+"""
+
+import json
+
+import pytest
+
+import habit_config
+from records import format_line, parse_line
+
+
+def write_config(path, habits):
+    with open(path, "w") as f:
+        json.dump({"habits": habits}, f)
+
+
+def test_ids_are_remembered_when_used(tmp_path):
+    path = str(tmp_path / "habits.json")
+    write_config(path, [{"id": "w", "name": "Drink water"}, {"id": "m", "name": "Meditate"}])
+    habit_config.get_config(path)
+    # reading the config writes nothing
+    assert not (tmp_path / "habit_ids.json").exists()
+
+    habit_config.remember_ids(["m"], path)
+    assert habit_config.load_used_ids(path) == {"m": "Meditate"}
+
+    # "m" left the config, but its old records can still be read
+    habit_config._cache.pop(path)
+    write_config(path, [{"id": "w", "name": "Drink water"}])
+    assert habit_config.get_config(path).name_of("m") is None
+    assert habit_config.id_names(path)["m"] == "Meditate"
+
+
+def test_reused_id_is_rejected(tmp_path):
+    path = str(tmp_path / "habits.json")
+    write_config(path, [{"id": "w", "name": "Drink water"}])
+    habit_config.get_config(path)
+    habit_config.remember_ids(["w"], path)
+
+    habit_config._cache.pop(path)
+    write_config(path, [{"id": "w", "name": "Walk"}])
+    with pytest.raises(ValueError):
+        habit_config.get_config(path)
+
+
+def test_unused_id_can_be_given_to_another_habit(tmp_path):
+    path = str(tmp_path / "habits.json")
+    write_config(path, [{"id": "w", "name": "Drink water"}])
+    habit_config.get_config(path)
+
+    habit_config._cache.pop(path)
+    write_config(path, [{"id": "w", "name": "Walk"}])
+    assert habit_config.get_config(path).name_of("w") == "Walk"
+
+
+def test_broken_habits_json_still_reads_ids(tmp_path):
+    path = str(tmp_path / "habits.json")
+    write_config(path, [{"id": "w", "name": "Drink water"}])
+    habit_config.get_config(path)
+    habit_config.remember_ids(["w"], path)
+
+    habit_config._cache.pop(path)
+    with open(path, "w") as f:
+        f.write("{not json")
+    with pytest.raises(ValueError):
+        habit_config.get_config(path)
+    assert habit_config.id_names(path) == {"w": "Drink water"}
+
+    config, problem = habit_config.get_config_or_default(path)
+    assert problem is not None
+    assert config.habits_for("Ann") == ["Drink water", "Exercise", "Sleep 8 hours"]
+
+
+def test_habit_without_id_keeps_its_name():
+    line = format_line("2025-11-01", "Harry", {"Drink water": 1, "Read a book": 0}, 1)
+    assert "Read a book=No" in line
+    assert parse_line(line)["habits"] == {"Drink water": 1, "Read a book": 0}
+
+
+def test_unknown_habit_id_is_marked():
+    rec = parse_line("2025-11-01 | Harry | H=w+z-, Points=1")
+    assert rec["habits"] == {"Drink water": 1, "?z": 0}
@@ -0,0 +1,82 @@
+"""
+The saved and caught-up HabitIndex answers like a scan of the whole history.
+"""
+
+import os
+
+import habit_index
+from archive import archive_history, history_lines
+from habit_index import ALL_CLEAR, build_from_file, date_range, get_habit_index
+from records import format_line, parse_line
+from recovery import append_line, write_lines_atomic
+
+HABITS = ["Drink water", "Exercise", "Sleep 8 hours", ALL_CLEAR]
+
+
+def legacy_days(filename):
+    # date -> lowercase name -> habits of the user's last record that day
+    days = {}
+    names = {}
+    for line in history_lines(filename):
+        rec = parse_line(line)
+        if rec is None or rec["summary"]:
+            continue
+        names.setdefault(rec["key"], rec["name"])
+        days.setdefault(rec["date"], {})[rec["key"]] = rec["habits"]
+    return days, names
+
+
+def legacy_users_who(days, names, habit, date_text):
+    result = []
+    for key, habits in days.get(date_text, {}).items():
+        if habit == ALL_CLEAR:
+            done = len(habits) > 0 and all(habits[h] == 1 for h in habits)
+        else:
+            done = habits.get(habit, 0) == 1
+        if done:
+            result.append(names[key])
+    result.sort(key=lambda n: n.lower())
+    return result
+
+
+def assert_like_legacy(index, filename):
+    days, names = legacy_days(filename)
+    dates = date_range("2024-01-01", "2024-04-05")
+    for habit in HABITS:
+        for date_text in dates:
+            assert index.users_who(habit, date_text) == legacy_users_who(days, names, habit, date_text)
+        for start, end in [("2024-01-01", "2024-01-03"), ("2024-02-10", "2024-02-11")]:
+            expected = None
+            for day in date_range(start, end):
+                who = set(legacy_users_who(days, names, habit, day))
+                expected = who if expected is None else expected & who
+            assert index.every_day(habit, start, end) == sorted(expected, key=lambda n: n.lower())
+    # the caught-up index holds exactly what a new build from the file holds
+    fresh = build_from_file(filename).get_state()
+    state = index.get_state()
+    assert state["names"] == fresh["names"]
+    assert state["days"] == fresh["days"]
+
+
+def test_saved_index_catches_up(history_file):
+    assert_like_legacy(get_habit_index(history_file), history_file)
+
+    append_line(history_file, format_line("2024-04-01", "Dee", {"Drink water": 1, "Exercise": 1}, 3))
+    append_line(history_file, format_line("2024-04-01", "Ann", {"Drink water": 1}, 1))
+    # a later record of the same day replaces the earlier one
+    append_line(history_file, format_line("2024-04-01", "Ann", {"Drink water": 0}, 0))
+    habit_index._indexes.clear() # a new program: the index comes from its saved file
+    index = get_habit_index(history_file)
+    assert index.position.offset == os.path.getsize(history_file)
+    assert_like_legacy(index, history_file)
+
+
+def test_rewritten_file_is_built_again(history_file):
+    get_habit_index(history_file)
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    write_lines_atomic(history_file, lines[10:])
+    assert_like_legacy(get_habit_index(history_file), history_file)
+
+    archive_history(history_file, before="2024-02-01")
+    assert_like_legacy(get_habit_index(history_file), history_file)
@@ -0,0 +1,110 @@
+"""
+HistoryState answers like the original functions in main.py.
+"""
+
+import datetime
+
+import recovery
+from archive import archive_history
+from history_state import HistoryState
+from main import calc_streak, get_user_rank, load_history, save_today, weekly_average
+from records import format_line, parse_line
+from recovery import append_line, write_lines_atomic
+from shadow import legacy_leaderboard
+
+from conftest import USERS
+
+
+def assert_like_legacy(state, filename):
+    assert state.leaderboard() == legacy_leaderboard(filename)
+    assert state.leaderboard(2) == legacy_leaderboard(filename, 2)
+    for name in USERS + ["ANN ", "Nobody"]:
+        history = load_history(name, filename)
+        assert state.rank_of(name) == get_user_rank(name, filename)
+        assert [row[1] for row in state.history_of(name)] == history
+        assert state.streak_of(name) == calc_streak(history)
+        assert state.weekly_average_of(name) == weekly_average(name, filename, use_index=False)
+
+
+def test_loaded_state(history_file):
+    assert_like_legacy(HistoryState(history_file), history_file)
+
+
+def test_own_saves(history_file):
+    state = HistoryState(history_file)
+    state.save("Ann", {"Drink water": 1, "Exercise": 1, "Sleep 8 hours": 1}, 4, "2024-04-01")
+    state.save("Ann", {"Drink water": 0, "Exercise": 0, "Sleep 8 hours": 0}, 0, "2024-04-01")
+    state.save("Bob", {"Drink water": 1}, 1, "2024-01-05") # replaces a record in the middle
+    assert_like_legacy(state, history_file)
+    assert state.loads == 1
+
+
+def test_outside_appends_are_read_without_reloading(history_file):
+    state = HistoryState(history_file)
+    append_line(history_file, format_line("2024-04-01", "cy", {"Drink water": 1}, 1))
+    # a second record of the same day: load_history counts both lines
+    append_line(history_file, format_line("2024-04-01", "cy", {"Drink water": 1, "Exercise": 1}, 2))
+    assert state.sync()
+    assert not state.sync()
+    assert state.loads == 1
+    assert_like_legacy(state, history_file)
+
+    # a half-written line waits until it is complete
+    line = format_line("2024-04-02", "Anna", {"Drink water": 1}, 1)
+    with open(history_file, "a") as f:
+        f.write(line[:10])
+    state.sync()
+    with open(history_file, "a") as f:
+        f.write(line[10:] + "\n")
+    state.sync()
+    assert state.loads == 1
+    assert_like_legacy(state, history_file)
+
+
+def test_rewrites_reload(history_file):
+    state = HistoryState(history_file)
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    write_lines_atomic(history_file, lines[3:])
+    state.sync()
+    assert state.loads == 2
+    assert_like_legacy(state, history_file)
+
+    archive_history(history_file, before="2024-02-01")
+    state.sync()
+    assert state.loads == 3
+    assert_like_legacy(state, history_file)
+
+
+def test_replace_keeps_lines_appended_meanwhile(history_file, monkeypatch):
+    state = HistoryState(history_file)
+    late = format_line("2024-04-01", "cy", {"Drink water": 1}, 1)
+    read_for_rewrite = recovery.read_for_rewrite
+
+    def read_then_append(filename):
+        result = read_for_rewrite(filename)
+        append_line(filename, late) # another program saves while we rewrite
+        return result
+
+    monkeypatch.setattr(recovery, "read_for_rewrite", read_then_append)
+    state.save("Bob", {"Drink water": 1}, 1, "2024-01-05")
+    state.sync()
+    assert state.loads == 1
+    assert_like_legacy(state, history_file)
+
+
+def test_save_today_matches_the_whole_name(tmp_path):
+    path = str(tmp_path / "progress.txt")
+    today = str(datetime.date.today())
+    save_today("Anna", 3, {"Drink water": 1, "Exercise": 1, "Sleep 8 hours": 1}, path)
+    save_today("Ann", 1, {"Drink water": 1, "Exercise": 0, "Sleep 8 hours": 0}, path)
+    save_today("ann", 2, {"Drink water": 1, "Exercise": 1, "Sleep 8 hours": 0}, path)
+
+    records = []
+    with open(path, "r") as f:
+        for line in f:
+            rec = parse_line(line)
+            if rec is not None:
+                records.append((rec["date"], rec["key"], rec["points"]))
+    # Ann's second save replaced her first one; Anna's record is untouched
+    assert records == [(today, "anna", 3), (today, "ann", 2)]
@@ -0,0 +1,52 @@
+"""
+The snapshot plus the unread end of the file gives the same leaderboard as load_totals_all.
+"""
+
+import os
+
+from leaderboard_snapshot import load_leaderboard, load_tail, snapshot_path
+from main import calc_streak, load_history
+from records import format_line
+from recovery import append_line, write_lines_atomic
+from shadow import legacy_leaderboard
+
+from conftest import USERS
+
+
+def assert_like_legacy(filename):
+    assert load_leaderboard(filename) == legacy_leaderboard(filename)
+    assert load_leaderboard(filename, 3) == legacy_leaderboard(filename, 3)
+    tail = load_tail(filename)
+    tail.poll()
+    for name in USERS + ["Nobody"]:
+        assert tail.streak_of(name) == calc_streak(load_history(name, filename))
+
+
+def test_snapshot_then_appends(history_file):
+    assert_like_legacy(history_file)
+    assert os.path.exists(snapshot_path(history_file))
+
+    append_line(history_file, format_line("2024-04-01", "Dee", {"Drink water": 1}, 1))
+    # the saved snapshot is used: only the new line is read
+    tail = load_tail(history_file)
+    assert tail.position.offset > 0
+    assert tail.poll()
+    assert tail.full_reloads == 0
+    assert_like_legacy(history_file)
+
+
+def test_rewritten_file_is_read_again(history_file):
+    assert_like_legacy(history_file)
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    write_lines_atomic(history_file, lines[5:])
+    tail = load_tail(history_file)
+    tail.poll()
+    assert tail.full_reloads == 1
+    assert_like_legacy(history_file)
+
+
+def test_broken_snapshot_is_ignored(history_file):
+    with open(snapshot_path(history_file), "w") as f:
+        f.write("{not json")
+    assert_like_legacy(history_file)
@@ -0,0 +1,66 @@
+"""
+query_records gives the same records as parsing every line and filtering them one by one.
+"""
+
+import datetime
+
+from archive import archive_history, history_lines
+from query import habit_done, month_inside, query_records, users_every_day
+from records import parse_line
+from rollup import rollup_history
+
+
+def legacy_query(filename, start=None, end=None, users=None, habit=None):
+    keys = None
+    if users is not None:
+        keys = set()
+        for u in users:
+            keys.add(u.strip().lower())
+    result = []
+    for line in history_lines(filename):
+        rec = parse_line(line)
+        if rec is None or (keys is not None and rec["key"] not in keys):
+            continue
+        if rec["summary"]:
+            if habit is None and month_inside(rec["date"], start, end):
+                result.append(rec)
+            continue
+        if start is not None and rec["date"] < start:
+            continue
+        if end is not None and rec["date"] > end:
+            continue
+        if habit is not None and not habit(rec["habits"]):
+            continue
+        result.append(rec)
+    return result
+
+
+def assert_like_legacy(filename):
+    for start, end in [(None, None), ("2024-01-20", "2024-02-10"), ("2024-02-01", "2024-02-29"),
+                       ("2024-03-25", None), (None, "2024-01-03")]:
+        for users in [None, ["ann"], ["Anna ", "BOB"], ["Nobody"]]:
+            for habit in [None, habit_done("Exercise")]:
+                expected = legacy_query(filename, start, end, users, habit)
+                assert list(query_records(filename, start, end, users, habit)) == expected
+
+
+def test_live_file(history_file):
+    assert_like_legacy(history_file)
+
+
+def test_archive_and_summaries(history_file):
+    archive_history(history_file, before="2024-02-01")
+    rollup_history(history_file, horizon_days=30, today=datetime.date(2024, 3, 30))
+    assert_like_legacy(history_file)
+
+
+def test_users_every_day(history_file):
+    start, end = "2024-02-01", "2024-02-07"
+    days = {}
+    for rec in legacy_query(history_file, start, end, habit=habit_done("Drink water")):
+        days.setdefault(rec["key"], set()).add(rec["date"])
+    expected = []
+    for key in days:
+        if len(days[key]) == 7:
+            expected.append(key)
+    assert users_every_day(history_file, start, end, habit_done("Drink water")) == sorted(expected)
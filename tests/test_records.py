@@ -0,0 +1,56 @@
+"""
+parse_line / format_line round-trips and checksums.
+"""
+
+from records import check_line, format_line, format_summary_line, parse_line
+
+
+def test_daily_line_round_trip():
+    completions = {"Drink water": 1, "Exercise": 0, "Sleep 8 hours": 1}
+    line = format_line("2025-11-01", "Harry", completions, 2)
+    rec = parse_line(line)
+    assert rec["date"] == "2025-11-01"
+    assert rec["name"] == "Harry"
+    assert rec["key"] == "harry"
+    assert rec["habits"] == completions
+    assert rec["points"] == 2
+    assert not rec["summary"]
+    assert check_line(line) == "ok"
+    # writing the record again gives the same line
+    assert format_line(rec["date"], rec["name"], rec["habits"], rec["points"]) == line
+
+
+def test_summary_line_round_trip():
+    line = format_summary_line("2024-03", "Harry", 20, {"Drink water": 15, "Exercise": 10}, 45)
+    rec = parse_line(line)
+    assert rec["summary"]
+    assert rec["date"] == "2024-03"
+    assert rec["days"] == 20
+    assert rec["habits"] == {"Drink water": 15, "Exercise": 10}
+    assert rec["points"] == 45
+    assert check_line(line) == "ok"
+
+
+def test_old_lines_without_checksum_are_read():
+    line = "2025-11-01 | Harry | Drink water=Yes, Exercise=No, Sleep 8 hours=Yes, Points=3"
+    assert check_line(line) == "none"
+    rec = parse_line(line)
+    assert rec["points"] == 3
+    assert rec["habits"] == {"Drink water": 1, "Exercise": 0, "Sleep 8 hours": 1}
+
+
+def test_corrupted_line_fails_its_checksum():
+    line = format_line("2025-11-01", "Harry", {"Drink water": 1}, 1)
+    assert check_line(line.replace("Points=1", "Points=9")) == "bad"
+    assert check_line(line.replace("Harry", "Harri")) == "bad"
+    # a cut-off checksum item is bad too
+    index = line.find("Crc=")
+    assert check_line(line[:index + 6] + ", Points=1") == "bad"
+
+
+def test_broken_lines_are_skipped():
+    assert parse_line("") is None
+    assert parse_line("2025-11-01 | Harry") is None
+    assert parse_line("2025-11-01 | Harry | Drink water=Yes") is None
+    assert parse_line("2025-11-01 | Harry | Points=lots") is None
+    assert parse_line("#checkpoint offset=0 lines=0 crc=00000000") is None
@@ -0,0 +1,113 @@
+"""
+recover(): damaged lines are found, moved to the quarantine file, and checkpoints are trusted.
+"""
+
+import os
+
+from records import format_line
+from recovery import (CHECKPOINT_TAG, append_line, find_last_checkpoint, maybe_checkpoint,
+                      recover, rewrite_lines, write_lines_atomic)
+
+
+def read(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+def test_clean_file_needs_no_changes(history_file):
+    before = read(history_file)
+    report = recover(history_file)
+    assert report["problems"] == []
+    assert report["quarantined"] == 0
+    # only a checkpoint marker was added at the end
+    after = read(history_file)
+    assert after.startswith(before)
+    assert after[len(before):].startswith(CHECKPOINT_TAG)
+
+
+def test_damaged_lines_are_quarantined(history_file):
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    good = lines[5]
+    lines[5] = good.replace("Points=", "Points=1")  # checksum no longer matches
+    lines[7] = "2024-01-02 | Bob | garbage"
+    with open(history_file, "w") as f:
+        f.write("\n".join(lines) + "\n")
+        f.write("2024-04-01 | Ann | half a li")  # a crash in the middle of a write
+
+    report = recover(history_file)
+    reasons = sorted(reason for offset, reason, text in report["problems"])
+    assert reasons == ["bad checksum", "incomplete last line", "unreadable"]
+    assert report["quarantined"] == 3
+
+    text = read(history_file)
+    assert lines[5] not in text
+    assert lines[7] not in text
+    assert "half a li" not in text
+    quarantine = read(history_file + ".quarantine")
+    assert "bad checksum" in quarantine
+    assert "half a li" in quarantine
+
+    # the next check starts after the new checkpoint and finds nothing
+    assert recover(history_file)["problems"] == []
+    assert find_last_checkpoint(history_file) == os.path.getsize(history_file)
+
+
+def test_report_only_leaves_the_file(history_file):
+    append_line(history_file, "2024-04-01 | Ann | H=w+, Crc=00000000, Points=1")
+    before = read(history_file)
+    report = recover(history_file, quarantine=False)
+    assert len(report["problems"]) == 1
+    assert read(history_file) == before
+    assert not os.path.exists(history_file + ".quarantine")
+
+
+def test_checkpoint_skips_checked_lines(history_file):
+    maybe_checkpoint(history_file)
+    start = find_last_checkpoint(history_file)
+    assert start == os.path.getsize(history_file)
+    append_line(history_file, format_line("2024-04-01", "Ann", {"Drink water": 1}, 1))
+    report = recover(history_file)
+    assert report["checked_from"] == start
+    assert report["records"] == 1
+
+
+def test_moved_checkpoint_is_not_trusted(history_file):
+    maybe_checkpoint(history_file)
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    # a rewrite that drops the first line moves the marker away from its offset
+    write_lines_atomic(history_file, lines[1:])
+    assert find_last_checkpoint(history_file) == 0
+
+
+def test_atomic_rewrite_keeps_appends(history_file):
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    late = format_line("2024-04-01", "Ann", {"Drink water": 1}, 1)
+
+    def drop_first(raw_lines):
+        append_line(history_file, late)  # another program appends while we prepare the new file
+        return raw_lines[1:]
+
+    rewrite_lines(history_file, drop_first)
+    assert read(history_file).splitlines() == lines[1:] + [late]
+
+
+def test_rewrite_retries_when_file_was_replaced(history_file):
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    calls = []
+
+    def drop_first(raw_lines):
+        calls.append(len(raw_lines))
+        if len(calls) == 1:
+            # another program swaps in its own rewrite meanwhile
+            write_lines_atomic(history_file, lines[:-1])
+        return raw_lines[1:]
+
+    rewrite_lines(history_file, drop_first)
+    # the second try starts from the replaced file; nothing is spliced onto it
+    assert calls == [len(lines), len(lines) - 1]
+    assert read(history_file).splitlines() == lines[1:-1]
+
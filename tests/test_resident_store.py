@@ -0,0 +1,51 @@
+"""
+ResidentStore answers like the original functions in main.py, before and after a flush.
+"""
+
+import os
+
+from history_state import HistoryState
+from records import format_line
+from recovery import append_line
+from resident_store import ResidentStore
+
+from test_history_state import assert_like_legacy
+
+
+def test_resident_store(history_file):
+    store = ResidentStore(history_file, flush_seconds=3600)
+    store.save("Ann", {"Drink water": 1}, 1, "2024-04-01")
+    store.save("Ann", {"Drink water": 1, "Exercise": 1}, 2, "2024-04-01")
+    assert store.dirty_count() == 1
+
+    # another program writes the same user and day: our waiting record wins at the flush
+    append_line(history_file, format_line("2024-04-01", "Ann", {"Drink water": 0}, 0))
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 1}, 1))
+    store.sync()
+    assert store.history_of("Ann")[-1][1] == 2
+    assert store.loads == 1
+
+    assert store.flush() == 1
+    store.sync()
+    assert_like_legacy(store, history_file)
+    store.close()
+
+
+def test_flush_appends_after_outside_appends(history_file):
+    store = ResidentStore(history_file, flush_seconds=3600)
+    reader = HistoryState(history_file)
+    inode = os.stat(history_file).st_ino
+
+    store.save("Ann", {"Drink water": 1}, 1, "2024-04-01")
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 1}, 1))
+    assert store.flush() == 1
+
+    # nothing was replaced, so the file was only appended to
+    assert os.stat(history_file).st_ino == inode
+    reader.sync()
+    assert reader.loads == 1
+    assert_like_legacy(reader, history_file)
+    store.sync()
+    assert store.loads == 1
+    assert_like_legacy(store, history_file)
+    store.close()
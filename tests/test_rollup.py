@@ -0,0 +1,57 @@
+"""
+rollup_history changes how the history is stored, not what the loaders answer.
+"""
+
+import datetime
+
+import recovery
+from main import get_user_rank, load_history, load_totals_all, weekly_average
+from records import format_line
+from recovery import append_line
+from rollup import rollup_history
+
+from conftest import USERS
+
+
+def answers(filename):
+    # what the menu would show for every user
+    result = {"totals": load_totals_all(filename)}
+    for name in USERS:
+        result[name] = (load_history(name, filename), weekly_average(name, filename, use_index=False),
+                        weekly_average(name, filename), get_user_rank(name, filename))
+    return result
+
+
+def test_rollup_keeps_totals_and_recent_days(history_file):
+    before = answers(history_file)
+    today = datetime.date(2024, 3, 30)
+    lines_before, lines_after = rollup_history(history_file, horizon_days=30, today=today)
+    assert lines_after < lines_before
+
+    # every point still counts, and the last 30 days are still daily records
+    assert load_totals_all(history_file) == before["totals"]
+    for name in USERS:
+        history, average, fast_average, rank = before[name]
+        assert weekly_average(name, history_file, use_index=False) == average
+        assert weekly_average(name, history_file) == average
+        assert get_user_rank(name, history_file) == rank
+        # the rolled-up days leave load_history, the recent ones stay at its end
+        recent = load_history(name, history_file)
+        assert history[len(history) - len(recent):] == recent
+
+
+def test_rollup_keeps_lines_appended_meanwhile(history_file, monkeypatch):
+    late = format_line("2024-03-30", "Bob", {"Drink water": 1}, 1)
+    read_for_rewrite = recovery.read_for_rewrite
+
+    def read_then_append(filename):
+        result = read_for_rewrite(filename)
+        append_line(filename, late) # another program saves while the rollup runs
+        return result
+
+    monkeypatch.setattr(recovery, "read_for_rewrite", read_then_append)
+    totals = load_totals_all(history_file)[0]
+    rollup_history(history_file, horizon_days=30, today=datetime.date(2024, 3, 30))
+    assert load_totals_all(history_file)[0]["bob"] == totals["bob"] + 1
+    with open(history_file, "r") as f:
+        assert f.read().splitlines()[-1] == late
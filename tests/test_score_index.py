@@ -0,0 +1,58 @@
+"""
+ScoreBoard answers percentile, rank and distribution questions like a count over load_totals_all.
+"""
+
+from main import load_totals_all
+from records import format_line
+from recovery import append_line
+from score_index import build_score_board
+
+from conftest import USERS
+
+
+def assert_like_legacy(board, filename):
+    totals, display = load_totals_all(filename)
+    scores = list(totals.values())
+    for name in USERS + ["ANN ", "Nobody"]:
+        key = name.strip().lower()
+        assert board.total_of(name) == totals.get(key, 0)
+        if key not in totals:
+            assert board.percentile(name) == 100.0
+            continue
+        higher = 0
+        for score in scores:
+            if score > totals[key]:
+                higher += 1
+        assert board.percentile(name) == round(min(100.0, (higher + 1) * 100.0 / len(scores)), 1)
+
+    for score in range(max(scores) + 2):
+        higher = 0
+        for other in scores:
+            if other > score:
+                higher += 1
+        assert board.rank_of_score(score) == higher + 1
+
+    expected = {}
+    for score in scores:
+        low = score - score % 5
+        expected[(low, low + 4)] = expected.get((low, low + 4), 0) + 1
+    buckets = {}
+    for low, high, users in board.distribution(5):
+        buckets[(low, high)] = users
+    assert buckets == expected
+
+
+def test_built_board(history_file):
+    board = build_score_board(load_totals_all(history_file)[0])
+    assert_like_legacy(board, history_file)
+
+
+def test_board_follows_saves(history_file):
+    board = build_score_board(load_totals_all(history_file)[0])
+    # a new user, and a total far above the histogram's first size
+    append_line(history_file, format_line("2024-04-01", "Dee", {"Drink water": 1}, 1))
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 1}, 500))
+    totals = load_totals_all(history_file)[0]
+    board.set_total("Dee", totals["dee"])
+    board.set_total("BOB", totals["bob"])
+    assert_like_legacy(board, history_file)
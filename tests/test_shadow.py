@@ -0,0 +1,79 @@
+"""
+Shadow.compare returns the fast answer and counts every sampled difference from the original function.
+"""
+
+import json
+
+from history_state import HistoryState
+from main import get_user_rank, load_history
+from records import format_line
+from recovery import append_line
+from resident_store import ResidentStore
+from shadow import Shadow, legacy_leaderboard, load_stats, log_path, state_in_step
+
+from conftest import USERS
+
+
+def test_fast_paths_agree(history_file):
+    shadow = Shadow(history_file, rate=1.0, seed=1)
+    state = HistoryState(history_file)
+
+    def ready():
+        return state_in_step(state)
+
+    for name in USERS + ["Nobody"]:
+        shadow.compare("rank", lambda: state.rank_of(name), lambda: get_user_rank(name, history_file),
+                       name, ready)
+        shadow.compare("history", lambda: state.history_of(name), lambda: load_history(name, history_file),
+                       name, ready, key=lambda rows: [row[1] for row in rows])
+    shadow.compare("leaderboard", state.leaderboard, lambda: legacy_leaderboard(history_file), None, ready)
+
+    assert shadow.checks["rank"]["sampled"] == len(USERS) + 1
+    assert shadow.checks["history"]["sampled"] == len(USERS) + 1
+    for check in shadow.checks:
+        assert shadow.checks[check]["mismatches"] == 0
+
+    shadow.save()
+    assert load_stats(history_file)["rank"]["sampled"] == len(USERS) + 1
+
+
+def test_difference_is_logged(history_file):
+    shadow = Shadow(history_file, rate=1.0, seed=1)
+    wrong = [["Ann", 1]]
+    assert shadow.compare("leaderboard", lambda: wrong, lambda: legacy_leaderboard(history_file)) == wrong
+    assert shadow.checks["leaderboard"]["mismatches"] == 1
+    with open(log_path(history_file), "r") as f:
+        entry = json.loads(f.readline())
+    assert entry["check"] == "leaderboard"
+
+
+def test_waiting_saves_are_skipped(history_file):
+    shadow = Shadow(history_file, rate=1.0, seed=1)
+    store = ResidentStore(history_file, flush_seconds=3600)
+    store.save("Ann", {"Drink water": 1}, 1, "2024-04-01")
+
+    legacy_calls = []
+
+    def legacy():
+        legacy_calls.append(1)
+        return get_user_rank("Ann", history_file)
+    shadow.compare("rank", lambda: store.rank_of("Ann"), legacy, "Ann", lambda: state_in_step(store))
+    assert shadow.checks["rank"]["skipped"] == 1
+    assert legacy_calls == []
+
+    store.flush()
+    append_line(history_file, format_line("2024-04-02", "Bob", {"Drink water": 1}, 1))
+    store.sync()
+    shadow.compare("rank", lambda: store.rank_of("Ann"), legacy, "Ann", lambda: state_in_step(store))
+    assert shadow.checks["rank"]["sampled"] == 1
+    assert shadow.checks["rank"]["mismatches"] == 0
+    store.close()
+
+
+def test_rate_zero_never_runs_the_original(history_file):
+    shadow = Shadow(history_file, rate=0.0)
+
+    def legacy():
+        raise AssertionError("the original function must not run")
+    assert shadow.compare("rank", lambda: 7, legacy) == 7
+    assert shadow.checks == {}
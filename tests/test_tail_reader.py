@@ -0,0 +1,56 @@
+"""
+HistoryTail keeps the leaderboard and streaks like the original functions in main.py.
+"""
+
+from main import calc_streak, load_history
+from records import format_line
+from recovery import append_line, write_lines_atomic
+from shadow import legacy_leaderboard
+from tail_reader import HistoryTail
+
+from conftest import USERS
+
+
+def assert_like_legacy(tail, filename):
+    assert tail.leaderboard() == legacy_leaderboard(filename)
+    assert tail.leaderboard(2) == legacy_leaderboard(filename, 2)
+    for name in USERS + ["ANN ", "Nobody"]:
+        assert tail.streak_of(name) == calc_streak(load_history(name, filename))
+
+
+def test_first_poll(history_file):
+    tail = HistoryTail(history_file)
+    assert tail.poll()
+    assert_like_legacy(tail, history_file)
+    assert not tail.poll()
+
+
+def test_appends_are_read_without_reloading(history_file):
+    tail = HistoryTail(history_file)
+    tail.poll()
+    append_line(history_file, format_line("2024-04-01", "Dee", {"Drink water": 1}, 1))
+    append_line(history_file, format_line("2024-04-01", "Bob", {"Drink water": 0}, 0))
+
+    # a half-written line waits until it is complete
+    line = format_line("2024-04-02", "cy", {"Drink water": 1}, 1)
+    with open(history_file, "a") as f:
+        f.write(line[:10])
+    assert tail.poll()
+    with open(history_file, "a") as f:
+        f.write(line[10:] + "\n")
+    assert tail.poll()
+    assert tail.full_reloads == 0
+    assert_like_legacy(tail, history_file)
+
+
+def test_rewrite_reloads(history_file):
+    tail = HistoryTail(history_file)
+    tail.poll()
+    with open(history_file, "r") as f:
+        lines = f.read().splitlines()
+    # same size, different content: only the fingerprint can tell
+    lines[-1], lines[-3] = lines[-3], lines[-1]
+    write_lines_atomic(history_file, lines)
+    assert tail.poll()
+    assert tail.full_reloads == 1
+    assert_like_legacy(tail, history_file)
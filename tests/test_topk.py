@@ -0,0 +1,84 @@
+"""
+SpaceSaving: every reported count is within its error of the true total.
+"""
+
+import random
+
+from main import load_totals_all
+from topk import SpaceSaving, approx_leaderboard
+
+
+def stream(seed=3, users=200, records=5000):
+    # a few heavy users and many light ones
+    rng = random.Random(seed)
+    names = [f"user{i}" for i in range(users)]
+    weights = [1.0 / (i + 1) for i in range(users)]
+    result = []
+    for _ in range(records):
+        result.append((rng.choices(names, weights)[0], rng.randint(0, 4)))
+    return result
+
+
+def true_totals(items):
+    totals = {}
+    for name, points in items:
+        totals[name] = totals.get(name, 0) + points
+    return totals
+
+
+def test_error_bounds():
+    items = stream()
+    totals = true_totals(items)
+    sketch = SpaceSaving(20)
+    for name, points in items:
+        sketch.add(name, points)
+
+    assert len(sketch.counts) == 20
+    assert sketch.evictions > 0
+    for name_text, count, error in sketch.top(20):
+        assert count - error <= totals[name_text] <= count
+    # a user with more than (all points / capacity) is always kept
+    for name in totals:
+        if totals[name] > sketch.total_weight / sketch.capacity:
+            assert name in sketch.counts
+
+
+def test_guaranteed_rows_are_in_the_true_top():
+    items = stream()
+    totals = true_totals(items)
+    sketch = SpaceSaving(20)
+    for name, points in items:
+        sketch.add(name, points)
+
+    top_n = 5
+    sure = sketch.guaranteed(top_n)
+    true_top = sorted(totals, key=lambda k: -totals[k])
+    cut = totals[true_top[top_n - 1]]
+    for name_text, count, error in sketch.top(top_n)[:sure]:
+        assert totals[name_text] >= cut
+
+
+def test_evicted_users_count_against_guarantees():
+    sketch = SpaceSaving(2)
+    sketch.add("Ann", 10)
+    sketch.add("Bob", 9)
+    sketch.add("Cy", 1) # takes Bob's counter, so Bob is no longer tracked
+    # Cy's 10 may really be 1, and Bob (9, untracked) may beat it
+    assert sketch.top(2) == [("Ann", 10, 0), ("Cy", 10, 9)]
+    assert sketch.guaranteed(1) == 1
+    assert sketch.guaranteed(2) == 1
+
+
+def test_exact_when_everyone_fits(history_file):
+    totals, display = load_totals_all(history_file)
+    rows, sketch = approx_leaderboard(history_file, top_n=3, capacity=100)
+    assert sketch.evictions == 0
+    for name_text, count, error in rows:
+        assert error == 0
+        assert count == totals[name_text.lower()]
+    assert sketch.guaranteed(3) == 3
+
+
+def test_capacity_is_more_than_the_rows_shown(history_file):
+    rows, sketch = approx_leaderboard(history_file, top_n=3, capacity=1)
+    assert sketch.capacity == 4
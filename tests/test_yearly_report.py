@@ -0,0 +1,71 @@
+"""
+Yearly summaries are the same with and without spilling, and the reports the same with workers.
+"""
+
+import os
+
+from archive import history_lines
+from main import load_totals_all
+from records import format_line, parse_line
+from recovery import append_line
+from yearly_report import collect_summaries, export_reports
+
+
+def legacy_summaries(filename, year):
+    # one pass over every record of the year, user by user
+    display = load_totals_all(filename)[1]
+    result = {}
+    streaks = {}
+    for line in history_lines(filename):
+        rec = parse_line(line)
+        if rec is None or not rec["date"].startswith(f"{year}-"):
+            continue
+        key = rec["key"]
+        if key not in result:
+            result[key] = {"key": key, "name": display[key], "months": [0] * 12,
+                           "total": 0, "days": 0, "best_streak": 0}
+            streaks[key] = 0
+        s = result[key]
+        s["months"][int(rec["date"][5:7]) - 1] += rec["points"]
+        s["total"] += rec["points"]
+        if rec["summary"]:
+            continue
+        s["days"] += 1
+        streaks[key] = streaks[key] + 1 if rec["points"] > 0 else 0
+        s["best_streak"] = max(s["best_streak"], streaks[key])
+    return result
+
+
+def assert_like_legacy(summaries, filename, year):
+    found = {}
+    for summary in summaries:
+        found[summary["key"]] = summary
+    assert found == legacy_summaries(filename, year)
+
+
+def test_spill_gives_the_same_summaries(history_file):
+    # the user's first-seen name comes from an earlier year
+    with open(history_file, "r") as f:
+        text = f.read()
+    with open(history_file, "w") as f:
+        f.write(format_line("2023-12-31", "ANNA", {"Drink water": 1}, 1) + "\n" + text)
+    append_line(history_file, format_line("2025-01-01", "Bob", {"Drink water": 1}, 1))
+
+    assert_like_legacy(collect_summaries(history_file, 2024), history_file, 2024)
+    assert_like_legacy(collect_summaries(history_file, 2024, memory_records=10, partitions=3),
+                       history_file, 2024)
+    names = []
+    for summary in collect_summaries(history_file, 2024):
+        names.append(summary["name"])
+    assert "ANNA" in names
+
+
+def test_workers_write_the_same_files(history_file, tmp_path):
+    one = str(tmp_path / "one")
+    many = str(tmp_path / "many")
+    assert export_reports(history_file, 2024, one, workers=1) == 4
+    assert export_reports(history_file, 2024, many, workers=2, memory_records=10) == 4
+    assert sorted(os.listdir(one)) == sorted(os.listdir(many))
+    for name in os.listdir(one):
+        with open(os.path.join(one, name), "rb") as a, open(os.path.join(many, name), "rb") as b:
+            assert a.read() == b.read()
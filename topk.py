@@ -0,0 +1,199 @@
+"""
+Approximate top-K leaderboard for very large numbers of users.
+
+load_totals_all keeps one dict entry per user. With tens of millions of users
+(for example anonymous kiosk IDs) that no longer fits well in memory.
+
+SpaceSaving keeps at most `capacity` counters (the "space-saving" heavy-hitters
+sketch). When a new user shows up and all counters are taken, the user with the
+smallest count is replaced, and the new user inherits that count as its error.
+For every reported user:
+    count - error <= true total <= count
+and any user whose true total is bigger than (sum of all points / capacity) is
+guaranteed to be kept.
+
+Example:
+    python topk.py --top 10 --memory-mb 64
+"""
+
+import argparse
+import heapq
+import os
+
+from archive import history_lines
+from records import parse_line
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+# rough memory used by one counter (dict entries, name strings, heap entries)
+BYTES_PER_COUNTER = 400
+
+
+def capacity_for_budget(memory_bytes):
+    """
+    Return how many counters fit into this memory budget (at least 1).
+    """
+    capacity = memory_bytes // BYTES_PER_COUNTER
+    if capacity < 1:
+        capacity = 1
+    return int(capacity)
+
+
+class SpaceSaving:
+    """
+    The space-saving sketch for weighted counts (points per user).
+    """
+
+    def __init__(self, capacity):
+        """
+        Set up an empty sketch with room for `capacity` users.
+        """
+        self.capacity = max(1, capacity)
+        self.counts = {} # lowercase name -> estimated total (never too low)
+        self.errors = {} # lowercase name -> how much the estimate may be too high
+        self.display = {} # lowercase name -> name for printing
+        self.heap = [] # (count, name) pairs; old pairs are skipped when popped
+        self.total_weight = 0 # sum of all points seen
+        self.evictions = 0 # how many times a counter was taken over by another user
+
+    def _push(self, key):
+        heapq.heappush(self.heap, (self.counts[key], key))
+
+        # throw away old heap entries now and then, so the heap stays small
+        if len(self.heap) > 4 * self.capacity:
+            self.heap = []
+            for k in self.counts:
+                self.heap.append((self.counts[k], k))
+            heapq.heapify(self.heap)
+
+    def _pop_min(self):
+        # find the tracked user with the smallest count (skip stale heap entries)
+        while True:
+            count, key = heapq.heappop(self.heap)
+            if key in self.counts and self.counts[key] == count:
+                return key
+
+    def add(self, name, points):
+        """
+        Add points for one user.
+        """
+        key = name.lower()
+        self.total_weight += points
+
+        if key in self.counts:
+            self.counts[key] += points
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = points
+            self.errors[key] = 0
+            self.display[key] = name
+        else:
+            # replace the smallest counter; its count becomes our error
+            old = self._pop_min()
+            min_count = self.counts.pop(old)
+            del self.errors[old]
+            del self.display[old]
+
+            self.counts[key] = min_count + points
+            self.errors[key] = min_count
+            self.display[key] = name
+            self.evictions += 1
+
+        self._push(key)
+
+    def top(self, n):
+        """
+        Return the top n users as a list of (display_name, count, error).
+        The true total of each user is between count - error and count.
+        """
+        keys = sorted(self.counts.keys(), key=lambda k: (-self.counts[k], self.display[k].lower()))
+        rows = []
+        for k in keys[:n]:
+            rows.append((self.display[k], self.counts[k], self.errors[k]))
+        return rows
+
+    def guaranteed(self, n):
+        """
+        Return how many of the top n rows are surely in the true top n:
+        their lowest possible total (count - error) is at least the highest
+        possible total of every user outside the top n rows.
+
+        Outside users are the tracked rows after the first n (at most their
+        count) and, once a counter was ever replaced, the users that are no
+        longer tracked (at most the smallest tracked count).
+        """
+        rows = self.top(n + 1)
+        outside = 0
+        if len(rows) > n:
+            outside = rows[n][1]
+        if self.evictions > 0:
+            outside = max(outside, min(self.counts.values()))
+        sure = 0
+        for i in range(min(n, len(rows))):
+            if rows[i][1] - rows[i][2] >= outside:
+                sure += 1
+        return sure
+
+
+def approx_leaderboard(filename=HISTORY_FILE, top_n=5, capacity=None, memory_bytes=None):
+    """
+    Stream over the history once and return an approximate leaderboard.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        top_n (int): how many users to return
+        capacity (int): number of counters to keep
+        memory_bytes (int): memory budget, used when capacity is not given
+
+    Returns:
+        (rows, sketch): rows is a list of (display_name, count, error)
+    """
+    if capacity is None:
+        if memory_bytes is None:
+            memory_bytes = 64 * 1024 * 1024
+        capacity = capacity_for_budget(memory_bytes)
+    if capacity <= top_n:
+        # one counter more than the rows shown, so the rows can be checked against the next one
+        capacity = top_n + 1
+
+    sketch = SpaceSaving(capacity)
+    try:
+        for line in history_lines(filename):
+            rec = parse_line(line)
+            if rec is not None:
+                sketch.add(rec["name"], rec["points"])
+    except FileNotFoundError:
+        pass
+
+    return sketch.top(top_n), sketch
+
+
+def main(argv=None):
+    """
+    Print an approximate leaderboard with error bounds.
+    """
+    parser = argparse.ArgumentParser(description="Approximate top-K leaderboard.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--top", type=int, default=5, help="how many users to show")
+    parser.add_argument("--memory-mb", type=float, default=64, help="memory budget for the counters")
+    args = parser.parse_args(argv)
+
+    budget = int(args.memory_mb * 1024 * 1024)
+    rows, sketch = approx_leaderboard(args.file, args.top, memory_bytes=budget)
+
+    print("\n===== Leaderboard (approximate) =====")
+    if len(rows) == 0:
+        print("No records yet.")
+        return
+    for i in range(len(rows)):
+        name_text, count, error = rows[i]
+        if error == 0:
+            print(f"{i + 1}. {name_text}  -  {count} pts")
+        else:
+            print(f"{i + 1}. {name_text}  -  {count - error}..{count} pts")
+    print(f"({sketch.guaranteed(args.top)} of {len(rows)} rows are guaranteed, "
+          f"{sketch.capacity} counters)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Year-in-review reports for every user (CSV and static HTML).
+
+Calling load_history + weekly_average + get_user_rank for each user reads the
+whole history once per user. export_reports() reads it once for everybody:
+
+    1. Stream the history (archive + live file) and keep the lines of the year.
+       Up to memory_records lines are kept in memory; after that they are
+       spilled into PARTITIONS temporary files, split by user (a hash of the
+       name), so that each user's lines end up in one file, in file order.
+    2. Read one part at a time and sum up each user: points per month,
+       active days, best streak.
+    3. Rank all users by their points of the year (ties alphabetically,
+       like get_user_rank).
+    4. Write one CSV and/or HTML file per user, plus index.csv. With
+       workers > 1 the files are written by a pool of processes.
+
+The name on a report is the user's first-seen name in the whole history
+(like load_totals_all), not the first one of that year.
+
+Best streak follows calc_streak: the longest run of records in a row with
+more than 0 points. Monthly summaries (rollup.py) count towards the monthly
+totals but not towards streaks or active days.
+
+Example:
+    python yearly_report.py --year 2025 --out reports --workers 4
+"""
+
+import argparse
+import csv
+import datetime
+import html
+import os
+import shutil
+import tempfile
+import zlib
+
+from archive import history_lines
+from records import parse_line
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(BASE_DIR, "progress.txt")
+
+MEMORY_RECORDS = 200000 # lines of the year kept in memory before spilling to disk
+PARTITIONS = 16 # number of temporary files when spilling
+
+
+def partition_of(key, partitions):
+    """
+    Return the temporary file number for this lowercase name (always the same).
+    """
+    return zlib.crc32(key.encode("utf-8")) % partitions
+
+
+def summarize(records):
+    """
+    Sum up one user's records of the year (in file order).
+
+    Returns:
+        dict with "key", "name", "months" (12 point totals), "total",
+        "days" (active days) and "best_streak"
+    """
+    summary = {"key": records[0]["key"], "name": records[0]["name"],
+               "months": [0] * 12, "total": 0, "days": 0, "best_streak": 0}
+    streak = 0
+    for rec in records:
+        month = int(rec["date"][5:7])
+        summary["months"][month - 1] += rec["points"]
+        summary["total"] += rec["points"]
+        if rec["summary"]:
+            continue
+        summary["days"] += 1
+        if rec["points"] > 0:
+            streak += 1
+            if streak > summary["best_streak"]:
+                summary["best_streak"] = streak
+        else:
+            streak = 0
+    return summary
+
+
+def _summarize_lines(lines, year_text):
+    # group lines by user (keeping file order) and sum up each user
+    by_user = {}
+    for line in lines:
+        rec = parse_line(line)
+        if rec is None or not rec["date"].startswith(year_text):
+            continue
+        if rec["key"] not in by_user:
+            by_user[rec["key"]] = []
+        by_user[rec["key"]].append(rec)
+    result = []
+    for key in by_user:
+        result.append(summarize(by_user[key]))
+    return result
+
+
+def _spill(files, line, partitions):
+    # write one line into the temporary file of its user
+    parts = line.split("|", 2)
+    if len(parts) < 3:
+        return
+    if not line.endswith("\n"):
+        line = line + "\n"
+    files[partition_of(parts[1].strip().lower(), partitions)].write(line)
+
+
+def collect_summaries(filename, year, memory_records=MEMORY_RECORDS, partitions=PARTITIONS):
+    """
+    Stream the history once and return one summary (see summarize) per user
+    who has a record in this year. "name" is the user's first-seen name.
+    """
+    year_text = str(year) + "-"
+    kept = [] # lines of the year while they still fit in memory
+    spill_dir = None
+    files = None
+    first_name = {} # lowercase name -> name on the user's first record, of any year
+
+    try:
+        try:
+            for line in history_lines(filename):
+                # only a user's first line is parsed for the name
+                parts = line.split("|", 2)
+                if len(parts) >= 3 and parts[1].strip().lower() not in first_name:
+                    rec = parse_line(line)
+                    if rec is not None:
+                        first_name[rec["key"]] = rec["name"]
+
+                # cheap check on the date prefix before anything else
+                if not line.startswith(year_text):
+                    continue
+                if files is None:
+                    kept.append(line)
+                    if len(kept) <= memory_records:
+                        continue
+                    # too many lines: move everything into per-user temporary files
+                    spill_dir = tempfile.mkdtemp(prefix="yearly_report.")
+                    files = []
+                    for i in range(partitions):
+                        files.append(open(os.path.join(spill_dir, f"part-{i:03d}.txt"), "w"))
+                    for old in kept:
+                        _spill(files, old, partitions)
+                    kept = []
+                    continue
+                _spill(files, line, partitions)
+        except FileNotFoundError:
+            pass
+
+        if files is None:
+            summaries = _summarize_lines(kept, year_text)
+        else:
+            # one part at a time: only one part's lines are in memory at once
+            summaries = []
+            for f in files:
+                f.close()
+                with open(f.name, "r") as part:
+                    summaries.extend(_summarize_lines(part, year_text))
+
+        for summary in summaries:
+            summary["name"] = first_name[summary["key"]]
+        return summaries
+    finally:
+        if files is not None:
+            for f in files:
+                f.close()
+        if spill_dir is not None:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+def rank_summaries(summaries):
+    """
+    Sort the summaries by points of the year (desc), then by name (asc),
+    and set "rank" and "total_users" in each one.
+    """
+    summaries.sort(key=lambda s: (-s["total"], s["name"].lower()))
+    for i in range(len(summaries)):
+        summaries[i]["rank"] = i + 1
+        summaries[i]["total_users"] = len(summaries)
+    return summaries
+
+
+def report_name(summary):
+    """
+    Return a safe file name (without extension) for this user's report.
+    The checksum at the end keeps names like "a b" and "a_b" apart.
+    """
+    safe = ""
+    for ch in summary["key"]:
+        if ch.isalnum():
+            safe = safe + ch
+        else:
+            safe = safe + "_"
+    return f"{safe[:40]}-{zlib.crc32(summary['key'].encode('utf-8')) & 0xffffffff:08x}"
+
+
+def render_report(job):
+    """
+    Write the report files of one user. Runs in a worker process when workers > 1.
+
+    Parameters:
+        job (tuple): (summary, year, out_dir, formats)
+    """
+    summary, year, out_dir, formats = job
+    base = os.path.join(out_dir, report_name(summary))
+    months = []
+    for i in range(12):
+        months.append((f"{year}-{i + 1:02d}", summary["months"][i]))
+
+    if "csv" in formats:
+        with open(base + ".csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["user", summary["name"]])
+            writer.writerow(["year", year])
+            writer.writerow(["rank", summary["rank"], "of", summary["total_users"]])
+            writer.writerow(["total_points", summary["total"]])
+            writer.writerow(["active_days", summary["days"]])
+            writer.writerow(["best_streak", summary["best_streak"]])
+            writer.writerow([])
+            writer.writerow(["month", "points"])
+            for month_text, points in months:
+                writer.writerow([month_text, points])
+
+    if "html" in formats:
+        name = html.escape(summary["name"])
+        rows = ""
+        for month_text, points in months:
+            rows = rows + f"<tr><td>{month_text}</td><td>{points}</td></tr>\n"
+        page = (
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">\n"
+            f"<title>{year} in review: {name}</title>\n"
+            "<style>body{font-family:Helvetica,sans-serif;margin:2em}"
+            "td,th{padding:4px 12px;text-align:left}</style>\n"
+            "</head><body>\n"
+            f"<h1>{year} in review: {name}</h1>\n"
+            f"<p>Rank <b>{summary['rank']}</b> of {summary['total_users']} &middot; "
+            f"{summary['total']} points &middot; {summary['days']} active days &middot; "
+            f"best streak {summary['best_streak']} day(s)</p>\n"
+            "<table>\n<tr><th>Month</th><th>Points</th></tr>\n"
+            f"{rows}</table>\n</body></html>\n"
+        )
+        with open(base + ".html", "w", encoding="utf-8") as f:
+            f.write(page)
+
+    return base
+
+
+def export_reports(filename=HISTORY_FILE, year=None, out_dir="reports", formats=("csv", "html"),
+                   workers=1, memory_records=MEMORY_RECORDS):
+    """
+    Write a year-in-review report for every user with records in that year.
+
+    Parameters:
+        filename (str): the file path, default is progress.txt
+        year (int): the year (default: this year)
+        out_dir (str): folder for the reports (created if needed)
+        formats (tuple): "csv" and/or "html"
+        workers (int): number of processes writing the files (1 = no pool)
+        memory_records (int): lines kept in memory before spilling to temporary files
+
+    Returns:
+        number of users with a report
+    """
+    if year is None:
+        year = datetime.date.today().year
+    os.makedirs(out_dir, exist_ok=True)
+
+    summaries = rank_summaries(collect_summaries(filename, year, memory_records))
+
+    jobs = []
+    for summary in summaries:
+        jobs.append((summary, year, out_dir, tuple(formats)))
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            files = list(pool.map(render_report, jobs, chunksize=64))
+    else:
+        files = []
+        for job in jobs:
+            files.append(render_report(job))
+
+    # one overview of all reports
+    with open(os.path.join(out_dir, "index.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["rank", "user", "total_points", "active_days", "best_streak", "report"])
+        for i in range(len(summaries)):
+            s = summaries[i]
+            writer.writerow([s["rank"], s["name"], s["total"], s["days"], s["best_streak"],
+                             os.path.basename(files[i])])
+    return len(summaries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write year-in-review reports for all users.")
+    parser.add_argument("--file", default=HISTORY_FILE, help="history file (default: progress.txt)")
+    parser.add_argument("--year", type=int, default=datetime.date.today().year, help="year (default: this year)")
+    parser.add_argument("--out", default="reports", help="output folder (default: reports)")
+    parser.add_argument("--format", choices=["csv", "html", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=1, help="processes writing report files")
+    parser.add_argument("--memory-records", type=int, default=MEMORY_RECORDS,
+                        help="lines kept in memory before spilling to temporary files")
+    args = parser.parse_args(argv)
+
+    formats = ("csv", "html")
+    if args.format != "both":
+        formats = (args.format,)
+    count = export_reports(args.file, args.year, args.out, formats, args.workers, args.memory_records)
+    print(f"Wrote {args.year} reports for {count} user(s) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()